@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-import re
 import io
 import json
 import plotly.express as px
 from sqlalchemy import create_engine, text
+from backend.services.core import get_parse_plan
 
 # ================= 页面配置与 CSS 美化 =================
 st.set_page_config(
@@ -70,63 +70,23 @@ SECTION_CONFIG = [
 
 # ================= 核心逻辑函数 =================
 
-def parse_text_content(content):
+# 解析用的大题配置 (全部为客观题)
+PARSE_SECTIONS = [{'section_id': sec_code, 'match_keyword': sec_title} for sec_code, sec_title, _ in SECTION_CONFIG]
+
+# 头部缺失时提示答卷应有的格式，而不是显示正则表达式
+HEADER_MISSING_ERROR = "头部信息缺失 (需包含: 学号:xxx 姓名:xxx 机号:xxx)"
+
+def parse_text_content(content, parse_plan=None):
     """
     解析单个学生答题卡文本内容
+    复用后端预编译的解析计划 (正则与大题信息按配置缓存)，批量解析时可传入同一份 parse_plan
     返回: (status, data/error_msg)
     """
-    if not content or not content.strip():
-        return False, "文件内容为空"
-
-    student_data = {}
-    lines = [line.strip() for line in content.split('\n')]
-    
-    # 1. 提取头部信息 (学号、姓名、机号)
-    header_pattern = re.compile(r"学号[：:]\s*(.*?)\s+姓名[：:]\s*(.*?)\s+机号[：:]\s*(.*)")
-    
-    header_match = None
-    for i in range(min(5, len(lines))): # 搜索前5行
-        match = header_pattern.search(lines[i])
-        if match:
-            header_match = match
-            break
-            
-    if not header_match:
-        return False, "头部信息缺失 (需包含: 学号:xxx 姓名:xxx 机号:xxx)"
-        
-    student_data['学号'] = header_match.group(1).strip()
-    student_data['姓名'] = header_match.group(2).strip()
-    student_data['机号'] = header_match.group(3).strip()
-
-    # 2. 定义各题型的正则提取逻辑
-    full_text = content
-    
-    for i, (sec_code, sec_title, _) in enumerate(SECTION_CONFIG):
-        start_idx = full_text.find(sec_title)
-        if start_idx == -1:
-            continue # 宽容模式：找不到该大题则跳过
-        
-        # 确定结束位置
-        if i < len(SECTION_CONFIG) - 1:
-            next_title = SECTION_CONFIG[i+1][1]
-            end_idx = full_text.find(next_title)
-            if end_idx == -1: end_idx = len(full_text)
-        else:
-            end_idx = len(full_text)
-            
-        section_text = full_text[start_idx:end_idx]
-        
-        # 提取该区域内的所有 "数字. 答案"
-        lines_in_section = section_text.split('\n')
-        for line in lines_in_section:
-            # 匹配 "1. A" 或 "1.A" 
-            matches = re.findall(r'(\d+)\.\s*([a-zA-Z0-9_\u4e00-\u9fa5]+)?', line)
-            for q_num, ans in matches:
-                key = f"{sec_code}-{q_num}"
-                ans = ans.strip().upper() if ans else ""
-                student_data[key] = ans
-
-    return True, student_data
+    parse_plan = parse_plan or get_parse_plan(PARSE_SECTIONS)
+    status, data = parse_plan.parse(content)
+    if not status and data.startswith("头部信息缺失"):
+        return False, HEADER_MISSING_ERROR
+    return status, data
 
 def calculate_score(student_data, standard_key, score_config):
     """
@@ -289,6 +249,8 @@ with tab1:
                 processed = []
                 errors = {}
                 progress_bar = st.progress(0)
+                # 整个批次共用同一份解析计划
+                parse_plan = get_parse_plan(PARSE_SECTIONS)
                 
                 for idx, file in enumerate(student_files):
                     progress_bar.progress((idx + 1) / len(student_files))
@@ -297,7 +259,7 @@ with tab1:
                     except: 
                         content = file.getvalue().decode("gbk", errors='ignore')
                         
-                    status, res = parse_text_content(content)
+                    status, res = parse_text_content(content, parse_plan)
                     if status:
                         rec = calculate_score(res, st.session_state.standard_key, score_config)
                         processed.append(rec)
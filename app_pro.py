@@ -5,6 +5,7 @@ import io
 import json
 import plotly.express as px
 from sqlalchemy import create_engine, text
+from backend.services.core import get_parse_plan
 import requests
 from typing import Dict, Any, List, Tuple
 
@@ -453,93 +454,10 @@ def batch_grade_subjective(
 def parse_text_content(content, exam_config):
     """
     解析单个学生答题卡文本内容
+    复用后端预编译的解析计划 (正则与大题信息按配置缓存)
     返回: (status, data/error_msg)
     """
-    if not content or not content.strip():
-        return False, "文件内容为空"
-
-    student_data = {}
-    lines = [line.strip() for line in content.split('\n')]
-    
-    # 1. 提取头部信息 (学号、姓名、机号)
-    header_pattern = re.compile(r"学号[：:]\s*(.*?)\s+姓名[：:]\s*(.*?)\s+机号[：:]\s*(.*)")
-    
-    header_match = None
-    for i in range(min(5, len(lines))): # 搜索前5行
-        match = header_pattern.search(lines[i])
-        if match:
-            header_match = match
-            break
-            
-    if not header_match:
-        return False, "头部信息缺失 (需包含: 学号:xxx 姓名:xxx 机号:xxx)"
-        
-    student_data['学号'] = header_match.group(1).strip()
-    student_data['姓名'] = header_match.group(2).strip()
-    student_data['机号'] = header_match.group(3).strip()
-
-    # 2. 定义各题型的正则提取逻辑
-    full_text = content
-    
-    # 使用配置中的题目定义
-    for i, section in enumerate(exam_config):
-        sec_title = section['match_keyword']
-        question_type = section.get('question_type', '客观题')
-        start_idx = full_text.find(sec_title)
-        if start_idx == -1:
-            continue # 宽容模式：找不到该大题则跳过
-        
-        # 确定结束位置
-        if i < len(exam_config) - 1:
-            next_title = exam_config[i+1]['match_keyword']
-            end_idx = full_text.find(next_title)
-            if end_idx == -1: end_idx = len(full_text)
-        else:
-            end_idx = len(full_text)
-            
-        section_text = full_text[start_idx:end_idx]
-        sec_id = section.get('section_id', str(i+1))
-        
-        if question_type == '客观题':
-            # 客观题：提取该区域内的所有 "数字. 答案"（短答案）
-            lines_in_section = section_text.split('\n')
-            for line in lines_in_section:
-                # 匹配 "1. A" 或 "1.A" 
-                matches = re.findall(r'(\d+)\.\s*([a-zA-Z0-9_\u4e00-\u9fa5]+)?', line)
-                for q_num, ans in matches:
-                    key = f"{sec_id}-{q_num}"
-                    ans = ans.strip().upper() if ans else ""
-                    student_data[key] = ans
-        else:
-            # 主观题：提取长文本答案
-            lines_in_section = section_text.split('\n')
-            current_q_num = None
-            current_answer = []
-            
-            for line in lines_in_section:
-                # 检查是否是新题号的开始
-                q_start_match = re.match(r'^(\d+)\.\s*(.*)', line)
-                if q_start_match:
-                    # 保存之前题目的答案
-                    if current_q_num is not None:
-                        key = f"{sec_id}-{current_q_num}"
-                        student_data[key] = '\n'.join(current_answer).strip()
-                    
-                    # 开始新题
-                    current_q_num = q_start_match.group(1)
-                    answer_start = q_start_match.group(2).strip()
-                    current_answer = [answer_start] if answer_start else []
-                elif current_q_num is not None:
-                    # 续接当前题目的答案
-                    if line.strip():
-                        current_answer.append(line.strip())
-            
-            # 保存最后一题
-            if current_q_num is not None:
-                key = f"{sec_id}-{current_q_num}"
-                student_data[key] = '\n'.join(current_answer).strip()
-
-    return True, student_data
+    return get_parse_plan(exam_config).parse(content)
 
 def calculate_score(student_data, standard_key, exam_config, llm_graded_data=None):
     """
@@ -1093,6 +1011,8 @@ with tab2:
                 # 第一阶段：解析所有学生答卷
                 status_text.info("📖 阶段1/2: 解析学生答卷...")
                 students_data = []
+                # 整个批次共用同一份解析计划
+                parse_plan = get_parse_plan(st.session_state.exam_config)
                 
                 for idx, file in enumerate(student_files):
                     progress_bar.progress((idx + 1) / len(student_files) / 2)  # 前50%进度
@@ -1101,8 +1021,7 @@ with tab2:
                     except: 
                         content = file.getvalue().decode("gbk", errors='ignore')
                         
-                    # 传递配置
-                    status, res = parse_text_content(content, st.session_state.exam_config)
+                    status, res = parse_plan.parse(content)
                     if status:
                         students_data.append(res)
                     else:
@@ -1,22 +1,69 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from backend.core.celery_app import celery_app
+from backend.core.config import settings
 from backend.tasks.grading import grade_exam_task
 from backend.api import deps
 from backend.models.user import User
-from typing import Dict, Any
+from backend.models.grading_job import GradingJob
+from backend.services.grading_jobs import create_grading_job
+from backend.services.progress import (
+    FINAL_STATUSES, PROGRESS_CHANNEL, PROGRESS_STATE, build_snapshot, get_progress
+)
+from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Dict
+import asyncio
+import json
+import redis.asyncio as aioredis
 
 router = APIRouter()
 
+# 无事件时发送心跳的间隔（秒），同时检查任务是否已异常结束
+HEARTBEAT_INTERVAL = 15.0
+
 @router.post("/grade/async")
 def trigger_async_grading(
     payload: Dict[str, Any] = Body(...),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db)
 ):
     """
     Trigger background grading.
+    The payload is staged in the database once (a client LLM API key only
+    in encrypted form; without one the worker uses the server's key and
+    LLM settings) and the task only carries its reference (claim check). Progress can be followed at
+    GET /tasks/{task_id}/events (SSE), results at GET /grade/async/{task_id}.
     """
-    task = grade_exam_task.delay(payload, current_user.id)
-    return {"task_id": task.id, "status": "processing"}
+    job = create_grading_job(db, current_user.id, payload)
+    task = grade_exam_task.delay({"payload_ref": job.payload_ref, "job_id": job.id}, current_user.id)
+    job.task_id = task.id
+    db.commit()
+    return {"task_id": task.id, "job_id": job.id, "status": "processing"}
+
+@router.get("/grade/async/{task_id}")
+def get_grading_job_result(
+    task_id: str,
+    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_db)
+):
+    """
+    批改任务的状态与结果（保存在数据库中，而非 Celery 结果后端）
+    指定了考试名称的任务成绩已保存为 ExamRecord，可通过 /api/history/{exam_id} 查看
+    """
+    job = db.query(GradingJob).filter(GradingJob.task_id == task_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    if job.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "task_id": job.task_id,
+        "job_id": job.id,
+        "status": job.status,
+        "processed": job.processed,
+        "exam_id": job.exam_id,
+        "error": job.error,
+        "records": job.result_json
+    }
 
 @router.get("/tasks/{task_id}")
 def get_task_status(task_id: str):
@@ -24,6 +71,77 @@ def get_task_status(task_id: str):
     result = {
         "task_id": task_id,
         "status": task_result.status,
-        "result": task_result.result
+        "result": task_result.result,
+        "progress": get_progress(task_id)
     }
     return result
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def _celery_final_event(task_id: str) -> Dict[str, Any]:
+    """任务已结束但没有发布完成事件（如 worker 异常）时，按 Celery 状态生成最终事件"""
+    task_result = celery_app.AsyncResult(task_id)
+    status = "completed" if task_result.successful() else "failed"
+    event = {"task_id": task_id, "status": status, "celery_status": task_result.status}
+    if task_result.failed():
+        event["error"] = str(task_result.result)
+    return event
+
+async def _progress_events(task_id: str) -> AsyncIterator[str]:
+    """
+    SSE 事件流:
+        event: progress  data: {students_done, units_done, units_failed, percent, eta_seconds, ...}
+        event: done      data: 最终快照 (status 为 completed / failed)
+    先订阅再读取当前快照，避免错过两者之间发布的事件
+    """
+    client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(PROGRESS_CHANNEL.format(task_id))
+        state = await client.hgetall(PROGRESS_STATE.format(task_id))
+        if state:
+            snapshot = build_snapshot(task_id, state)
+            if snapshot["status"] in FINAL_STATUSES:
+                yield _sse("done", snapshot)
+                return
+            yield _sse("progress", snapshot)
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_INTERVAL)
+            if message is None:
+                if await asyncio.to_thread(lambda: celery_app.AsyncResult(task_id).ready()):
+                    yield _sse("done", await asyncio.to_thread(_celery_final_event, task_id))
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            snapshot = json.loads(message["data"])
+            if snapshot.get("status") in FINAL_STATUSES:
+                yield _sse("done", snapshot)
+                return
+            yield _sse("progress", snapshot)
+    except aioredis.RedisError as e:
+        yield _sse("error", {"task_id": task_id, "detail": f"Progress stream unavailable: {e}"})
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+def _task_known(db: Session, task_id: str) -> bool:
+    """已有进度记录，或是已提交的批改任务（worker 尚未开始上报进度）"""
+    if get_progress(task_id) is not None:
+        return True
+    return db.query(GradingJob.id).filter(GradingJob.task_id == task_id).first() is not None
+
+@router.get("/tasks/{task_id}/events")
+async def stream_task_progress(task_id: str, db: Session = Depends(deps.get_db)):
+    """
+    以 SSE 推送批改任务进度，替代轮询 /tasks/{task_id}
+    未知的 task_id 返回 404（Celery 对未知任务始终报告 PENDING，事件流不会自行结束）
+    """
+    if not await asyncio.to_thread(_task_known, db, task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return StreamingResponse(
+        _progress_events(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,16 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime
+import json
 import time
 from backend.api import deps
 from backend.models.user import User
 from backend.models.exam import Exam
 from backend.models.exam_record import ExamRecord
 from backend.models.old_models import LLMConfig
-from backend.services.llm import batch_generate_questions
+from backend.services.llm import generate_questions_chunked, stream_generated_questions
 from backend.utils.config_utils import read_json, LLM_CONFIG_FILE
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 router = APIRouter()
 
@@ -193,8 +195,9 @@ class GenerateQuestionRequest(BaseModel):
     count: int = 1
 
 @router.post("/generate/questions", response_model=List[Question])
-def generate_questions(
+async def generate_questions(
     req: GenerateQuestionRequest,
+    response: Response,
     current_user: User = Depends(deps.get_current_user)
 ):
     if current_user.role not in ["teacher", "admin", "school_admin"]:
@@ -205,7 +208,8 @@ def generate_questions(
     if not llm_config.api_key:
         raise HTTPException(status_code=500, detail="System LLM configuration is missing API Key")
 
-    success, questions_data, error_msg = batch_generate_questions(
+    # 题量较大时分块并行生成、合并去重；部分分块失败时返回已生成的题目
+    questions_data, errors = await generate_questions_chunked(
         topic=req.topic,
         question_type=req.type,
         difficulty=req.difficulty,
@@ -213,8 +217,13 @@ def generate_questions(
         api_config=llm_config.dict()
     )
 
-    if not success:
-        raise HTTPException(status_code=500, detail=f"LLM Generation failed: {error_msg}")
+    if not questions_data and errors:
+        raise HTTPException(status_code=500, detail=f"LLM Generation failed: {'; '.join(errors)}")
+
+    response.headers["X-Questions-Requested"] = str(req.count)
+    response.headers["X-Questions-Generated"] = str(len(questions_data))
+    if errors:
+        response.headers["X-Generation-Failed-Chunks"] = str(len(errors))
 
     # Map to Question objects and assign temp IDs
     result_questions = []
@@ -225,14 +234,68 @@ def generate_questions(
         if "content" not in q_data:
             continue
 
-        q = Question(
-            id=str(base_id + i),
-            type=q_data.get("type", req.type),
-            content=q_data.get("content", ""),
-            options=q_data.get("options", []),
-            answer=q_data.get("answer", ""),
-            score=q_data.get("score", 5.0)
-        )
-        result_questions.append(q)
+        result_questions.append(_to_question(q_data, str(base_id + i), req.type))
 
     return result_questions
+
+def _to_question(q_data: Dict[str, Any], question_id: str, default_type: str) -> Question:
+    return Question(
+        id=question_id,
+        type=q_data.get("type", default_type),
+        content=q_data.get("content", ""),
+        options=q_data.get("options", []),
+        answer=q_data.get("answer", ""),
+        score=q_data.get("score", 5.0)
+    )
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _question_events(req: GenerateQuestionRequest, api_config: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    SSE 事件流:
+        event: question  data: {Question}       每道题解析完成后立即发送
+        event: error     data: {"detail": ...}  某个分块失败或题目格式错误
+        event: done      data: {"requested": n, "generated": n, "errors": n}
+    """
+    base_id = int(time.time() * 1000)
+    generated, errors = 0, 0
+    async for kind, value in stream_generated_questions(
+        topic=req.topic,
+        question_type=req.type,
+        difficulty=req.difficulty,
+        count=req.count,
+        api_config=api_config
+    ):
+        if kind == "question":
+            try:
+                question = _to_question(value, str(base_id + generated), req.type)
+            except ValidationError as e:
+                errors += 1
+                yield _sse_event("error", {"detail": f"Invalid question: {e.errors()[0]['msg']}"})
+                continue
+            generated += 1
+            yield _sse_event("question", question.model_dump())
+        else:
+            errors += 1
+            yield _sse_event("error", {"detail": value})
+    yield _sse_event("done", {"requested": req.count, "generated": generated, "errors": errors})
+
+@router.post("/generate/questions/stream")
+async def generate_questions_stream(
+    req: GenerateQuestionRequest,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """与 /generate/questions 相同，但以 SSE 流式返回：每生成一道题立即推送，无需等待整批完成"""
+    if current_user.role not in ["teacher", "admin", "school_admin"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    llm_config = read_json(LLM_CONFIG_FILE, LLMConfig)
+    if not llm_config.api_key:
+        raise HTTPException(status_code=500, detail="System LLM configuration is missing API Key")
+
+    return StreamingResponse(
+        _question_events(req, llm_config.model_dump()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
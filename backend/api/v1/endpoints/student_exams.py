@@ -7,6 +7,7 @@ from backend.models.user import User
 from backend.models.exam import Exam
 from backend.models.exam_record import ExamRecord
 from backend.models.student import Student
+from backend.services.exam_answers import replace_record_answers
 
 router = APIRouter()
 
@@ -158,6 +159,8 @@ def submit_exam(
         machine_id="online" # Marker for online exam
     )
     db.add(record)
+    db.flush()
+    replace_record_answers(db, exam.id, [(record.id, graded_details, None)])
     db.commit()
 
     return {"message": "Submitted successfully", "score": total_score}
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 
@@ -7,6 +8,8 @@ from backend.models.user import User
 from backend.models.exam import Exam
 from backend.models.section import ExamSection
 from backend.models.exam_record import ExamRecord
+from backend.models.exam_answer import ExamAnswer
+from backend.services.exam_answers import STATUS_PENDING, answer_rows, backfill_marker
 from backend.db.session import SessionLocal
 
 router = APIRouter()
@@ -26,72 +29,52 @@ def get_pending_tasks(
         return []
 
     tasks = []
+    # 只有建表前保存、尚未回填的记录可能缺少逐题行；回填完成后区间为空，不再读取 details_json
+    marker = backfill_marker(db)
+    legacy_range = (marker.backfilled_record_id, marker.legacy_max_record_id)
 
     for section in my_sections:
         # Get Exam
         exam = db.query(Exam).filter(Exam.id == section.exam_id).first()
         if not exam: continue
 
-        # Get all records for this exam
-        records = db.query(ExamRecord).filter(ExamRecord.exam_id == exam.id).all()
-
-        pending_records = []
-        for rec in records:
-            details = rec.details_json or {}
-            if isinstance(details, str): continue # Skip malformed
-
-            # Check questions in this section
-            # Heuristic: section_index i corresponds to section_id "i+1" in details keys like "1-1"
-            # We stored section_index in ExamSection (0-based)
-            sec_prefix = f"{section.section_index + 1}-"
-
-            # Check if any question in this section is not graded (score is 0 and comment is empty/default?)
-            # Or better: check for specific "pending" flag if we set it.
-            # Currently logic: if we find a key like "1-1" and it has no score or explicitly marked pending.
-
-            is_pending = False
-            for key, val in details.items():
-                if key.startswith(sec_prefix):
-                    # Check status
-                    # If val is float (score), it's graded (maybe 0).
-                    # If val is dict (advanced), check 'score'.
-                    # Wait, in grade.py we stored record as flat: Q1-1 = score, Q1-1_comment = ...
-                    # Or we stored it as simple key-value.
-
-                    # Let's assume fetching "pending" means looking for items where we expect a score but don't have one?
-                    # Actually, for subjective questions, we might have set Q1-1 = 0 and Q1-1_comment = "⏳ 待批改"
-
-                    comment_key = f"Q{key}_comment" # History router saves it as Q{key}... wait
-                    # History router saves: details_json = {k: v ...}
-                    # calculate_score returns: record['Q1-1'] = score, record['Q1-1_comment'] = ...
-
-                    # So in details_json, we look for 'Q{sec_prefix}...'
-                    # Wait, ExamRecord.details_json stores what calculate_score returns.
-
-                    q_key = f"Q{key}" # e.g. Q1-1
-                    # But keys in details_json might vary depending on how they were saved.
-                    # Let's look for any key containing the prefix.
-
-                    # Actually, let's look for the comment field indicating pending.
-                    # In grade.py: record[f'Q{q_key}_comment'] = '⏳ 待批改'
-
-                    pass
-
-            # Scan details for "待批改"
-            for k, v in details.items():
-                if str(v) == "⏳ 待批改":
-                    # Check if this key belongs to my section
-                    # k is like "Q1-1_comment"
-                    if k.startswith(f"Q{sec_prefix}"):
-                        is_pending = True
-                        break
-
-            if is_pending:
-                pending_records.append({
-                    "record_id": rec.id,
-                    "student_id": rec.student_id,
-                    "student_name": rec.student_name
-                })
+        # section_index (0-based) corresponds to section_id "i+1" in question keys like "1-1"
+        section_id = str(section.section_index + 1)
+        # 待批改的题目在 exam_answers 中按 (exam_id, section_id, status) 建有索引，无需扫描 details_json
+        pending = db.query(
+            ExamRecord.id, ExamRecord.student_id, ExamRecord.student_name
+        ).filter(
+            ExamRecord.id.in_(
+                db.query(ExamAnswer.record_id).filter(
+                    ExamAnswer.exam_id == exam.id,
+                    ExamAnswer.section_id == section_id,
+                    ExamAnswer.status == STATUS_PENDING
+                )
+            )
+        ).all()
+
+        # 尚未回填逐题行的旧记录（见 scripts/backfill_exam_answers.py）仍从 details_json 判断
+        legacy = []
+        if legacy_range[0] < legacy_range[1]:
+            legacy = db.query(
+                ExamRecord.id, ExamRecord.student_id, ExamRecord.student_name, ExamRecord.details_json
+            ).filter(
+                ExamRecord.exam_id == exam.id,
+                ExamRecord.id > legacy_range[0],
+                ExamRecord.id <= legacy_range[1],
+                ~exists().where(ExamAnswer.record_id == ExamRecord.id)
+            )
+        for record_id, student_id, student_name, details in legacy:
+            if any(
+                row["section_id"] == section_id and row["status"] == STATUS_PENDING
+                for row in answer_rows(details)
+            ):
+                pending.append((record_id, student_id, student_name))
+
+        pending_records = [
+            {"record_id": record_id, "student_id": student_id, "student_name": student_name}
+            for record_id, student_id, student_name in sorted(pending)
+        ]
 
         if pending_records:
             tasks.append({
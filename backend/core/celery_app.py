@@ -4,9 +4,10 @@ from backend.core.config import settings
 celery_app = Celery(
     "worker",
     broker=settings.CELERY_BROKER_URL,
-    backend=settings.CELERY_RESULT_BACKEND
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["backend.tasks.grading"]
 )
 
 celery_app.conf.task_routes = {
-    "backend.tasks.grading.grade_exam_task": "main-queue",
+    "backend.tasks.grading.*": "main-queue",
 }
@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     DB_PORT: int = 3306
     DB_NAME: str = "grade_system"
     USE_SQLITE: bool = True
+    HISTORY_SAVE_CHUNK_SIZE: int = 500 # records per bulk delete/insert + commit when saving exam records
 
     # Storage
     STORAGE_TYPE: str = "local" # local, s3, minio
@@ -28,11 +29,43 @@ class Settings(BaseSettings):
     S3_ACCESS_KEY: Optional[str] = None
     S3_SECRET_KEY: Optional[str] = None
     S3_ENDPOINT_URL: Optional[str] = None
+    STAGED_BATCH_TTL: int = 60 * 60 * 24 # seconds a staged upload batch is kept after its last upload
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Answer sheet parsing
+    PARSE_EXECUTOR: str = "process" # process, thread
+    PARSE_WORKERS: int = 0 # 0 = number of CPU cores
+    PARSE_CACHE_SIZE: int = 5000 # parsed sheets kept in the in-process LRU
+    PARSE_CACHE_REDIS: bool = False # also share parse results through Redis
+    PARSE_CACHE_TTL: int = 60 * 60 * 24 * 7 # 1 week
+    PIPELINE_BATCH_SIZE: int = 50 # max students per match/grade/save step in the upload pipeline
+
+    # Student matching
+    FUZZY_MATCH_THRESHOLD: float = 0.85 # minimum confidence for a fuzzy roster match
+    FUZZY_MAX_NUMBER_DISTANCE: int = 1 # max edits (incl. swaps) tolerated in a student number
+
+    # LLM client
+    LLM_API_KEY: Optional[str] = None # server-side key for background grading, falls back to the saved LLM settings
+    LLM_MAX_CONCURRENCY: int = 16 # in-flight LLM requests per event loop
+    LLM_MAX_CONNECTIONS: int = 32 # pooled keep-alive connections
+    LLM_TIMEOUT: float = 60.0
+    LLM_RATE_LIMIT_RPM: int = 0 # requests/min per provider, 0 = unlimited
+    LLM_RATE_LIMIT_TPM: int = 0 # tokens/min per provider, 0 = unlimited
+    LLM_MAX_RETRIES: int = 4 # retries on 429 / 5xx / network errors
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 30.0
+    LLM_GRADING_PACK_SIZE: int = 8 # answers to the same question per grading prompt (1 = one per request)
+    LLM_CACHE_SIZE: int = 10000 # graded answers kept in the in-process LRU
+    LLM_CACHE_REDIS: bool = True # also persist graded answers in Redis
+    LLM_CACHE_TTL: int = 60 * 60 * 24 * 30 # 30 days
+    FEW_SHOT_CACHE_TTL: int = 60 # max age of cached few-shot examples, bounds staleness when Redis is unavailable
+    LLM_GENERATION_CHUNK_SIZE: int = 5 # questions per generation request, larger counts fan out in parallel
+    LLM_GENERATION_DEDUP_THRESHOLD: float = 0.8 # bigram Jaccard similarity above which questions count as duplicates
+
     # Celery
+    GRADING_CHUNK_SIZE: int = 200 # students per grading subtask, larger exams fan out across workers
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
 
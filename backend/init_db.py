@@ -6,11 +6,17 @@ from backend.models.user import User
 from backend.models.school import School
 from backend.models.exam import Exam
 from backend.models.exam_record import ExamRecord
+from backend.models.exam_answer import ExamAnswer, ExamAnswerBackfill
 from backend.models.class_ import Class
 from backend.models.student import Student
 from backend.models.section import ExamSection
+from backend.models.few_shot import GradingExample
+from backend.models.checkpoint import GradingCheckpoint
+from backend.models.grading_job import GradingJob, GradingStagedObject
+from backend.models.staged_batch import StagedBatch, StagedSheet
 
 from backend.core.security import get_password_hash
+from backend.services.exam_answers import backfill_marker
 
 def init_db():
     print("Creating tables...")
@@ -68,6 +74,9 @@ def init_db():
             db.commit()
             print("Updated admin user with default school.")
 
+    # 记录 exam_answers 建表时的回填边界（见 scripts/backfill_exam_answers.py）
+    backfill_marker(db)
+
     db.close()
 
 if __name__ == "__main__":
@@ -4,9 +4,11 @@ from contextlib import asynccontextmanager
 import uvicorn
 import logging
 
-from backend.routers import config, upload, grade, history, settings
+from backend.routers import config, upload, grade, history, settings, examples, pipeline
 from backend.api.v1.endpoints import auth, classes, students, sections, tasks, async_tasks, exams, student_exams
 from backend.init_db import init_db
+from backend.services.parsing import shutdown_parse_executor
+from backend.services.llm_client import close_async_llm_client
 
 # Lifespan context to run startup tasks
 @asynccontextmanager
@@ -21,6 +23,8 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     print("Shutting down...")
+    shutdown_parse_executor()
+    await close_async_llm_client()
 
 app = FastAPI(title="Smart Grading System Pro API", lifespan=lifespan)
 
@@ -53,6 +57,8 @@ app.include_router(upload.router)
 app.include_router(grade.router)
 app.include_router(history.router)
 app.include_router(settings.router)
+app.include_router(examples.router)
+app.include_router(pipeline.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from backend.db.base import Base
+
+class GradingCheckpoint(Base):
+    """批改任务中单个 (学生, 题目) 的 LLM 批改结果，任务中断后重跑时跳过已完成的部分"""
+    __tablename__ = "grading_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_key = Column(String(64), index=True, nullable=False)
+    student_id = Column(String(50), nullable=False)
+    question_key = Column(String(50), nullable=False)
+    # 学生答案的哈希，答案变化后检查点失效
+    answer_hash = Column(String(64), nullable=False)
+
+    score = Column(Float, nullable=False)
+    comment = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("job_key", "student_id", "question_key", name="uq_grading_checkpoint_unit"),
+    )
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, Index
+from backend.db.base import Base
+
+class ExamAnswer(Base):
+    """
+    成绩记录中单道题的答案、得分、评语与批改状态（与 ExamRecord.details_json 同步写入）
+    待批改查询、统计等按题目/大题筛选时直接走索引，无需加载并扫描 JSON
+    """
+    __tablename__ = "exam_answers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    record_id = Column(Integer, ForeignKey("examrecord.id", ondelete="CASCADE"), nullable=False, index=True)
+    # 冗余保存考试 ID，便于按 (考试, 大题, 状态) 建索引
+    exam_id = Column(Integer, ForeignKey("exam.id"), nullable=False)
+    question_key = Column(String(50), nullable=False) # e.g. "1-1"
+    section_id = Column(String(50), nullable=True)
+
+    answer = Column(Text, nullable=True)
+    score = Column(Float, default=0.0)
+    comment = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default="graded") # graded, pending
+
+    __table_args__ = (
+        Index("ix_exam_answers_exam_section_status", "exam_id", "section_id", "status"),
+    )
+
+
+class ExamAnswerBackfill(Base):
+    """
+    exam_answers 的回填进度（单行，由 init_db 在建表时写入）
+    建表前保存的记录（id <= legacy_max_record_id）才可能缺少逐题行；回填脚本处理完后推进 backfilled_record_id，
+    待批改查询只对两者之间、尚无逐题行的记录回退到 details_json
+    """
+    __tablename__ = "exam_answer_backfills"
+
+    id = Column(Integer, primary_key=True)
+    legacy_max_record_id = Column(Integer, nullable=False, default=0)
+    backfilled_record_id = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from backend.db.base import Base
+
+class GradingExample(Base):
+    """主观题评分示例 (Few-Shot)，按学校、考试名称与题号 (如 "1-1") 索引；不同学校的同名考试互不可见"""
+    __tablename__ = "grading_examples"
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, ForeignKey("school.id"), nullable=True) # 与 Exam 相同，未绑定学校的用户为 NULL
+    exam_name = Column(String(255), nullable=False)
+    question_key = Column(String(50), nullable=False)
+
+    student_answer = Column(Text, nullable=False)
+    score = Column(Float, nullable=False)
+    comment = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_grading_examples_school_exam_question", "school_id", "exam_name", "question_key"),
+    )
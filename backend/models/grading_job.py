@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, JSON, DateTime
+from sqlalchemy.sql import func
+from backend.db.base import Base
+
+class GradingJob(Base):
+    """异步批改任务：请求数据与中间结果暂存在 grading_staged_objects 中，这里只保存引用、状态与最终结果"""
+    __tablename__ = "grading_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(String(64), unique=True, index=True, nullable=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    exam_name = Column(String(255), nullable=True)
+
+    # Status: queued, running, completed, failed
+    status = Column(String(20), default="queued")
+    payload_ref = Column(String(255), nullable=True) # Ref of the staged request payload
+    processed = Column(Integer, default=0)
+    exam_id = Column(Integer, ForeignKey("exam.id"), nullable=True)
+
+    # 未指定考试名称（不保存为 ExamRecord）时，成绩记录保存在这里
+    result_json = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class GradingStagedObject(Base):
+    """
+    批改任务的暂存数据（请求、共享上下文、学生分块、分块成绩），Celery 消息中只传 ref
+    存在数据库中，API 与 worker 无需共享文件存储；任务结束后删除
+    """
+    __tablename__ = "grading_staged_objects"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ref = Column(String(64), unique=True, index=True, nullable=False)
+    kind = Column(String(20), nullable=False) # payload, context, chunk, result
+    data = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
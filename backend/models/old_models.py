@@ -22,6 +22,8 @@ class LLMConfig(BaseModel):
     model: str
     temperature: float = 0.3
     max_tokens: int = 500
+    rpm: Optional[int] = None # 服务商限额，未设置时使用系统默认
+    tpm: Optional[int] = None
 
 class FewShotExample(BaseModel):
     student_answer: str
@@ -37,6 +39,20 @@ class SubjectiveGradingRequest(BaseModel):
     grading_criteria: Optional[str] = None
     llm_config: LLMConfig
     examples: Optional[List[FewShotExample]] = None
+    exam_name: Optional[str] = None # 未提供 examples 时按 (exam_name, question_key) 读取已保存的示例
+
+class SubjectiveBatchGradingRequest(BaseModel):
+    # 同一道题的多份学生答案，并发批改
+    question_text: str
+    reference_answer: str
+    student_answers: List[str]
+    max_score: float
+    grading_criteria: Optional[str] = None
+    llm_config: LLMConfig
+    examples: Optional[List[FewShotExample]] = None
+    pack_size: Optional[int] = None # 每次请求合并批改的答案数，默认取系统配置
+    exam_name: Optional[str] = None # 同上，未提供 examples 时读取已保存的示例
+    question_key: Optional[str] = None
 
 class GradingResult(BaseModel):
     score: float
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime
+from sqlalchemy.sql import func
+from backend.db.base import Base
+
+class StagedBatch(Base):
+    """服务端暂存的一批已解析答卷与标准答案，评分/重评/异步评分时按 batch_id 引用"""
+    __tablename__ = "staged_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String(32), unique=True, index=True, nullable=False) # Public, unguessable id
+    # 只有上传者本人可以读取、评分或删除批次
+    user_id = Column(Integer, ForeignKey("user.id"), index=True, nullable=False)
+
+    # 创建批次时的考试配置快照，保证评分时与解析时使用同一配置
+    config = Column(JSON, nullable=True)
+    standard_key = Column(JSON, nullable=True)
+    standard_path = Column(String(512), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # 每次写入批次时顺延（STAGED_BATCH_TTL），过期批次在创建新批次时清理
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+class StagedSheet(Base):
+    """批次中的一份已解析学生答卷"""
+    __tablename__ = "staged_sheets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(Integer, ForeignKey("staged_batches.id"), index=True, nullable=False)
+    filename = Column(String(255), nullable=True)
+    storage_path = Column(String(512), nullable=True)
+    data = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends
+from typing import List, Dict
+from sqlalchemy.orm import Session
+from backend.api import deps
+from backend.models.user import User
+from backend.models.old_models import FewShotExample
+from backend.services import few_shot
+
+router = APIRouter(prefix="/api/examples", tags=["examples"])
+
+@router.get("/{exam_name}")
+async def get_exam_examples(
+    exam_name: str,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Dict[str, List[Dict]]:
+    """本校整场考试的评分示例: {题号: [示例, ...]}"""
+    return few_shot.get_exam_examples(db, current_user.school_id, exam_name)
+
+@router.post("/{exam_name}")
+async def save_exam_examples(
+    exam_name: str,
+    examples: Dict[str, List[FewShotExample]],
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """按题号批量替换评分示例，未出现的题号保持不变"""
+    for question_key, items in examples.items():
+        few_shot.replace_examples(db, current_user.school_id, exam_name, question_key, [ex.model_dump() for ex in items])
+    return {"message": "Examples saved", "questions": len(examples)}
+
+@router.get("/{exam_name}/{question_key}")
+async def get_question_examples(
+    exam_name: str,
+    question_key: str,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> List[Dict]:
+    return few_shot.get_examples(db, current_user.school_id, exam_name, question_key)
+
+@router.put("/{exam_name}/{question_key}")
+async def replace_question_examples(
+    exam_name: str,
+    question_key: str,
+    examples: List[FewShotExample],
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> List[Dict]:
+    return few_shot.replace_examples(
+        db, current_user.school_id, exam_name, question_key, [ex.model_dump() for ex in examples]
+    )
+
+@router.delete("/{exam_name}/{question_key}")
+async def delete_question_examples(
+    exam_name: str,
+    question_key: str,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    deleted = few_shot.delete_examples(db, current_user.school_id, exam_name, question_key)
+    return {"message": "Examples deleted", "deleted": deleted}
@@ -1,14 +1,18 @@
 from fastapi import APIRouter, HTTPException, Body, Depends
 from fastapi.responses import Response
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from backend.models.old_models import StudentData, ExamConfig, SubjectiveGradingRequest, GradingResult
-from backend.services.core import calculate_score
-from backend.services.llm import grade_subjective_question
+from backend.models.old_models import (
+    StudentData, ExamConfig, SubjectiveGradingRequest, SubjectiveBatchGradingRequest, GradingResult
+)
+from backend.services.llm import grade_subjective_question_async, grade_subjective_batch
+from backend.services.llm_cache import grading_cache_stats
 from backend.utils import generate_excel_bytes
 from backend.api import deps
 from backend.models.user import User
-from backend.services.matching import MatchService
+from backend.services.grading import grade_students, match_payload_students
+from backend.services.few_shot import get_examples
+from backend.services.staging import StagedBatchNotFound, resolve_payload
 
 router = APIRouter(prefix="/api/grade", tags=["grade"])
 
@@ -30,6 +34,7 @@ async def export_grades(data: List[Dict] = Body(...)):
 @router.post("/batch")
 async def batch_grade(
     payload: Dict[str, Any] = Body(...),
+    include_match_report: bool = False,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
@@ -41,7 +46,16 @@ async def batch_grade(
         "config": exam_config_object,
         "llm_results": {student_id: {q_key: {score, comment}}} (Optional)
     }
+    或引用上传时暂存的批次 (?stage=true 返回的 batch_id)，无需再次提交答卷:
+    {"batch_id": "...", "llm_results": {...}}，显式提供的字段优先于批次中的数据
+    include_match_report=true 时返回 {"records": [...], "match_report": {...}}，
+    报告中列出未匹配与姓名重名(歧义)的学生
     """
+    try:
+        payload = resolve_payload(db, payload, current_user.id)
+    except StagedBatchNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
     students = payload.get("students", [])
     standard_key = payload.get("standard_key", {})
     config_data = payload.get("config", {})
@@ -50,56 +64,72 @@ async def batch_grade(
     if not students or not standard_key or not config_data:
         raise HTTPException(status_code=400, detail="Missing required data")
 
-    # Initialize MatchService
-    matcher = None
-    if current_user.school_id:
-        matcher = MatchService(db, current_user.school_id)
-
     sections = config_data.get("sections", [])
-    graded_results = []
-
-    for student in students:
-        # Match Student against DB if school context exists
-        if matcher:
-            ocr_id = student.get("学号")
-            ocr_name = student.get("姓名")
-            matched_student = matcher.match_student(ocr_id, ocr_name)
-            if matched_student:
-                # Update info from DB source of truth
-                student["学号"] = matched_student.student_number
-                student["姓名"] = matched_student.name
-                student["_db_id"] = matched_student.id
-            else:
-                student["_db_match"] = False
 
-        # Get student's specific LLM results if any
-        student_llm_data = None
-        student_id = student.get("学号")
-        if student_id and student_id in llm_results:
-             student_llm_data = llm_results[student_id]
+    # Match Students against DB if school context exists (花名册只加载一次)
+    match_report = match_payload_students(db, current_user.school_id, students)
+    records = await grade_students(students, standard_key, sections, llm_results)
+    if include_match_report:
+        return {"records": records, "match_report": match_report}
+    return records
 
-        s_llm = student.get("llm_graded", {})
-        if student_llm_data:
-            s_llm.update(student_llm_data)
-
-        result = calculate_score(student, standard_key, sections, s_llm)
-        graded_results.append(result)
-
-    return graded_results
+def _request_examples(request, question_key, db: Session, user: Optional[User]):
+    """请求中带了示例则直接使用，否则按考试名称与题号读取本校已保存的示例（需登录）"""
+    if request.examples:
+        return [ex.model_dump() for ex in request.examples]
+    if user is None:
+        return None
+    return get_examples(db, user.school_id, request.exam_name, question_key) or None
 
 @router.post("/subjective", response_model=GradingResult)
-async def grade_subjective(request: SubjectiveGradingRequest):
-    success, score, comment = grade_subjective_question(
+async def grade_subjective(
+    request: SubjectiveGradingRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+):
+    success, score, comment = await grade_subjective_question_async(
         question_text=request.question_text,
         reference_answer=request.reference_answer,
         student_answer=request.student_answer,
         max_score=request.max_score,
         grading_criteria=request.grading_criteria,
         api_config=request.llm_config.model_dump(),
-        examples=[ex.model_dump() for ex in request.examples] if request.examples else None
+        examples=_request_examples(request, request.question_key, db, current_user)
     )
 
     if not success:
         return GradingResult(score=0.0, comment=f"Error: {comment}")
 
     return GradingResult(score=score, comment=comment)
+
+@router.post("/subjective/batch", response_model=List[GradingResult])
+async def grade_subjective_answers(
+    request: SubjectiveBatchGradingRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+):
+    """同一道题的多份答案合并、并发批改，结果顺序与 student_answers 一致"""
+    examples = _request_examples(request, request.question_key, db, current_user)
+    items = [
+        {
+            "question_text": request.question_text,
+            "reference_answer": request.reference_answer,
+            "student_answer": answer,
+            "max_score": request.max_score,
+            "grading_criteria": request.grading_criteria,
+            "examples": examples
+        }
+        for answer in request.student_answers
+    ]
+    results = await grade_subjective_batch(items, request.llm_config.model_dump(), request.pack_size)
+
+    return [
+        GradingResult(score=score, comment=comment) if success
+        else GradingResult(score=0.0, comment=f"Error: {comment}")
+        for success, score, comment in results
+    ]
+
+@router.get("/subjective/cache")
+async def get_grading_cache_stats():
+    """主观题批改缓存命中统计 (进程级)"""
+    return grading_cache_stats.as_dict()
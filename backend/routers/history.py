@@ -8,6 +8,8 @@ from backend.models.user import User
 from backend.models.exam_record import ExamRecord
 from backend.models.exam import Exam
 from backend.utils import generate_excel_bytes
+from backend.services.history import save_exam_records
+from backend.services.exam_answers import delete_exam_answers
 import json
 import pandas as pd
 import io
@@ -117,57 +119,7 @@ async def save_history(
     if not records:
         return {"message": "No records to save"}
 
-    # Find or Create Exam
-    # Only within the user's school
-    query = db.query(Exam).filter(Exam.name == exam_name)
-    if current_user.school_id:
-        query = query.filter(Exam.school_id == current_user.school_id)
-
-    exam = query.first()
-
-    if not exam:
-        # Create new exam
-        exam = Exam(
-            name=exam_name,
-            creator_id=current_user.id,
-            school_id=current_user.school_id if current_user.school_id else 1, # Fallback to default school
-            status="finished"
-        )
-        db.add(exam)
-        db.commit()
-        db.refresh(exam)
-
-    # Process Records
-    count = 0
-    for rec_data in records:
-        student_id = rec_data.get("学号") or rec_data.get("student_id")
-        if not student_id:
-            continue
-
-        student_name = rec_data.get("姓名") or rec_data.get("student_name")
-        machine_id = rec_data.get("机号") or rec_data.get("machine_id")
-        total_score = rec_data.get("总分") or rec_data.get("total_score")
-
-        # Details: everything else
-        details = {k: v for k, v in rec_data.items() if k not in ["学号", "student_id", "姓名", "student_name", "机号", "machine_id", "总分", "total_score"]}
-
-        # Check if record exists for this student in this exam?
-        # For simplicity, we can delete old ones or update.
-        # Let's delete old one first for this student/exam combo
-        db.query(ExamRecord).filter(ExamRecord.exam_id == exam.id, ExamRecord.student_id == student_id).delete()
-
-        new_record = ExamRecord(
-            exam_id=exam.id,
-            student_id=str(student_id),
-            student_name=student_name,
-            machine_id=str(machine_id),
-            total_score=float(total_score) if total_score is not None else 0.0,
-            details_json=details
-        )
-        db.add(new_record)
-        count += 1
-
-    db.commit()
+    exam, count = save_exam_records(db, exam_name, records, current_user)
     return {"message": f"Saved {count} records for exam '{exam_name}' (ID: {exam.id})"}
 
 @router.delete("/{exam_id}")
@@ -184,6 +136,7 @@ async def delete_history(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Delete records first
+    delete_exam_answers(db, exam_id)
     db.query(ExamRecord).filter(ExamRecord.exam_id == exam_id).delete()
     db.delete(exam)
     db.commit()
@@ -0,0 +1,67 @@
+import json
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Tuple, AsyncIterator
+from backend.api import deps
+from backend.models.user import User
+from backend.models.old_models import ExamConfig, ParserConfig
+from backend.routers.config import get_config
+from backend.routers.settings import get_parser_config
+from backend.routers.upload import NDJSON_MEDIA_TYPE, _wants_ndjson
+from backend.services.core import decode_sheet, parse_text_content
+from backend.services.pipeline import GradingPipeline
+from backend.services.storage import get_storage_service, BaseStorage
+
+router = APIRouter(prefix="/api/pipeline", tags=["pipeline"])
+
+async def _iter_sheets(files: List[UploadFile]) -> AsyncIterator[Tuple[str, bytes]]:
+    # 按需读取，只有进入解析窗口的答卷才会读入内存；UploadFile.read 在线程池中读取，不阻塞事件循环
+    for file in files:
+        yield file.filename, await file.read()
+
+async def _ndjson_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"done": True, "error": str(e)}, ensure_ascii=False) + "\n"
+
+@router.post("/jobs")
+async def run_pipeline_job(
+    request: Request,
+    standard: UploadFile = File(..., description="标准答案文件"),
+    files: List[UploadFile] = File(..., description="学生答卷"),
+    exam_name: str = Form(...),
+    stream: bool = Query(False, description="以 NDJSON 流返回各阶段的进度"),
+    config: ExamConfig = Depends(get_config),
+    parser_config: ParserConfig = Depends(get_parser_config),
+    storage: BaseStorage = Depends(get_storage_service),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    一次请求完成 上传 → 解析 → 匹配 → 计分 → 保存
+    各阶段流水线执行：已解析的答卷按批匹配、计分并入库，不必等待全部答卷解析完成。
+    返回各阶段的处理条数与耗时；主观题不调用 LLM，保持“待批改”，可稍后在待批改任务中处理。
+    """
+    config_dicts = [s.model_dump() for s in config.sections]
+    parser_config_dict = parser_config.model_dump()
+
+    content_bytes = await standard.read()
+    status, standard_key = parse_text_content(decode_sheet(content_bytes), config_dicts, parser_config_dict)
+    if not status:
+        raise HTTPException(status_code=400, detail=standard_key)
+    standard.file.seek(0)
+    storage.save_file(standard.file, f"standard_{standard.filename}")
+
+    pipeline = GradingPipeline(current_user, exam_name, standard_key, config_dicts, parser_config_dict, storage)
+    events = pipeline.run(_iter_sheets(files))
+
+    if _wants_ndjson(request, stream):
+        return StreamingResponse(_ndjson_events(events), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        async for event in events:
+            summary = event
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return summary
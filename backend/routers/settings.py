@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from backend.models.old_models import DBConfig, LLMConfig, ParserConfig
 from backend.database import reload_engine
+from backend.services.rate_limit import limiter_stats, reset_provider_limiter
 from backend.utils.config_utils import (
     read_json, write_json,
     DB_CONFIG_FILE, LLM_CONFIG_FILE, PARSER_CONFIG_FILE
@@ -32,10 +33,16 @@ async def get_llm_config():
 async def save_llm_config(config: LLMConfig):
     try:
         write_json(LLM_CONFIG_FILE, config)
+        reset_provider_limiter(config.model_dump())
         return config
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/llm/limits")
+async def get_llm_limits():
+    """各 LLM 服务商当前的自适应并发上限、限流与重试次数"""
+    return limiter_stats()
+
 # --- Parser Settings ---
 @router.get("/parser", response_model=ParserConfig)
 async def get_parser_config():
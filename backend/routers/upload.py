@@ -1,20 +1,65 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List, Dict, Any
-from backend.services.core import parse_text_content
+import asyncio
+import io
+import json
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Awaitable, AsyncIterator, Optional
+from backend.services.core import parse_text_content, parse_plan_key
+from backend.services.parsing import parse_sheet_cached, ParseCacheStats
+from backend.services.archive import iter_archive_sheets, safe_member_filename, ArchiveError
 from backend.models.old_models import ExamConfig, ParserConfig
 from backend.routers.config import get_config
 from backend.routers.settings import get_parser_config
 from backend.services.storage import get_storage_service, BaseStorage
+from backend.services.staging import (
+    StagedBatchNotFound, batch_summary, delete_batch, get_batch, get_or_create_batch, stage_sheets, stage_standard_key
+)
+from backend.api import deps
+from backend.models.staged_batch import StagedBatch
+from backend.models.user import User
+from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# 同时处理的答卷数上限，限制内存中驻留的答卷数量
+STREAM_WINDOW = 16
+
+STAGE_QUERY = Query(False, description="在服务端暂存解析结果，返回 batch_id 供评分接口引用（需登录）")
+BATCH_ID_QUERY = Query(None, description="追加到已有的暂存批次")
+
+def _open_batch(
+    db: Session, stage: bool, batch_id: Optional[str], config: ExamConfig, user: Optional[User]
+) -> Tuple[Optional[StagedBatch], ExamConfig]:
+    """
+    暂存模式下打开（或新建）当前用户的批次，返回 (批次, 解析所用的考试配置)
+    追加到已有批次时按批次创建时的配置快照解析，避免同一批次中的答卷按不同配置解析
+    """
+    if not stage and not batch_id:
+        return None, config
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        staged_batch = get_or_create_batch(db, batch_id, config.model_dump(), user.id)
+    except StagedBatchNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if staged_batch.config:
+        config = ExamConfig.model_validate(staged_batch.config)
+    return staged_batch, config
+
 @router.post("/standard")
 async def upload_standard_answer(
     file: UploadFile = File(...),
+    stage: bool = STAGE_QUERY,
+    batch_id: Optional[str] = BATCH_ID_QUERY,
     config: ExamConfig = Depends(get_config),
     parser_config: ParserConfig = Depends(get_parser_config),
-    storage: BaseStorage = Depends(get_storage_service)
+    storage: BaseStorage = Depends(get_storage_service),
+    db: Session = Depends(deps.get_db),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
 ):
+    staged_batch, config = _open_batch(db, stage, batch_id, config, current_user)
     try:
         content_bytes = await file.read()
 
@@ -35,45 +80,240 @@ async def upload_standard_answer(
         if not status:
             raise HTTPException(status_code=400, detail=data)
 
-        return {"filename": file.filename, "storage_path": filename, "data": data}
+        result = {"filename": file.filename, "storage_path": filename, "data": data}
+        if staged_batch is not None:
+            stage_standard_key(db, staged_batch, data, filename)
+            result["batch_id"] = staged_batch.batch_id
+        return result
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class _SheetBatch:
+    """
+    一次上传请求内共享的状态：存储、解析配置、解析计划键与缓存命中统计
+    """
+
+    def __init__(
+        self, storage: BaseStorage, config: ExamConfig, parser_config: ParserConfig,
+        db: Session = None, staged_batch=None
+    ):
+        self.storage = storage
+        # 暂存模式下，解析成功的答卷在批次结束时一次性写入 staged_sheets
+        self.db = db
+        self.staged_batch = staged_batch
+        self.config_dicts = [s.model_dump() for s in config.sections]
+        self.parser_config_dict = parser_config.model_dump()
+        # 整个批次共用同一个解析计划键，作为内容哈希缓存键的一部分
+        self.plan_key = parse_plan_key(self.config_dicts, self.parser_config_dict)
+        self.cache_stats = ParseCacheStats()
+
+    async def process_sheet(self, filename: str, content_bytes: bytes, saved_filename: str) -> Tuple[bool, Dict[str, Any]]:
+        """
+        保存并解析一份学生答卷
+        返回: (status, 成功结果或错误信息)，与 /students 响应中的条目格式一致
+        """
+        try:
+            # Save file (blocking I/O, keep it off the event loop)
+            await run_in_threadpool(self.storage.save_file, io.BytesIO(content_bytes), saved_filename)
+
+            # Decode + parse in the shared process pool (skipped on cache hit)
+            status, data = await parse_sheet_cached(
+                content_bytes, self.config_dicts, self.parser_config_dict,
+                plan_key=self.plan_key, stats=self.cache_stats
+            )
+            if status:
+                return True, {"filename": filename, "storage_path": saved_filename, "data": data}
+            return False, {"filename": filename, "error": data}
+        except Exception as e:
+            return False, {"filename": filename, "error": str(e)}
+
+    async def process_file(self, file: UploadFile) -> Tuple[bool, Dict[str, Any]]:
+        try:
+            content_bytes = await file.read()
+        except Exception as e:
+            return False, {"filename": file.filename, "error": str(e)}
+        return await self.process_sheet(file.filename, content_bytes, f"student_{file.filename}")
+
+    def archive_jobs(
+        self,
+        archive_name: str,
+        members: Iterator[Tuple[str, Optional[bytes], Optional[str]]]
+    ) -> Iterator[Awaitable[Tuple[bool, Dict[str, Any]]]]:
+        try:
+            for name, content_bytes, error in members:
+                if error is not None:
+                    yield _failed(name, error)
+                    continue
+                saved_filename = f"student_{safe_member_filename(name)}"
+                yield self.process_sheet(name, content_bytes, saved_filename)
+        except Exception as e:
+            # 压缩包中途损坏：已读取的文件照常返回，剩余部分记为一条错误
+            yield _failed(archive_name, f"压缩包读取失败: {e}")
+
+    def stage(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """暂存解析成功的答卷，返回需要合并到响应中的字段"""
+        if self.staged_batch is None:
+            return {}
+        staged = stage_sheets(self.db, self.staged_batch, results)
+        return {"batch_id": self.staged_batch.batch_id, "staged": staged}
+
+async def _failed(filename: str, error: str) -> Tuple[bool, Dict[str, Any]]:
+    return False, {"filename": filename, "error": error}
+
+def _wants_ndjson(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def _iter_completed(
+    jobs: Iterable[Awaitable[Tuple[bool, Dict[str, Any]]]],
+    limit: int
+) -> AsyncIterator[Tuple[int, bool, Dict[str, Any]]]:
+    """
+    并发执行 jobs（同时最多 limit 个），按完成顺序产出 (输入序号, status, 结果)
+    jobs 按需取用，未启动的任务不会提前读入内存
+    """
+    pending = {}
+    job_iter = enumerate(jobs)
+    exhausted = False
+
+    while True:
+        while not exhausted and len(pending) < limit:
+            try:
+                index, job = next(job_iter)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[asyncio.ensure_future(job)] = index
+        if not pending:
+            return
+
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index = pending.pop(task)
+            status, item = task.result()
+            yield index, status, item
+
+async def _collect_results(jobs: Iterable[Awaitable[Tuple[bool, Dict[str, Any]]]], batch: _SheetBatch) -> Dict[str, Any]:
+    """
+    非流式模式：汇总全部结果，按输入顺序返回
+    {"success": [...], "errors": [...], "cache": {"hits": n, "misses": n}}
+    """
+    outcomes = []
+    async for index, status, item in _iter_completed(jobs, limit=STREAM_WINDOW):
+        outcomes.append((index, status, item))
+    outcomes.sort(key=lambda outcome: outcome[0])
+
+    results = [item for _, status, item in outcomes if status]
+    errors = [item for _, status, item in outcomes if not status]
+    return {"success": results, "errors": errors, "cache": batch.cache_stats.as_dict(), **batch.stage(results)}
+
+async def _ndjson_results(jobs: Iterable[Awaitable[Tuple[bool, Dict[str, Any]]]], batch: _SheetBatch) -> AsyncIterator[str]:
+    """
+    每解析完一个文件输出一行 JSON:
+        {"index": 0, "status": "success", "filename": ..., "storage_path": ..., "data": {...}}
+        {"index": 1, "status": "error", "filename": ..., "error": "..."}
+    最后输出汇总行: {"done": true, "total": n, "success": n, "errors": n, "cache": {"hits": n, "misses": n}}
+    暂存模式下汇总行还包含 batch_id 与 staged
+    """
+    success_count = 0
+    error_count = 0
+    outcomes = []
+    async for index, status, item in _iter_completed(jobs, limit=STREAM_WINDOW):
+        if status:
+            success_count += 1
+            if batch.staged_batch is not None:
+                outcomes.append((index, item))
+        else:
+            error_count += 1
+        line = {"index": index, "status": "success" if status else "error", **item}
+        yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    summary = {
+        "done": True,
+        "total": success_count + error_count,
+        "success": success_count,
+        "errors": error_count,
+        "cache": batch.cache_stats.as_dict()
+    }
+    # 按上传顺序暂存
+    summary.update(batch.stage([item for _, item in sorted(outcomes, key=lambda outcome: outcome[0])]))
+    yield json.dumps(summary, ensure_ascii=False) + "\n"
+
 @router.post("/students")
 async def upload_student_papers(
+    request: Request,
     files: List[UploadFile] = File(...),
+    stream: bool = Query(False, description="以 NDJSON 流逐个返回解析结果"),
+    stage: bool = STAGE_QUERY,
+    batch_id: Optional[str] = BATCH_ID_QUERY,
     config: ExamConfig = Depends(get_config),
     parser_config: ParserConfig = Depends(get_parser_config),
-    storage: BaseStorage = Depends(get_storage_service)
+    storage: BaseStorage = Depends(get_storage_service),
+    db: Session = Depends(deps.get_db),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
 ):
-    results = []
-    errors = []
+    staged_batch, config = _open_batch(db, stage, batch_id, config, current_user)
+    batch = _SheetBatch(storage, config, parser_config, db, staged_batch)
+    jobs = (batch.process_file(file) for file in files)
 
-    config_dicts = [s.model_dump() for s in config.sections]
-    parser_config_dict = parser_config.model_dump()
+    # 流式模式: ?stream=true 或 Accept: application/x-ndjson
+    if _wants_ndjson(request, stream):
+        return StreamingResponse(_ndjson_results(jobs, batch), media_type=NDJSON_MEDIA_TYPE)
 
-    for file in files:
-        try:
-            content_bytes = await file.read()
+    # 所有文件并行解析，结果顺序与上传顺序一致
+    return await _collect_results(jobs, batch)
+
+@router.post("/students/archive")
+async def upload_student_archive(
+    request: Request,
+    file: UploadFile = File(...),
+    stream: bool = Query(False, description="以 NDJSON 流逐个返回解析结果"),
+    stage: bool = STAGE_QUERY,
+    batch_id: Optional[str] = BATCH_ID_QUERY,
+    config: ExamConfig = Depends(get_config),
+    parser_config: ParserConfig = Depends(get_parser_config),
+    storage: BaseStorage = Depends(get_storage_service),
+    db: Session = Depends(deps.get_db),
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+):
+    """
+    上传包含多份答卷的 zip / tar 压缩包
+    不解压到磁盘：逐个读取其中的 .txt 文件，解析并保存，返回格式与 /students 相同
+    """
+    try:
+        members = iter_archive_sheets(file.file)
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-            # Save file
-            file.file.seek(0)
-            saved_filename = f"student_{file.filename}"
-            storage.save_file(file.file, saved_filename)
+    staged_batch, config = _open_batch(db, stage, batch_id, config, current_user)
+    batch = _SheetBatch(storage, config, parser_config, db, staged_batch)
+    jobs = batch.archive_jobs(file.filename, members)
 
-            try:
-                content = content_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                content = content_bytes.decode("gbk", errors="ignore")
+    if _wants_ndjson(request, stream):
+        return StreamingResponse(_ndjson_results(jobs, batch), media_type=NDJSON_MEDIA_TYPE)
+    return await _collect_results(jobs, batch)
 
-            status, data = parse_text_content(content, config_dicts, parser_config_dict)
-            if status:
-                results.append({"filename": file.filename, "storage_path": saved_filename, "data": data})
-            else:
-                errors.append({"filename": file.filename, "error": data})
-        except Exception as e:
-            errors.append({"filename": file.filename, "error": str(e)})
+@router.get("/batches/{batch_id}")
+async def get_staged_batch(
+    batch_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """暂存批次概况：答卷数、文件名、是否已上传标准答案"""
+    try:
+        return batch_summary(db, get_batch(db, batch_id, current_user.id))
+    except StagedBatchNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-    return {"success": results, "errors": errors}
+@router.delete("/batches/{batch_id}")
+async def delete_staged_batch(
+    batch_id: str,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    try:
+        delete_batch(db, get_batch(db, batch_id, current_user.id))
+    except StagedBatchNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"message": f"Deleted staged batch {batch_id}"}
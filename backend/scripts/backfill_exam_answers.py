@@ -0,0 +1,34 @@
+"""
+为已有成绩记录补写逐题表 exam_answers
+
+建表（若不存在）后，按 ExamRecord.id 顺序分批读取建表前保存、尚无逐题行的记录，从 details_json 拆出每道题写入。
+每批提交后记录回填进度，可中断后继续；全部完成后待批改查询不再回退读取 details_json。
+
+用法: python -m backend.scripts.backfill_exam_answers [--batch-size 500]
+"""
+import argparse
+import time
+
+from backend.db.session import SessionLocal
+from backend.init_db import init_db
+from backend.services.exam_answers import backfill_exam_answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    # 创建缺少的数据表（包括 exam_answers）
+    init_db()
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        records, rows = backfill_exam_answers(db, batch_size=args.batch_size)
+        print(f"Backfilled {rows} answer rows for {records} exam records in {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
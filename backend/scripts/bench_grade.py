@@ -0,0 +1,53 @@
+"""
+客观题批量计分基准测试
+
+对比逐个学生调用 calculate_score 与向量化的 calculate_scores。
+用法: python -m backend.scripts.bench_grade [--students 5000] [--questions 60]
+"""
+import argparse
+import random
+import time
+
+from backend.services.core import calculate_score, calculate_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    exam_config = [
+        {"section_id": "1", "name": "单选得分", "score": 2.0, "question_type": "客观题"},
+        {"section_id": "2", "name": "判断得分", "score": 1.0, "question_type": "客观题"},
+        {"section_id": "3", "name": "填空得分", "score": 3.0, "question_type": "客观题"},
+    ]
+    per_section = max(1, args.questions // len(exam_config))
+    standard_key = {
+        f"{sec['section_id']}-{q}": rng.choice("ABCD")
+        for sec in exam_config for q in range(1, per_section + 1)
+    }
+    students = []
+    for i in range(args.students):
+        student = {"学号": str(i), "姓名": f"学生{i}", "机号": str(i % 60)}
+        student.update({k: rng.choice("ABCDabcd") for k in standard_key})
+        students.append(student)
+
+    start = time.perf_counter()
+    expected = [calculate_score(s, standard_key, exam_config, {}) for s in students]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = calculate_scores(students, standard_key, exam_config)
+    vector_time = time.perf_counter() - start
+
+    assert actual == expected
+    print(f"Cohort: {args.students} students x {len(standard_key)} questions")
+    print(f"{'calculate_score (loop)':<28} {loop_time:8.3f}s  {args.students / loop_time:10,.0f} students/s")
+    print(f"{'calculate_scores (vector)':<28} {vector_time:8.3f}s  {args.students / vector_time:10,.0f} students/s")
+    print(f"speedup: {loop_time / vector_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+主观题批改压测
+
+在本进程内启动模拟 LLM 服务 (mock_llm_server)，或通过 --url 指向已运行的服务，
+分别驱动以下批改路径并报告吞吐量与 LLM 请求延迟（含限流排队）的 p50/p95/p99：
+- sync:   grade_subjective_question，线程池并发（旧的逐份同步调用方式）
+- async:  grade_subjective_batch(pack_size=1)，每份答案一个请求
+- packed: grade_subjective_batch，同一道题按 --pack-size 份合并为一个请求
+
+用法: python -m backend.scripts.bench_llm_grading [--answers 500] [--modes sync,async,packed]
+                                                [--latency-ms 300] [--throttle-rate 0.02] [--duplicate-rate 0.3]
+"""
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from backend.core.config import settings
+from backend.scripts.mock_llm_server import add_server_arguments, app_from_args
+from backend.services import llm
+from backend.services.llm_cache import grading_cache_stats
+
+QUESTION = "简述数据库范式的作用。"
+REFERENCE = "范式用于规范关系模式，消除数据冗余以及插入、删除、更新异常。"
+
+
+class LatencyRecorder:
+    """包装 LLM 调用函数，记录每个请求的客户端延迟"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.latencies = []
+
+    def add(self, value: float):
+        with self._lock:
+            self.latencies.append(value)
+
+    def wrap_sync(self, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(time.perf_counter() - start)
+        return wrapper
+
+    def wrap_async(self, fn):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.add(time.perf_counter() - start)
+        return wrapper
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_answers(count: int, duplicate_rate: float, rng: random.Random) -> List[str]:
+    """生成学生答案；每轮加入随机前缀避免命中上一轮的缓存，duplicate_rate 比例的答案与前面的答案相同"""
+    run_id = uuid.uuid4().hex[:8]
+    answers: List[str] = []
+    for i in range(count):
+        if answers and rng.random() < duplicate_rate:
+            answers.append(rng.choice(answers))
+        else:
+            answers.append(f"[{run_id}-{i}] 范式可以减少冗余" + "，避免更新异常" * rng.randint(0, 3))
+    return answers
+
+
+def start_mock_server(args) -> str:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app_from_args(args), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def run_sync(answers: List[str], api_config: Dict, workers: int) -> List:
+    def grade(answer):
+        return llm.grade_subjective_question(QUESTION, REFERENCE, answer, 10, None, api_config)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(grade, answers))
+
+
+def run_batch(answers: List[str], api_config: Dict, pack_size: int) -> List:
+    items = [
+        {"question_text": QUESTION, "reference_answer": REFERENCE, "student_answer": answer, "max_score": 10}
+        for answer in answers
+    ]
+    return asyncio.run(llm.grade_subjective_batch(items, api_config, pack_size=pack_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="已运行的 OpenAI 兼容服务地址（默认在本进程内启动模拟服务）")
+    parser.add_argument("--answers", type=int, default=500)
+    parser.add_argument("--modes", default="sync,async,packed")
+    parser.add_argument("--workers", type=int, default=settings.LLM_MAX_CONCURRENCY, help="sync 模式的线程数")
+    parser.add_argument("--pack-size", type=int, default=settings.LLM_GRADING_PACK_SIZE)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="与其他学生相同的答案比例")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    # 压测只关心 LLM 调用本身，不访问 Redis
+    settings.LLM_CACHE_REDIS = False
+    base_url = args.url or start_mock_server(args)
+    api_config = {"base_url": base_url, "api_key": "mock", "model": "mock", "max_tokens": 300}
+
+    recorder = LatencyRecorder()
+    llm.call_llm_api = recorder.wrap_sync(llm.call_llm_api)
+    llm.async_call_llm_api = recorder.wrap_async(llm.async_call_llm_api)
+
+    rng = random.Random(args.seed)
+    print(f"LLM endpoint: {base_url}")
+    print(f"{args.answers} answers, duplicate rate {args.duplicate_rate:.0%}, "
+          f"latency {args.latency_ms:.0f}ms ({args.distribution}), "
+          f"429 rate {args.throttle_rate:.1%}, 500 rate {args.error_rate:.1%}")
+    print(f"{'mode':<8} {'answers/s':>10} {'requests':>9} {'failed':>7} {'hit rate':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        answers = make_answers(args.answers, args.duplicate_rate, rng)
+        recorder.reset()
+        grading_cache_stats.reset()
+        start = time.perf_counter()
+        if mode == "sync":
+            results = run_sync(answers, api_config, args.workers)
+        elif mode == "async":
+            results = run_batch(answers, api_config, pack_size=1)
+        elif mode == "packed":
+            results = run_batch(answers, api_config, pack_size=args.pack_size)
+        else:
+            raise SystemExit(f"unknown mode: {mode}")
+        elapsed = time.perf_counter() - start
+
+        latencies = [v * 1000 for v in recorder.latencies]
+        failed = sum(1 for success, _, _ in results if not success)
+        print(f"{mode:<8} {len(answers) / elapsed:>10,.1f} {len(latencies):>9} {failed:>7} "
+              f"{grading_cache_stats.as_dict()['hit_rate']:>9.1%} "
+              f"{percentile(latencies, 50):>8.0f} {percentile(latencies, 95):>8.0f} {percentile(latencies, 99):>8.0f}")
+        if latencies:
+            print(f"{'':<8} mean request latency {statistics.mean(latencies):.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+答题卡解析基准测试
+
+对比逐份编译正则的旧实现与预编译解析计划 (ParsePlan) 的吞吐量。
+用法: python -m backend.scripts.bench_parse [--sheets 5000] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import time
+from typing import Dict, List, Tuple, Any
+
+from backend.services.core import get_parse_plan, parse_text_content
+
+EXAM_CONFIG = [
+    {'section_id': '1', 'match_keyword': '一、单项选择题', 'question_type': '客观题', 'num_questions': 20},
+    {'section_id': '2', 'match_keyword': '二、判断题', 'question_type': '客观题', 'num_questions': 10},
+    {'section_id': '3', 'match_keyword': '三、选择填空题', 'question_type': '客观题', 'num_questions': 10},
+    {'section_id': '4', 'match_keyword': '四、简答题', 'question_type': '主观题', 'num_questions': 3},
+]
+
+
+def make_exam_config(num_sections: int) -> List[Dict]:
+    """生成包含大量大题的配置（客观题与主观题交替），用于考察大题切分的开销"""
+    if num_sections <= len(EXAM_CONFIG):
+        return EXAM_CONFIG[:num_sections]
+    config = list(EXAM_CONFIG)
+    for i in range(len(EXAM_CONFIG) + 1, num_sections + 1):
+        question_type = '主观题' if i % 2 == 0 else '客观题'
+        config.append({'section_id': str(i), 'match_keyword': f'第{i}部分', 'question_type': question_type, 'num_questions': 5})
+    return config
+
+
+def legacy_parse_text_content(content: str, exam_config: List[Dict], parser_config: Dict = None) -> Tuple[bool, Any]:
+    """优化前的实现 (每份答题卡重新编译正则、重复查找大题边界)，仅用于对比"""
+    if not content or not content.strip():
+        return False, "文件内容为空"
+
+    header_regex = r"学号[：:]\s*(.*?)\s+姓名[：:]\s*(.*?)\s+机号[：:]\s*(.*)"
+    question_regex = r"(\d+)\.\s*([a-zA-Z0-9_\u4e00-\u9fa5]+)?"
+    if parser_config:
+        header_regex = parser_config.get("header_regex", header_regex)
+        question_regex = parser_config.get("question_regex", question_regex)
+
+    student_data = {}
+    lines = [line.strip() for line in content.split('\n')]
+    header_pattern = re.compile(header_regex)
+    header_match = None
+    for i in range(min(5, len(lines))):
+        match = header_pattern.search(lines[i])
+        if match:
+            header_match = match
+            break
+    if not header_match:
+        return False, f"头部信息缺失 (匹配规则: {header_regex})"
+    student_data['学号'] = header_match.group(1).strip()
+    student_data['姓名'] = header_match.group(2).strip()
+    student_data['机号'] = header_match.group(3).strip()
+
+    q_pattern = re.compile(question_regex)
+    full_text = content
+    for i, section in enumerate(exam_config):
+        sec_title = section['match_keyword']
+        question_type = section.get('question_type', '客观题')
+        start_idx = full_text.find(sec_title)
+        if start_idx == -1:
+            continue
+        if i < len(exam_config) - 1:
+            end_idx = full_text.find(exam_config[i+1]['match_keyword'])
+            if end_idx == -1: end_idx = len(full_text)
+        else:
+            end_idx = len(full_text)
+        section_text = full_text[start_idx:end_idx]
+        sec_id = section.get('section_id', str(i+1))
+        if question_type == '客观题':
+            for line in section_text.split('\n'):
+                for q_num, ans in q_pattern.findall(line):
+                    student_data[f"{sec_id}-{q_num}"] = ans.strip().upper() if ans else ""
+        else:
+            current_q_num = None
+            current_answer = []
+            for line in section_text.split('\n'):
+                q_start_match = re.match(r'^(\d+)\.\s*(.*)', line)
+                if q_start_match:
+                    if current_q_num is not None:
+                        student_data[f"{sec_id}-{current_q_num}"] = '\n'.join(current_answer).strip()
+                    current_q_num = q_start_match.group(1)
+                    answer_start = q_start_match.group(2).strip()
+                    current_answer = [answer_start] if answer_start else []
+                elif current_q_num is not None:
+                    if line.strip():
+                        current_answer.append(line.strip())
+            if current_q_num is not None:
+                student_data[f"{sec_id}-{current_q_num}"] = '\n'.join(current_answer).strip()
+    return True, student_data
+
+
+def make_sheet(rng: random.Random, idx: int, exam_config: List[Dict]) -> str:
+    lines = [f"学号：2025{idx:05d}  姓名：学生{idx}  机号：{idx % 60 + 1}", ""]
+    for section in exam_config:
+        lines.append(f"{section['match_keyword']}（共{section['num_questions']}题）")
+        for q in range(1, section['num_questions'] + 1):
+            if section['question_type'] == '客观题':
+                lines.append(f"{q}. {rng.choice('ABCD')}")
+            else:
+                lines.append(f"{q}. " + "数据库范式用于消除冗余。" * rng.randint(1, 4))
+                for _ in range(rng.randint(1, 5)):
+                    lines.append("  进一步说明：第三范式要求非主属性不传递依赖于码。")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def run(name: str, fn, sheets: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(sheets)
+        best = min(best, time.perf_counter() - start)
+    rate = len(sheets) / best
+    print(f"{name:<32} {best:8.3f}s  {rate:12,.0f} sheets/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sheets", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sections", type=int, default=len(EXAM_CONFIG))
+    args = parser.parse_args()
+
+    exam_config = make_exam_config(args.sections)
+    rng = random.Random(42)
+    sheets = [make_sheet(rng, i, exam_config) for i in range(args.sheets)]
+
+    # 结果一致性校验
+    for content in sheets[:200]:
+        assert legacy_parse_text_content(content, exam_config) == parse_text_content(content, exam_config)
+
+    def legacy(batch):
+        for content in batch:
+            legacy_parse_text_content(content, exam_config)
+
+    def planned(batch):
+        plan = get_parse_plan(exam_config)
+        for content in batch:
+            plan.parse(content)
+
+    print(f"Synthetic cohort: {len(sheets)} sheets, {len(exam_config)} sections")
+    before = run("before (per-sheet compile)", legacy, sheets, args.repeat)
+    after = run("after (cached ParsePlan)", planned, sheets, args.repeat)
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
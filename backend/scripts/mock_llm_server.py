@@ -0,0 +1,199 @@
+"""
+本地 OpenAI 兼容的模拟 LLM 服务 (仅用于压测，不消耗真实 API 额度)
+
+实现 POST /chat/completions (及 /v1/chat/completions)：
+- 批改 prompt 返回确定性的 {"score", "comment"}（由学生答案哈希得到），合并批改 prompt 返回 JSON 数组
+- 出题 prompt 返回所要求数量的题目 JSON 数组
+- 可配置延迟分布，按比例注入 429 (带 Retry-After) 与 500 错误
+- 请求带 "stream": true 时以 SSE 分段返回（首段前等待抽样延迟，之后每段间隔 --stream-chunk-ms）
+
+用法: python -m backend.scripts.mock_llm_server [--port 8001] [--latency-ms 300] [--distribution lognormal]
+                                              [--throttle-rate 0.02] [--error-rate 0.01]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+_MAX_SCORE = re.compile(r"满分：([\d.]+)分")
+_SINGLE_ANSWER = re.compile(r"【学生答案】\n(.*?)\n\n【批改要求】", re.S)
+_PACKED_ANSWER = re.compile(r"\[答案 (\d+)\]\n(.*?)\n(?=\n\[答案 \d+\]|\n?【批改要求】)", re.S)
+_GENERATE_COUNT = re.compile(r"Generate (\d+) exam questions")
+_GENERATE_BATCH = re.compile(r"This is batch (\d+) of")
+
+
+def sample_latency(rng: random.Random, distribution: str, mean_ms: float) -> float:
+    """按分布抽样延迟（秒），各分布的均值均为 mean_ms"""
+    if mean_ms <= 0:
+        return 0.0
+    if distribution == "fixed":
+        value = mean_ms
+    elif distribution == "uniform":
+        value = rng.uniform(0, 2 * mean_ms)
+    elif distribution == "exponential":
+        value = rng.expovariate(1 / mean_ms)
+    else:
+        # sigma=0.5 的对数正态分布，长尾接近真实 LLM 服务
+        sigma = 0.5
+        value = rng.lognormvariate(0, sigma) * mean_ms / math.exp(sigma ** 2 / 2)
+    return value / 1000
+
+
+def deterministic_grade(answer: str, max_score: float) -> Dict[str, Any]:
+    digest = int(hashlib.sha256(answer.encode("utf-8")).hexdigest(), 16)
+    score = round((digest % 1000) / 999 * max_score, 1)
+    return {"score": score, "comment": f"模拟评语：答案长度 {len(answer)}，得分 {score}"}
+
+
+def mock_completion(prompt: str) -> str:
+    max_match = _MAX_SCORE.search(prompt)
+    max_score = float(max_match.group(1)) if max_match else 10.0
+
+    packed = _PACKED_ANSWER.findall(prompt)
+    if packed:
+        return json.dumps([
+            dict(id=int(i), **deterministic_grade(answer, max_score)) for i, answer in packed
+        ], ensure_ascii=False)
+
+    single = _SINGLE_ANSWER.search(prompt)
+    if single:
+        return json.dumps(deterministic_grade(single.group(1), max_score), ensure_ascii=False)
+
+    count_match = _GENERATE_COUNT.search(prompt)
+    if count_match:
+        count = int(count_match.group(1))
+        batch_match = _GENERATE_BATCH.search(prompt)
+        batch = batch_match.group(1) if batch_match else "1"
+        questions: List[Dict[str, Any]] = []
+        for i in range(count):
+            # 题干带摘要，避免不同分块的模拟题目被当作重复题去掉
+            tag = hashlib.sha256(f"{batch}-{i}".encode()).hexdigest()[:12]
+            questions.append({
+                "type": "short_answer", "content": f"模拟题目 {batch}-{i + 1} ({tag})",
+                "options": [], "answer": "模拟答案", "score": 5
+            })
+        return json.dumps(questions, ensure_ascii=False)
+
+    return "OK"
+
+
+def create_app(
+    latency_ms: float = 300,
+    distribution: str = "lognormal",
+    throttle_rate: float = 0.0,
+    error_rate: float = 0.0,
+    retry_after: float = 1.0,
+    seed: int = 42,
+    stream_chunk_ms: float = 20,
+    stream_chunk_chars: int = 16
+) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    async def chat_completions(request: Request):
+        stats = app.state.stats
+        stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(sample_latency(rng, distribution, latency_ms))
+
+        roll = rng.random()
+        if roll < throttle_rate:
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)}
+            )
+        if roll < throttle_rate + error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "Internal error"}}, status_code=500)
+
+        prompt = body["messages"][-1]["content"]
+        content = mock_completion(prompt)
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_chunks(content, body.get("model", "mock"), stats["requests"]),
+                media_type="text/event-stream"
+            )
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"])
+        return {
+            "id": f"mock-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content),
+                "total_tokens": prompt_tokens + len(content)
+            }
+        }
+
+    async def stream_chunks(content: str, model: str, request_id: int):
+        for start in range(0, len(content), stream_chunk_chars):
+            chunk = {
+                "id": f"mock-{request_id}",
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[start:start + stream_chunk_chars]}}]
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(stream_chunk_ms / 1000)
+        yield "data: [DONE]\n\n"
+
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats
+
+    return app
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="429 响应比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 响应比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stream-chunk-ms", type=float, default=20, help="流式响应每段之间的间隔")
+
+
+def app_from_args(args: argparse.Namespace) -> FastAPI:
+    return create_app(
+        latency_ms=args.latency_ms,
+        distribution=args.distribution,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+        stream_chunk_ms=args.stream_chunk_ms
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(app_from_args(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import posixpath
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# 单个答卷文件的大小上限，防止压缩炸弹占满内存
+MAX_MEMBER_SIZE = 5 * 1024 * 1024
+SHEET_SUFFIX = ".txt"
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _is_sheet(name: str) -> bool:
+    base = posixpath.basename(name)
+    if not base or base.startswith(".") or "__MACOSX" in name.split("/"):
+        return False
+    return base.lower().endswith(SHEET_SUFFIX)
+
+
+def _zip_member_name(info: zipfile.ZipInfo) -> str:
+    # Windows 下打包的 zip 常用 GBK 编码文件名且未设置 UTF-8 标志位
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("gbk")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def safe_member_filename(name: str) -> str:
+    """将压缩包内路径转换为扁平的存储文件名，去除目录穿越等不安全片段"""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return "_".join(parts) or "unnamed.txt"
+
+
+def _iter_zip(fileobj: BinaryIO) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    with zipfile.ZipFile(fileobj) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            name = _zip_member_name(info)
+            if not _is_sheet(name):
+                continue
+            if info.file_size > MAX_MEMBER_SIZE:
+                yield name, None, "文件过大"
+                continue
+            try:
+                yield name, zf.read(info), None
+            except Exception as e:
+                yield name, None, str(e)
+
+
+def _iter_tar(fileobj: BinaryIO) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    # 流式模式 (r|*) 顺序读取，无需随机访问，也不会解压到磁盘
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+        for member in tf:
+            if not member.isfile() or not _is_sheet(member.name):
+                continue
+            if member.size > MAX_MEMBER_SIZE:
+                yield member.name, None, "文件过大"
+                continue
+            try:
+                extracted = tf.extractfile(member)
+                yield member.name, extracted.read(), None
+            except Exception as e:
+                yield member.name, None, str(e)
+
+
+def iter_archive_sheets(fileobj: BinaryIO) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """
+    逐个读取 zip / tar(.gz/.bz2/.xz) 压缩包中的 .txt 答卷，一次只在内存中保留一个文件
+    产出: (压缩包内路径, 文件内容, 错误信息)，内容与错误信息二者其一为 None
+    """
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        return _iter_zip(fileobj)
+
+    fileobj.seek(0)
+    try:
+        # 仅用于识别格式，随后重新以流式模式打开
+        tarfile.open(fileobj=fileobj, mode="r:*").close()
+    except tarfile.TarError:
+        raise ArchiveError("不支持的压缩包格式 (仅支持 zip / tar / tar.gz)")
+    fileobj.seek(0)
+    return _iter_tar(fileobj)
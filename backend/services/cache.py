@@ -1,6 +1,6 @@
 import redis
 from backend.core.config import settings
-from typing import Optional
+from typing import List, Optional
 
 class CacheService:
     def __init__(self):
@@ -26,4 +26,18 @@ class CacheService:
         except:
             pass
 
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        if not self.r or not keys: return [None] * len(keys)
+        try:
+            return self.r.mget(keys)
+        except:
+            return [None] * len(keys)
+
+    def incr(self, key: str) -> Optional[int]:
+        if not self.r: return None
+        try:
+            return self.r.incr(key)
+        except:
+            return None
+
 cache_service = CacheService()
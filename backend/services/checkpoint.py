@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Tuple
+from sqlalchemy.exc import IntegrityError
+from backend.db.session import SessionLocal
+from backend.models.checkpoint import GradingCheckpoint
+
+
+def answer_hash(answer: Any) -> str:
+    return hashlib.sha256(str(answer).encode("utf-8")).hexdigest()
+
+
+def grading_job_key(payload: Dict[str, Any], examples: Dict[str, Any] = None) -> str:
+    """
+    批改任务的标识：payload 中指定 job_id 时直接使用，
+    否则由考试、标准答案、题目配置与模型配置计算，同一任务重试/重新提交时保持不变
+    """
+    if payload.get("job_id"):
+        return str(payload["job_id"])[:64]
+    llm_config = payload.get("llm_config") or {}
+    identity = [
+        payload.get("exam_name"),
+        payload.get("standard_key", {}),
+        payload.get("config", {}),
+        llm_config.get("base_url"),
+        llm_config.get("model"),
+        llm_config.get("temperature"),
+        examples or {}
+    ]
+    raw = json.dumps(identity, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    按 (学生, 题号) 保存单个批改单元的结果
+    每次写入使用独立的短会话并立即提交，可在线程池中并发调用
+    """
+
+    def __init__(self, job_key: str, session_factory=SessionLocal):
+        self.job_key = job_key
+        self.session_factory = session_factory
+
+    def load(self, student_ids: Iterable[str]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """读取这些学生已完成的批改单元: {(学号, 题号): {answer_hash, score, comment}}"""
+        student_ids = [str(student_id) for student_id in student_ids if student_id]
+        if not student_ids:
+            return {}
+        db = self.session_factory()
+        try:
+            rows = db.query(GradingCheckpoint).filter(
+                GradingCheckpoint.job_key == self.job_key,
+                GradingCheckpoint.student_id.in_(student_ids)
+            ).all()
+            return {
+                (row.student_id, row.question_key): {
+                    "answer_hash": row.answer_hash, "score": row.score, "comment": row.comment or ""
+                }
+                for row in rows
+            }
+        finally:
+            db.close()
+
+    def save(self, student_id: str, question_key: str, answer: Any, score: float, comment: str) -> None:
+        """写入（或覆盖）一个批改单元，重复写入结果相同"""
+        db = self.session_factory()
+        try:
+            db.query(GradingCheckpoint).filter(
+                GradingCheckpoint.job_key == self.job_key,
+                GradingCheckpoint.student_id == str(student_id),
+                GradingCheckpoint.question_key == question_key
+            ).delete(synchronize_session=False)
+            db.add(GradingCheckpoint(
+                job_key=self.job_key,
+                student_id=str(student_id),
+                question_key=question_key,
+                answer_hash=answer_hash(answer),
+                score=score,
+                comment=comment
+            ))
+            db.commit()
+        except IntegrityError:
+            # 另一个重复执行的分块已写入同一单元
+            db.rollback()
+        finally:
+            db.close()
+
+    async def save_async(self, student_id: str, question_key: str, answer: Any, score: float, comment: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.save, student_id, question_key, answer, score, comment)
+
+    def clear(self) -> int:
+        """任务完成并保存成绩后删除其检查点"""
+        db = self.session_factory()
+        try:
+            deleted = db.query(GradingCheckpoint).filter(
+                GradingCheckpoint.job_key == self.job_key
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+def restore_checkpoints(
+    checkpoints: Dict[Tuple[str, str], Dict[str, Any]], students: Iterable[Dict], llm_graded_list: list
+) -> int:
+    """把答案未变的已完成单元填入 llm_graded_list，返回恢复的单元数"""
+    by_student: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for (student_id, q_key), checkpoint in checkpoints.items():
+        by_student.setdefault(student_id, {})[q_key] = checkpoint
+
+    restored = 0
+    for student, graded in zip(students, llm_graded_list):
+        for q_key, checkpoint in by_student.get(str(student.get("学号")), {}).items():
+            if q_key in graded:
+                continue
+            if student.get(q_key) and checkpoint["answer_hash"] == answer_hash(student.get(q_key)):
+                graded[q_key] = {"score": checkpoint["score"], "comment": checkpoint["comment"]}
+                restored += 1
+    return restored
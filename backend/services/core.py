@@ -1,120 +1,268 @@
 import re
+import json
+import hashlib
+import numpy as np
 from typing import Dict, List, Tuple, Any
+from backend.services.lru import LRUCache
 
-def parse_text_content(content: str, exam_config: List[Dict], parser_config: Dict = None) -> Tuple[bool, Any]:
+# Default regexes
+DEFAULT_HEADER_REGEX = r"学号[：:]\s*(.*?)\s+姓名[：:]\s*(.*?)\s+机号[：:]\s*(.*)"
+DEFAULT_QUESTION_REGEX = r"(\d+)\.\s*([a-zA-Z0-9_\u4e00-\u9fa5]+)?"
+
+# 主观题题号行: "1. xxx"
+SUBJECTIVE_QUESTION_PATTERN = re.compile(r'^(\d+)\.\s*(.*)')
+
+PARSE_PLAN_CACHE_SIZE = 32
+
+
+class ParsePlan:
     """
-    解析单个学生答题卡文本内容
-    返回: (status, data/error_msg)
+    预编译的答题卡解析计划
+    同一份考试配置 + 解析配置只编译一次正则、整理一次大题信息，
+    批量解析时对每份答题卡复用。
     """
-    if not content or not content.strip():
-        return False, "文件内容为空"
 
-    # Default regexes
-    header_regex = r"学号[：:]\s*(.*?)\s+姓名[：:]\s*(.*?)\s+机号[：:]\s*(.*)"
-    question_regex = r"(\d+)\.\s*([a-zA-Z0-9_\u4e00-\u9fa5]+)?"
+    def __init__(self, exam_config: List[Dict], parser_config: Dict = None):
+        parser_config = parser_config or {}
+        self.key = parse_plan_key(exam_config, parser_config)
+        self.header_regex = parser_config.get("header_regex", DEFAULT_HEADER_REGEX)
+        self.question_regex = parser_config.get("question_regex", DEFAULT_QUESTION_REGEX)
+
+        # 正则错误延迟到解析时返回，保持与逐份解析时相同的错误顺序
+        self.header_pattern = None
+        self.header_error = None
+        try:
+            self.header_pattern = re.compile(self.header_regex)
+        except re.error:
+            self.header_error = "头部正则表达式错误"
+
+        self.question_pattern = None
+        self.question_error = None
+        try:
+            self.question_pattern = re.compile(self.question_regex)
+        except re.error:
+            self.question_error = "题目正则表达式错误"
+
+        # (match_keyword, section_id, question_type)
+        self.sections: List[Tuple[str, str, str]] = [
+            (
+                section['match_keyword'],
+                section.get('section_id', str(i+1)),
+                section.get('question_type', '客观题'),
+            )
+            for i, section in enumerate(exam_config)
+        ]
+
+        # 所有大题标题合并为一个多关键字匹配器（正则交替分支，由 C 实现的
+        # 匹配引擎完成），一次扫描定位全部大题。匹配结果互不重叠，同一位置只报告
+        # 最长的关键字，因此预先记录每个关键字中包含的其他关键字（前缀、中间或后缀）
+        # 及其偏移，一并视为出现。
+        keywords = list(dict.fromkeys(keyword for keyword, _, _ in self.sections if keyword))
+        self.keywords = keywords
+        self.keyword_pattern = None
+        if keywords:
+            alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+            self.keyword_pattern = re.compile(alternation)
+        self.keyword_contains: Dict[str, List[Tuple[str, int]]] = {
+            keyword: [(other, keyword.find(other)) for other in keywords if other in keyword]
+            for keyword in keywords
+        }
+        # 一个标题的后缀恰是另一个标题的前缀（如 "选择题" 与 "题目"）时，两者在文本中
+        # 可能部分重叠，单次扫描会漏报，此时逐个关键字 find
+        self.keyword_overlap = any(
+            a.endswith(b[:size])
+            for a in keywords for b in keywords
+            for size in range(1, min(len(a), len(b)))
+        )
+        self.has_empty_keyword = any(not keyword for keyword, _, _ in self.sections)
+
+    def parse(self, content: str) -> Tuple[bool, Any]:
+        """
+        解析单个学生答题卡文本内容
+        返回: (status, data/error_msg)
+        """
+        if not content or not content.strip():
+            return False, "文件内容为空"
+
+        if self.header_error:
+            return False, self.header_error
+        header_pattern = self.header_pattern
+
+        student_data = {}
+
+        # 1. 提取头部信息 (学号、姓名、机号)，只需要前5行
+        header_match = None
+        for line in content.split('\n', 5)[:5]: # 搜索前5行
+            match = header_pattern.search(line.strip())
+            if match:
+                header_match = match
+                break
+
+        if not header_match:
+            return False, f"头部信息缺失 (匹配规则: {self.header_regex})"
+
+        try:
+            # Assuming regex has 3 groups: ID, Name, Machine
+            if header_pattern.groups < 3:
+                 return False, "头部正则必须包含3个捕获组 (学号, 姓名, 机号)"
+
+            student_data['学号'] = header_match.group(1).strip()
+            student_data['姓名'] = header_match.group(2).strip()
+            student_data['机号'] = header_match.group(3).strip()
+        except IndexError:
+             return False, "头部信息提取失败"
+
+        # 2. 按大题提取答案
+        if self.question_error:
+            return False, self.question_error
+
+        for section_text, sec_id, question_type in self._split_sections(content):
+            if question_type == '客观题':
+                self._parse_objective(section_text, sec_id, student_data)
+            else:
+                self._parse_subjective(section_text, sec_id, student_data)
+
+        return True, student_data
+
+    def _locate_keywords(self, full_text: str) -> Dict[str, int]:
+        """单次扫描，返回每个大题标题首次出现的位置（未出现的不在结果中）"""
+        first_pos: Dict[str, int] = {}
+        if self.has_empty_keyword:
+            first_pos[""] = 0 # 与 str.find("") 行为一致
+        if self.keyword_pattern is None:
+            return first_pos
+        if self.keyword_overlap:
+            for keyword in self.keywords:
+                pos = full_text.find(keyword)
+                if pos != -1:
+                    first_pos[keyword] = pos
+            return first_pos
+
+        total = len(self.keyword_contains) + len(first_pos)
+        for match in self.keyword_pattern.finditer(full_text):
+            pos = match.start()
+            for keyword, offset in self.keyword_contains[match.group()]:
+                if keyword not in first_pos:
+                    first_pos[keyword] = pos + offset
+            if len(first_pos) == total:
+                break # 全部标题都已找到，无需继续扫描
+        return first_pos
+
+    def _split_sections(self, full_text: str) -> List[Tuple[str, str, str]]:
+        """
+        按标题在文本中的实际位置切分大题，不要求大题按配置顺序出现；
+        每个大题的终点是文本中紧随其后的下一个大题标题。
+        """
+        first_pos = self._locate_keywords(full_text)
+
+        found = []
+        for order, (keyword, sec_id, question_type) in enumerate(self.sections):
+            start_idx = first_pos.get(keyword, -1)
+            if start_idx == -1:
+                continue # 宽容模式：找不到该大题则跳过
+            found.append((start_idx, order, sec_id, question_type))
+        found.sort()
+
+        spans = []
+        for i, (start_idx, _, sec_id, question_type) in enumerate(found):
+            end_idx = found[i+1][0] if i < len(found) - 1 else len(full_text)
+            spans.append((full_text[start_idx:end_idx], sec_id, question_type))
+        return spans
+
+    def _parse_objective(self, section_text: str, sec_id: str, student_data: Dict) -> None:
+        # 客观题：提取该区域内的所有 "数字. 答案"（短答案）
+        findall = self.question_pattern.findall
+        for line in section_text.split('\n'):
+            # 匹配 "1. A" 或 "1.A"
+            for q_num, ans in findall(line):
+                key = f"{sec_id}-{q_num}"
+                ans = ans.strip().upper() if ans else ""
+                student_data[key] = ans
+
+    def _parse_subjective(self, section_text: str, sec_id: str, student_data: Dict) -> None:
+        # 主观题：提取长文本答案
+        match = SUBJECTIVE_QUESTION_PATTERN.match
+        current_q_num = None
+        current_answer = []
+
+        for line in section_text.split('\n'):
+            # 检查是否是新题号的开始
+            q_start_match = match(line)
+            if q_start_match:
+                # 保存之前题目的答案
+                if current_q_num is not None:
+                    student_data[f"{sec_id}-{current_q_num}"] = '\n'.join(current_answer).strip()
+
+                # 开始新题
+                current_q_num = q_start_match.group(1)
+                answer_start = q_start_match.group(2).strip()
+                current_answer = [answer_start] if answer_start else []
+            elif current_q_num is not None:
+                # 续接当前题目的答案
+                line = line.strip()
+                if line:
+                    current_answer.append(line)
+
+        # 保存最后一题
+        if current_q_num is not None:
+            student_data[f"{sec_id}-{current_q_num}"] = '\n'.join(current_answer).strip()
+
+
+def parse_plan_key(exam_config: List[Dict], parser_config: Dict = None) -> str:
+    """
+    计算解析计划的缓存键：只取影响解析结果的字段，
+    修改分值、评分标准等不会使已编译的计划失效。
+    """
+    parser_config = parser_config or {}
+    payload = {
+        "header_regex": parser_config.get("header_regex", DEFAULT_HEADER_REGEX),
+        "question_regex": parser_config.get("question_regex", DEFAULT_QUESTION_REGEX),
+        "sections": [
+            [
+                section['match_keyword'],
+                section.get('section_id', str(i+1)),
+                section.get('question_type', '客观题'),
+            ]
+            for i, section in enumerate(exam_config)
+        ],
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-    if parser_config:
-        header_regex = parser_config.get("header_regex", header_regex)
-        question_regex = parser_config.get("question_regex", question_regex)
 
-    student_data = {}
-    lines = [line.strip() for line in content.split('\n')]
+_plan_cache = LRUCache(maxsize=PARSE_PLAN_CACHE_SIZE)
 
-    # 1. 提取头部信息 (学号、姓名、机号)
-    try:
-        header_pattern = re.compile(header_regex)
-    except re.error:
-        return False, "头部正则表达式错误"
+def get_parse_plan(exam_config: List[Dict], parser_config: Dict = None) -> ParsePlan:
+    """
+    获取（或编译并缓存）解析计划
+    批量解析时应在循环外调用一次，然后对每份答题卡调用 plan.parse
+    """
+    key = parse_plan_key(exam_config, parser_config)
+    return _plan_cache.get_or_create(key, lambda: ParsePlan(exam_config, parser_config))
 
-    header_match = None
-    for i in range(min(5, len(lines))): # 搜索前5行
-        match = header_pattern.search(lines[i])
-        if match:
-            header_match = match
-            break
 
-    if not header_match:
-        return False, f"头部信息缺失 (匹配规则: {header_regex})"
+def parse_text_content(content: str, exam_config: List[Dict], parser_config: Dict = None) -> Tuple[bool, Any]:
+    """
+    解析单个学生答题卡文本内容
+    返回: (status, data/error_msg)
+    """
+    return get_parse_plan(exam_config, parser_config).parse(content)
+
 
+def decode_sheet(content_bytes: bytes) -> str:
+    """答题卡编码：优先 UTF-8，失败时按 GBK 解码（忽略非法字符）"""
     try:
-        # Assuming regex has 3 groups: ID, Name, Machine
-        # This is a bit strict, maybe we should use named groups or just position 1,2,3
-        if header_pattern.groups < 3:
-             return False, "头部正则必须包含3个捕获组 (学号, 姓名, 机号)"
-
-        student_data['学号'] = header_match.group(1).strip()
-        student_data['姓名'] = header_match.group(2).strip()
-        student_data['机号'] = header_match.group(3).strip()
-    except IndexError:
-         return False, "头部信息提取失败"
-
-    # 2. 定义各题型的正则提取逻辑
-    try:
-        q_pattern = re.compile(question_regex)
-    except re.error:
-        return False, "题目正则表达式错误"
-
-    full_text = content
-
-    # 使用配置中的题目定义
-    for i, section in enumerate(exam_config):
-        sec_title = section['match_keyword']
-        question_type = section.get('question_type', '客观题')
-        start_idx = full_text.find(sec_title)
-        if start_idx == -1:
-            continue # 宽容模式：找不到该大题则跳过
-
-        # 确定结束位置
-        if i < len(exam_config) - 1:
-            next_title = exam_config[i+1]['match_keyword']
-            end_idx = full_text.find(next_title)
-            if end_idx == -1: end_idx = len(full_text)
-        else:
-            end_idx = len(full_text)
+        return content_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        return content_bytes.decode("gbk", errors="ignore")
 
-        section_text = full_text[start_idx:end_idx]
-        sec_id = section.get('section_id', str(i+1))
 
-        if question_type == '客观题':
-            # 客观题：提取该区域内的所有 "数字. 答案"（短答案）
-            lines_in_section = section_text.split('\n')
-            for line in lines_in_section:
-                # 匹配 "1. A" 或 "1.A"
-                matches = q_pattern.findall(line)
-                for q_num, ans in matches:
-                    key = f"{sec_id}-{q_num}"
-                    ans = ans.strip().upper() if ans else ""
-                    student_data[key] = ans
-        else:
-            # 主观题：提取长文本答案
-            lines_in_section = section_text.split('\n')
-            current_q_num = None
-            current_answer = []
-
-            for line in lines_in_section:
-                # 检查是否是新题号的开始
-                q_start_match = re.match(r'^(\d+)\.\s*(.*)', line)
-                if q_start_match:
-                    # 保存之前题目的答案
-                    if current_q_num is not None:
-                        key = f"{sec_id}-{current_q_num}"
-                        student_data[key] = '\n'.join(current_answer).strip()
-
-                    # 开始新题
-                    current_q_num = q_start_match.group(1)
-                    answer_start = q_start_match.group(2).strip()
-                    current_answer = [answer_start] if answer_start else []
-                elif current_q_num is not None:
-                    # 续接当前题目的答案
-                    if line.strip():
-                        current_answer.append(line.strip())
-
-            # 保存最后一题
-            if current_q_num is not None:
-                key = f"{sec_id}-{current_q_num}"
-                student_data[key] = '\n'.join(current_answer).strip()
-
-    return True, student_data
+def parse_sheet_bytes(content_bytes: bytes, exam_config: List[Dict], parser_config: Dict = None) -> Tuple[bool, Any]:
+    """
+    解码并解析一份答题卡原始字节
+    作为进程池任务的入口，必须是模块级函数；子进程内的解析计划同样按配置缓存
+    """
+    return parse_text_content(decode_sheet(content_bytes), exam_config, parser_config)
 
 
 def calculate_score(student_data: Dict, standard_key: Dict, exam_config: List[Dict], llm_graded_data: Dict = None) -> Dict:
@@ -196,3 +344,120 @@ def calculate_score(student_data: Dict, standard_key: Dict, exam_config: List[Di
 
     record['总分'] = total_score
     return record
+
+
+HEADER_FIELDS = ('学号', '姓名', '机号')
+PENDING_COMMENT = '⏳ 待批改'
+
+def calculate_scores(
+    students: List[Dict],
+    standard_key: Dict,
+    exam_config: List[Dict],
+    llm_graded_list: List[Dict] = None
+) -> List[Dict]:
+    """
+    批量计算整个班级/年级的分数，结果与逐个调用 calculate_score 完全一致
+    客观题比对与各大题/总分累加在 学生 × 题目 矩阵上一次性完成
+    llm_graded_list: 与 students 一一对应的主观题批改数据 (可选，元素可为 None)
+    """
+    n = len(students)
+    if n == 0:
+        return []
+    if llm_graded_list is None:
+        llm_graded_list = [None] * n
+
+    section_ids = [sec.get('section_id', str(i+1)) for i, sec in enumerate(exam_config)]
+    score_map = {sec_id: sec['score'] for sec_id, sec in zip(section_ids, exam_config)}
+    type_map = {sec_id: sec.get('question_type', '客观题') for sec_id, sec in zip(section_ids, exam_config)}
+
+    # 题目列：与 calculate_score 相同，按标准答案中的顺序
+    q_keys = [k for k in standard_key if k not in HEADER_FIELDS and '-' in k]
+    q_secs = [k.split('-')[0] for k in q_keys]
+    q_count = len(q_keys)
+    is_objective = np.array([type_map.get(sec, '客观题') == '客观题' for sec in q_secs], dtype=bool)
+    obj_cols = np.flatnonzero(is_objective)
+    subj_cols = np.flatnonzero(~is_objective)
+
+    scores = np.zeros((n, q_count), dtype=float)
+    # 记录每个单元格的分数是否为 int，用于还原逐个累加时的结果类型
+    int_mask = np.ones((n, q_count), dtype=bool)
+
+    # 1. 客观题：标准答案与全部学生答案编码为字符串矩阵，一次比对
+    correct = np.zeros((n, 0), dtype=bool)
+    if obj_cols.size:
+        obj_keys = [q_keys[j] for j in obj_cols]
+        std = np.char.upper(np.char.strip(np.array([str(standard_key[k]) for k in obj_keys], dtype=str)))
+        answers = np.array([[str(s.get(k, '')) for k in obj_keys] for s in students], dtype=str)
+        answers = np.char.upper(np.char.strip(answers.reshape(n, len(obj_keys))))
+        correct = answers == std
+        points = [score_map.get(q_secs[j], 0) for j in obj_cols]
+        scores[:, obj_cols] = correct * np.array(points, dtype=float)
+        # 答错记 0 (int)，答对记该题分值本身
+        int_mask[:, obj_cols] = ~correct | np.array([isinstance(p, int) for p in points], dtype=bool)
+
+    # 2. 主观题：分数来自 LLM 批改结果，逐项填入矩阵
+    subj_comments = [None] * n
+    subj_keys = [q_keys[j] for j in subj_cols]
+    for row, llm_graded_data in enumerate(llm_graded_list):
+        comments = []
+        for col, q_key in zip(subj_cols, subj_keys):
+            if llm_graded_data and q_key in llm_graded_data:
+                score = llm_graded_data[q_key].get('score', 0)
+                comments.append((score, llm_graded_data[q_key].get('comment', '')))
+            else:
+                score = 0.0
+                comments.append((score, PENDING_COMMENT))
+            scores[row, col] = score
+            int_mask[row, col] = isinstance(score, int)
+        subj_comments[row] = comments
+
+    # 3. 大题与总分：只统计配置中存在的大题，按题目顺序累加 (cumsum 与逐个相加的浮点结果一致)
+    known_sections = set(section_ids)
+    counted = np.array([sec in known_sections for sec in q_secs], dtype=bool)
+
+    def _sequential_sum(cols: np.ndarray) -> Tuple[List, List]:
+        if not cols.any():
+            return [0] * n, [True] * n
+        totals = np.cumsum(scores[:, cols], axis=1)[:, -1]
+        return totals.tolist(), int_mask[:, cols].all(axis=1).tolist()
+
+    q_secs_arr = np.array(q_secs, dtype=object)
+    section_totals = {}
+    for sec_id in dict.fromkeys(section_ids):
+        section_totals[sec_id] = _sequential_sum(counted & (q_secs_arr == sec_id))
+    total_scores = _sequential_sum(counted)
+
+    def _restore(value, is_int):
+        return int(value) if is_int else value
+
+    # 4. 组装与 calculate_score 相同结构的记录
+    correct_rows = correct.tolist()
+    obj_points = [score_map.get(q_secs[j], 0) for j in obj_cols]
+    obj_pos = {int(j): i for i, j in enumerate(obj_cols)}
+    subj_pos = {int(j): i for i, j in enumerate(subj_cols)}
+
+    records = []
+    for row, student_data in enumerate(students):
+        record = {
+            '学号': student_data.get('学号', ''),
+            '姓名': student_data.get('姓名', ''),
+            '机号': student_data.get('机号', '')
+        }
+        for col, q_key in enumerate(q_keys):
+            if col in obj_pos:
+                i = obj_pos[col]
+                record[f'Q{q_key}'] = obj_points[i] if correct_rows[row][i] else 0
+            else:
+                score, comment = subj_comments[row][subj_pos[col]]
+                record[f'Q{q_key}'] = score
+                record[f'Q{q_key}_comment'] = comment
+
+        for sec_id, sec in zip(section_ids, exam_config):
+            values, is_int = section_totals[sec_id]
+            record[sec['name']] = _restore(values[row], is_int[row])
+
+        values, is_int = total_scores
+        record['总分'] = _restore(values[row], is_int[row])
+        records.append(record)
+
+    return records
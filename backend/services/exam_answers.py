@@ -0,0 +1,155 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models.exam_answer import ExamAnswer, ExamAnswerBackfill
+from backend.models.exam_record import ExamRecord
+from backend.services.core import PENDING_COMMENT
+
+STATUS_GRADED = "graded"
+STATUS_PENDING = "pending"
+
+# calculate_score 输出的单题得分列，如 "Q1-1"
+_SCORE_KEY = re.compile(r"^Q([^-_]+)-([^_]+)$")
+
+
+def _answer_text(value: Any) -> Any:
+    return None if value is None else str(value)
+
+
+def answers_by_student(students: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """学号 -> 解析出的答卷（{"1-1": "A", ...}），供保存成绩时写入 exam_answers.answer"""
+    return {str(student["学号"]): student for student in students if student.get("学号")}
+
+
+def answer_rows(details: Dict[str, Any], answers: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    从 details_json 中拆出每道题的 (question_key, section_id, answer, score, comment, status)
+    支持两种格式:
+        批改流程: {"Q1-1": 2, "Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改"}
+        在线考试: {"<题目 id>": {"student_answer": ..., "score": ...}}
+    批改流程的成绩记录不含原始答案，由 answers（该学生的答卷）提供；未提供时尝试从 details 中读取
+    """
+    if isinstance(details, str):
+        try:
+            details = json.loads(details)
+        except ValueError:
+            return []
+    if not isinstance(details, dict):
+        return []
+    rows = []
+    for key, value in details.items():
+        match = _SCORE_KEY.match(key) if key[:1] == "Q" else None
+        if match:
+            question_key = f"{match.group(1)}-{match.group(2)}"
+            comment = details.get(f"{key}_comment")
+            try:
+                score = float(value or 0)
+            except (TypeError, ValueError):
+                score = 0.0
+            rows.append({
+                "question_key": question_key,
+                "section_id": match.group(1),
+                "answer": _answer_text((answers if answers is not None else details).get(question_key)),
+                "score": score,
+                "comment": comment,
+                "status": STATUS_PENDING if comment == PENDING_COMMENT else STATUS_GRADED
+            })
+        elif isinstance(value, dict) and "score" in value:
+            rows.append({
+                "question_key": str(key),
+                "section_id": None,
+                "answer": _answer_text(value.get("student_answer")),
+                "score": float(value.get("score") or 0),
+                "comment": value.get("comment"),
+                "status": STATUS_GRADED
+            })
+    return rows
+
+
+def replace_record_answers(
+    db: Session, exam_id: int, records: Iterable[Tuple[int, Dict[str, Any], Optional[Dict[str, Any]]]]
+) -> int:
+    """
+    用 details_json 重建这些成绩记录的逐题行：一条 DELETE ... IN 加一条多行 INSERT，不提交
+    records: [(record_id, details_json, 学生答卷或 None), ...]
+    返回写入的行数
+    """
+    records = list(records)
+    if not records:
+        return 0
+    db.execute(delete(ExamAnswer).where(ExamAnswer.record_id.in_([record[0] for record in records])))
+    rows = [
+        dict(row, record_id=record_id, exam_id=exam_id)
+        for record_id, details, answers in records
+        for row in answer_rows(details, answers)
+    ]
+    if rows:
+        # Core 多行插入，跳过 ORM 批量插入的额外开销
+        db.execute(insert(ExamAnswer.__table__), rows)
+    return len(rows)
+
+
+def delete_exam_answers(db: Session, exam_id: int, student_ids: List[str] = None) -> None:
+    """删除考试（或其中部分学生）成绩记录的逐题行，不提交"""
+    query = delete(ExamAnswer).where(ExamAnswer.exam_id == exam_id)
+    if student_ids is not None:
+        query = query.where(ExamAnswer.record_id.in_(
+            select(ExamRecord.id).where(ExamRecord.exam_id == exam_id, ExamRecord.student_id.in_(student_ids))
+        ))
+    db.execute(query)
+
+
+def backfill_marker(db: Session) -> ExamAnswerBackfill:
+    """
+    读取回填进度；不存在时（exam_answers 刚建表）以当前最大成绩记录 ID 为界写入，之后保存的记录不再需要回填
+    多个进程同时启动时只有一个能写入，其余读取已写入的那一行
+    """
+    marker = db.get(ExamAnswerBackfill, 1)
+    if marker is None:
+        legacy_max = db.execute(select(func.max(ExamRecord.id))).scalar() or 0
+        db.add(ExamAnswerBackfill(id=1, legacy_max_record_id=legacy_max, backfilled_record_id=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+        marker = db.get(ExamAnswerBackfill, 1)
+    return marker
+
+
+def backfill_exam_answers(db: Session, batch_size: int = 500) -> Tuple[int, int]:
+    """
+    为建表前保存、尚无逐题行的成绩记录补写 exam_answers，按 batch_size 分批提交
+    每批提交后推进回填进度（包括没有逐题内容的记录），中断后从上次位置继续，完成后重复执行不再扫描
+    返回: (处理的记录数, 写入的行数)
+    """
+    marker = backfill_marker(db)
+    has_answers = select(ExamAnswer.record_id).distinct()
+    last_id = marker.backfilled_record_id
+    record_count = row_count = 0
+    while last_id < marker.legacy_max_record_id:
+        batch = db.execute(
+            select(ExamRecord.id, ExamRecord.exam_id, ExamRecord.details_json)
+            .where(
+                ExamRecord.id > last_id,
+                ExamRecord.id <= marker.legacy_max_record_id,
+                ExamRecord.id.not_in(has_answers)
+            )
+            .order_by(ExamRecord.id)
+            .limit(batch_size)
+        ).all()
+        # 最后一批处理完，直接推进到上界
+        last_id = batch[-1][0] if len(batch) == batch_size else marker.legacy_max_record_id
+        by_exam: Dict[int, List[Tuple[int, Dict[str, Any]]]] = {}
+        for record_id, exam_id, details in batch:
+            by_exam.setdefault(exam_id, []).append((record_id, details, None))
+        for exam_id, records in by_exam.items():
+            row_count += replace_record_answers(db, exam_id, records)
+        marker.backfilled_record_id = last_id
+        db.commit()
+        record_count += len(batch)
+    return record_count, row_count
@@ -0,0 +1,120 @@
+import time
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.few_shot import GradingExample
+from backend.services.cache import cache_service
+from backend.services.lru import LRUCache
+
+# (学校, 考试名称, 题号) -> (版本号, 过期时间, 示例列表)
+# 各进程（API / Celery worker）独立缓存；写入时递增 Redis 中该校该考试的版本号，
+# 其他进程读取时发现版本变化即重新查库。Redis 不可用时由 FEW_SHOT_CACHE_TTL 限制过期时间
+# 示例按学校隔离：不同学校的同名考试（如 "期中考试"）互不可见
+_examples_cache = LRUCache(maxsize=2048)
+VERSION_KEY = "few_shot_version:{}:{}"
+
+
+def _to_dict(example: GradingExample) -> Dict:
+    return {"student_answer": example.student_answer, "score": example.score, "comment": example.comment or ""}
+
+
+def _exam_filter(query, school_id: Optional[int], exam_name: str):
+    return query.filter(GradingExample.school_id == school_id, GradingExample.exam_name == exam_name)
+
+
+def _exam_version(school_id: Optional[int], exam_name: str) -> str:
+    return cache_service.get(VERSION_KEY.format(school_id, exam_name)) or "0"
+
+
+def _bump_version(school_id: Optional[int], exam_name: str) -> None:
+    cache_service.incr(VERSION_KEY.format(school_id, exam_name))
+
+
+def _cache_set(school_id: Optional[int], exam_name: str, question_key: str, version: str, examples: List[Dict]) -> None:
+    _examples_cache.set(
+        (school_id, exam_name, question_key),
+        (version, time.monotonic() + settings.FEW_SHOT_CACHE_TTL, examples)
+    )
+
+
+def _copy(examples: List[Dict]) -> List[Dict]:
+    # 返回副本，调用方修改结果不会影响缓存
+    return [dict(example) for example in examples]
+
+
+def get_examples(
+    db: Session, school_id: Optional[int], exam_name: Optional[str], question_key: Optional[str]
+) -> List[Dict]:
+    """读取本校某道题的评分示例，缓存未过期且版本号未变时不访问数据库"""
+    if not exam_name or not question_key:
+        return []
+    version = _exam_version(school_id, exam_name)
+    cached = _examples_cache.get((school_id, exam_name, question_key))
+    if cached is not None:
+        cached_version, expires_at, examples = cached
+        if cached_version == version and time.monotonic() < expires_at:
+            return _copy(examples)
+    rows = _exam_filter(db.query(GradingExample), school_id, exam_name).filter(
+        GradingExample.question_key == question_key
+    ).order_by(GradingExample.id).all()
+    examples = [_to_dict(row) for row in rows]
+    _cache_set(school_id, exam_name, question_key, version, examples)
+    return _copy(examples)
+
+
+def get_exam_examples(db: Session, school_id: Optional[int], exam_name: str) -> Dict[str, List[Dict]]:
+    """读取本校整场考试的评分示例: {题号: [示例, ...]}"""
+    version = _exam_version(school_id, exam_name)
+    rows = _exam_filter(db.query(GradingExample), school_id, exam_name).order_by(
+        GradingExample.question_key, GradingExample.id
+    ).all()
+    result: Dict[str, List[Dict]] = {}
+    for row in rows:
+        result.setdefault(row.question_key, []).append(_to_dict(row))
+    for question_key, examples in result.items():
+        _cache_set(school_id, exam_name, question_key, version, _copy(examples))
+    return result
+
+
+def replace_examples(
+    db: Session, school_id: Optional[int], exam_name: str, question_key: str, examples: List[Dict]
+) -> List[Dict]:
+    """整体替换本校某道题的评分示例"""
+    _exam_filter(db.query(GradingExample), school_id, exam_name).filter(
+        GradingExample.question_key == question_key
+    ).delete(synchronize_session=False)
+    for example in examples:
+        db.add(GradingExample(
+            school_id=school_id,
+            exam_name=exam_name,
+            question_key=question_key,
+            student_answer=example["student_answer"],
+            score=example["score"],
+            comment=example.get("comment")
+        ))
+    db.commit()
+    _examples_cache.pop((school_id, exam_name, question_key))
+    _bump_version(school_id, exam_name)
+    return get_examples(db, school_id, exam_name, question_key)
+
+
+def delete_examples(db: Session, school_id: Optional[int], exam_name: str, question_key: Optional[str] = None) -> int:
+    """删除本校某道题（未指定题号时为整场考试）的评分示例"""
+    query = _exam_filter(db.query(GradingExample), school_id, exam_name)
+    if question_key:
+        query = query.filter(GradingExample.question_key == question_key)
+        keys = [question_key]
+    else:
+        keys = [row[0] for row in _exam_filter(
+            db.query(GradingExample.question_key), school_id, exam_name
+        ).distinct()]
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    for key in keys:
+        _examples_cache.pop((school_id, exam_name, key))
+    _bump_version(school_id, exam_name)
+    return deleted
+
+
+def clear_examples_cache() -> None:
+    _examples_cache.clear()
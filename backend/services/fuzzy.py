@@ -0,0 +1,214 @@
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from backend.core.config import settings
+from backend.services.lru import LRUCache
+
+try:
+    # 可选依赖：安装后支持同音字（如 张珊 / 张山）的姓名匹配
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# 最优与次优候选置信度相差不足该值时视为无法区分，不做匹配
+AMBIGUITY_MARGIN = 0.05
+# 学号与姓名同时存在时两者在置信度中的权重
+NUMBER_WEIGHT = 0.6
+NAME_WEIGHT = 0.4
+# 同音但字形不同的姓名的相似度折扣
+PINYIN_DISCOUNT = 0.95
+# 每次查询从姓名索引中取出的候选数上限
+NAME_CANDIDATES = 20
+# 倒排列表长度超过该值的姓名二元组视为高频
+COMMON_GRAM_POSTINGS = 200
+
+_index_cache = LRUCache(maxsize=16)
+
+
+def edit_distance(a: Sequence, b: Sequence) -> int:
+    """编辑距离（含相邻字符交换，即 OSA 距离），适用于手写/键入时的常见错误"""
+    if a == b:
+        return 0
+    if not a or not b:
+        return max(len(a), len(b))
+    if len(a) == len(b):
+        # 等长且只有一处不同（最常见的单字符误写）时无需动态规划
+        mismatches = sum(1 for x, y in zip(a, b) if x != y)
+        if mismatches <= 1:
+            return mismatches
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def similarity(a: Sequence, b: Sequence) -> float:
+    if not a and not b:
+        return 1.0
+    return 1.0 - edit_distance(a, b) / max(len(a), len(b))
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """删除至多 depth 个字符得到的所有变体（含自身）"""
+    results = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def _name_grams(name: str) -> Set[str]:
+    padded = f"^{name}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def _pinyin(name: str) -> Optional[Tuple[str, ...]]:
+    if lazy_pinyin is None or not name:
+        return None
+    return tuple(lazy_pinyin(name))
+
+
+@dataclass
+class FuzzyMatch:
+    student_id: int
+    student_number: str
+    name: str
+    confidence: float
+
+
+class FuzzyRosterIndex:
+    """
+    单个学校花名册的模糊匹配索引
+    学号: 删除邻域索引 (SymSpell)，查询只需生成 O(L^d) 个变体做字典查找，与花名册规模无关
+    姓名: 字符二元组倒排索引 + 拼音索引（需安装 pypinyin）
+    """
+
+    def __init__(self, roster: Iterable[Tuple[int, str, str]], max_number_distance: int = None):
+        self.max_number_distance = (
+            settings.FUZZY_MAX_NUMBER_DISTANCE if max_number_distance is None else max_number_distance
+        )
+        self.entries: Dict[int, Tuple[str, str]] = {}
+        self._number_index: Dict[str, Set[int]] = {}
+        self._gram_index: Dict[str, Set[int]] = {}
+        self._pinyin_index: Dict[Tuple[str, ...], Set[int]] = {}
+        self._pinyin: Dict[int, Tuple[str, ...]] = {}
+
+        for student_id, number, name in roster:
+            number = number or ""
+            name = name or ""
+            self.entries[student_id] = (number, name)
+            if number:
+                for variant in _deletes(number, self.max_number_distance):
+                    self._number_index.setdefault(variant, set()).add(student_id)
+            if name:
+                for gram in _name_grams(name):
+                    self._gram_index.setdefault(gram, set()).add(student_id)
+                pinyin = _pinyin(name)
+                if pinyin:
+                    self._pinyin[student_id] = pinyin
+                    self._pinyin_index.setdefault(pinyin, set()).add(student_id)
+
+    def _number_candidates(self, number: str) -> Set[int]:
+        candidates: Set[int] = set()
+        for variant in _deletes(number, self.max_number_distance):
+            candidates |= self._number_index.get(variant, set())
+        return candidates
+
+    def _name_candidates(self, name: str) -> Set[int]:
+        postings = sorted(
+            (self._gram_index[gram] for gram in _name_grams(name) if gram in self._gram_index), key=len
+        )
+        # 常见姓氏等高频二元组区分度低，只用其余二元组计数（全部高频时保留最稀有的一个）
+        rare = [p for p in postings if len(p) <= COMMON_GRAM_POSTINGS] or postings[:1]
+        shared: Counter = Counter()
+        for posting in rare:
+            shared.update(posting)
+        candidates = {student_id for student_id, _ in shared.most_common(NAME_CANDIDATES)}
+        pinyin = _pinyin(name)
+        if pinyin:
+            candidates |= self._pinyin_index.get(pinyin, set())
+        return candidates
+
+    def _name_similarity(self, name: str, student_id: int) -> float:
+        score = similarity(name, self.entries[student_id][1])
+        pinyin = _pinyin(name)
+        other = self._pinyin.get(student_id)
+        if pinyin and other:
+            score = max(score, similarity(pinyin, other) * PINYIN_DISCOUNT)
+        return score
+
+    def search(
+        self, number: Optional[str], name: Optional[str], min_confidence: float = 0.0
+    ) -> List[FuzzyMatch]:
+        """返回按置信度从高到低排序的候选，min_confidence 用于提前剪枝"""
+        number = (number or "").strip()
+        name = (name or "").strip()
+        number_candidates = self._number_candidates(number) if number else set()
+        candidates = number_candidates | (self._name_candidates(name) if name else set())
+
+        results = []
+        for student_id in candidates:
+            student_number, student_name = self.entries[student_id]
+            name_score = self._name_similarity(name, student_id) if name else None
+            if number and student_id not in number_candidates:
+                # 不在学号索引中的候选，学号编辑距离至少为 max_number_distance + 1，且不小于长度差；
+                # 相似度按较长的学号归一化，因此上界与两者的长度都有关
+                distance = max(self.max_number_distance + 1, abs(len(number) - len(student_number)))
+                number_bound = 1.0 - distance / max(len(number), len(student_number))
+                bound = number_bound if name_score is None else (
+                    NUMBER_WEIGHT * number_bound + NAME_WEIGHT * name_score
+                )
+                if bound < min_confidence:
+                    continue
+            number_score = similarity(number, student_number) if number else None
+            if number_score is not None and name_score is not None:
+                confidence = NUMBER_WEIGHT * number_score + NAME_WEIGHT * name_score
+            else:
+                confidence = number_score if number_score is not None else name_score
+            if confidence < min_confidence:
+                continue
+            results.append(FuzzyMatch(student_id, student_number, student_name, round(confidence, 4)))
+        results.sort(key=lambda m: (-m.confidence, m.student_id))
+        return results
+
+    def best_match(
+        self, number: Optional[str], name: Optional[str], threshold: float = None
+    ) -> Optional[FuzzyMatch]:
+        """置信度不低于阈值且明显优于次优候选时返回最佳匹配，否则返回 None"""
+        if threshold is None:
+            threshold = settings.FUZZY_MATCH_THRESHOLD
+        # 低于 threshold - AMBIGUITY_MARGIN 的候选既不会胜出也不影响歧义判断
+        results = self.search(number, name, threshold - AMBIGUITY_MARGIN)
+        if not results or results[0].confidence < threshold:
+            return None
+        if len(results) > 1 and results[0].confidence - results[1].confidence < AMBIGUITY_MARGIN:
+            return None
+        return results[0]
+
+
+def roster_signature(roster: Iterable[Tuple[int, str, str]]) -> str:
+    digest = hashlib.sha256()
+    for student_id, number, name in roster:
+        digest.update(f"{student_id}\x1f{number}\x1f{name}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_fuzzy_index(school_id: int, roster: List[Tuple[int, str, str]]) -> FuzzyRosterIndex:
+    """按学校缓存模糊索引，花名册内容变化时自动重建"""
+    signature = roster_signature(roster)
+    cached = _index_cache.get(school_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+    index = FuzzyRosterIndex(roster)
+    _index_cache.set(school_id, (signature, index))
+    return index
@@ -0,0 +1,136 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from backend.services.checkpoint import CheckpointStore, restore_checkpoints
+from backend.services.core import calculate_scores
+from backend.services.llm import grade_subjective_batch
+from backend.services.matching import MatchService
+from backend.services.progress import ProgressReporter
+
+
+def match_payload_students(
+    db: Session, school_id: Optional[int], students: List[Dict], matcher: MatchService = None
+) -> Optional[Dict[str, Any]]:
+    """
+    按花名册匹配学生（花名册只加载一次），用数据库中的学号、姓名覆盖答卷上的信息
+    分批匹配时可传入同一个 matcher 复用已加载的花名册
+    返回匹配报告；没有学校上下文时返回 None
+    """
+    if not school_id:
+        return None
+    matcher = matcher or MatchService(db, school_id)
+    matches, match_report = matcher.match_students(
+        [(student.get("学号"), student.get("姓名")) for student in students]
+    )
+    for student, matched_student in zip(students, matches):
+        if matched_student:
+            # Update info from DB source of truth
+            student["学号"] = matched_student.student_number
+            student["姓名"] = matched_student.name
+            student["_db_id"] = matched_student.id
+        else:
+            student["_db_match"] = False
+    return match_report
+
+
+def build_llm_graded_list(students: List[Dict], llm_results: Dict[str, Dict]) -> List[Dict]:
+    """合并答卷自带的 llm_graded 与请求中按学号提供的 llm_results"""
+    llm_graded_list = []
+    for student in students:
+        s_llm = dict(student.get("llm_graded", {}))
+        student_id = student.get("学号")
+        if student_id and student_id in llm_results:
+            s_llm.update(llm_results[student_id])
+        llm_graded_list.append(s_llm)
+    return llm_graded_list
+
+
+def collect_subjective_items(
+    students: List[Dict], standard_key: Dict, sections: List[Dict], llm_graded_list: List[Dict],
+    examples: Dict[str, List[Dict]] = None
+) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str]]]:
+    """
+    收集尚未批改的主观题答案
+    examples: {题号: 评分示例列表}，用于 Few-Shot
+    返回: (grade_subjective_batch 所需的 items, 对应的 (学生下标, 题号) 列表)
+    """
+    items, targets = [], []
+    for i, section in enumerate(sections):
+        if section.get("question_type", "客观题") != "主观题":
+            continue
+        sec_id = section.get("section_id", str(i + 1))
+        sub_questions = {str(q.get("id")): q for q in section.get("sub_questions", [])}
+        for q_key, reference in standard_key.items():
+            if "-" not in q_key or q_key.split("-")[0] != sec_id:
+                continue
+            sub = sub_questions.get(q_key.split("-", 1)[1], {})
+            for idx, student in enumerate(students):
+                answer = student.get(q_key)
+                if not answer or q_key in llm_graded_list[idx]:
+                    continue
+                items.append({
+                    "question_text": sub.get("question_text") or f"{section.get('name', '')} 第{q_key}题",
+                    "reference_answer": sub.get("reference_answer") or reference,
+                    "student_answer": answer,
+                    "max_score": section.get("score", 0),
+                    "grading_criteria": sub.get("criteria") or section.get("grading_criteria"),
+                    "examples": (examples or {}).get(q_key) or None
+                })
+                targets.append((idx, q_key))
+    return items, targets
+
+
+async def grade_students(
+    students: List[Dict],
+    standard_key: Dict,
+    sections: List[Dict],
+    llm_results: Dict[str, Dict] = None,
+    llm_config: Dict[str, Any] = None,
+    examples: Dict[str, List[Dict]] = None,
+    checkpoints: Optional[CheckpointStore] = None,
+    progress: Optional[ProgressReporter] = None
+) -> List[Dict]:
+    """
+    计分一批（已完成花名册匹配的）学生
+    提供 llm_config 时先并发批改所有尚未批改的主观题答案，失败的答案保持“待批改”
+    提供 checkpoints 时跳过已有检查点的 (学生, 题目)，每份答案批改成功后立即写入检查点
+    提供 progress 时每批改完一份答案、计分完这批学生后发布进度
+    """
+    llm_graded_list = build_llm_graded_list(students, llm_results or {})
+    if llm_config:
+        loop = asyncio.get_running_loop()
+        restored = 0
+        if checkpoints is not None:
+            saved = await loop.run_in_executor(None, checkpoints.load, [s.get("学号") for s in students])
+            restored = restore_checkpoints(saved, students, llm_graded_list)
+
+        items, targets = collect_subjective_items(students, standard_key, sections, llm_graded_list, examples)
+        if progress is not None:
+            await loop.run_in_executor(None, progress.add_units, len(items) + restored, restored)
+
+        on_result = None
+        if checkpoints is not None or progress is not None:
+            async def on_result(i: int, result: Tuple[bool, float, str]) -> None:
+                success, score, comment = result
+                idx, q_key = targets[i]
+                student_id = students[idx].get("学号")
+                if checkpoints is not None and success and student_id:
+                    await checkpoints.save_async(student_id, q_key, items[i]["student_answer"], score, comment)
+                if progress is not None:
+                    await progress.unit_done_async(success)
+
+        results = await grade_subjective_batch(items, llm_config, on_result=on_result) if items else []
+        for (idx, q_key), (success, score, comment) in zip(targets, results):
+            if success:
+                llm_graded_list[idx][q_key] = {"score": score, "comment": comment}
+
+    # 整批学生一次性向量化计分
+    records = calculate_scores(students, standard_key, sections, llm_graded_list)
+    if progress is not None:
+        progress.students_done(len(students))
+    return records
+
+
+def chunk_students(students: List[Dict], size: int) -> List[List[Dict]]:
+    size = max(1, size)
+    return [students[start:start + size] for start in range(0, len(students), size)]
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import uuid
+from typing import Any, Dict, Iterable, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.db.session import SessionLocal
+from backend.models.grading_job import GradingJob, GradingStagedObject
+from backend.models.old_models import LLMConfig
+from backend.utils.config_utils import read_json, LLM_CONFIG_FILE
+
+
+class StagedObjectNotFound(Exception):
+    pass
+
+
+def stage_data(data: Any, kind: str, session_factory=SessionLocal) -> str:
+    """把数据存入 grading_staged_objects，返回引用；Celery 消息中只传引用"""
+    ref = f"{kind}_{uuid.uuid4().hex}"
+    db = session_factory()
+    try:
+        db.add(GradingStagedObject(ref=ref, kind=kind, data=data))
+        db.commit()
+    finally:
+        db.close()
+    return ref
+
+
+def load_staged(ref: str, session_factory=SessionLocal) -> Any:
+    db = session_factory()
+    try:
+        row = db.query(GradingStagedObject.data).filter(GradingStagedObject.ref == ref).first()
+    finally:
+        db.close()
+    if row is None:
+        raise StagedObjectNotFound(f"Staged object {ref} not found")
+    return row[0]
+
+
+def delete_staged(refs: Iterable[Optional[str]], session_factory=SessionLocal) -> None:
+    refs = [ref for ref in refs if ref]
+    if not refs:
+        return
+    db = session_factory()
+    try:
+        db.query(GradingStagedObject).filter(GradingStagedObject.ref.in_(refs)).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        # 清理失败不影响任务结果
+        db.rollback()
+    finally:
+        db.close()
+
+
+# 暂存区中客户端自带的 API 密钥以 SECRET_KEY 派生的密钥加密保存
+ENCRYPTED_KEY_FIELD = "api_key_encrypted"
+
+
+def _fernet() -> Fernet:
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(settings.SECRET_KEY.encode("utf-8")).digest()))
+
+
+def redact_llm_config(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """暂存前把 llm_config 中客户端自带的 api_key 换成密文，暂存区中不出现明文密钥"""
+    llm_config = payload.get("llm_config")
+    if not llm_config or not llm_config.get("api_key"):
+        return payload
+    redacted = {k: v for k, v in llm_config.items() if k != "api_key"}
+    redacted[ENCRYPTED_KEY_FIELD] = _fernet().encrypt(llm_config["api_key"].encode("utf-8")).decode("ascii")
+    return dict(payload, llm_config=redacted)
+
+
+def resolve_llm_config(llm_config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    worker 端还原 LLM 配置:
+        客户端提供了密钥: 解密后按客户端的 base_url / model 调用
+        未提供密钥: 使用服务端密钥（LLM_API_KEY 环境变量优先，其次是系统 LLM 设置），
+                    base_url 与 model 一律取系统 LLM 设置，服务端密钥不会发往客户端指定的地址
+    """
+    if not llm_config:
+        return llm_config
+    if llm_config.get("api_key"):
+        return llm_config
+    if llm_config.get(ENCRYPTED_KEY_FIELD):
+        try:
+            api_key = _fernet().decrypt(llm_config[ENCRYPTED_KEY_FIELD].encode("ascii")).decode("utf-8")
+        except InvalidToken:
+            raise ValueError("Staged LLM API key cannot be decrypted (SECRET_KEY changed?)")
+        config = {k: v for k, v in llm_config.items() if k != ENCRYPTED_KEY_FIELD}
+        return dict(config, api_key=api_key)
+
+    try:
+        server_config = read_json(LLM_CONFIG_FILE, LLMConfig)
+    except Exception:
+        server_config = None
+    if server_config is None:
+        raise ValueError("LLM is not configured on the server (LLM settings)")
+    api_key = settings.LLM_API_KEY or server_config.api_key
+    if not api_key:
+        raise ValueError("LLM API key is not configured on the server (LLM_API_KEY or LLM settings)")
+    return dict(server_config.model_dump(), api_key=api_key)
+
+
+def create_grading_job(db: Session, user_id: int, payload: Dict[str, Any]) -> GradingJob:
+    """暂存请求数据（API 密钥加密保存）并登记批改任务"""
+    job = GradingJob(
+        user_id=user_id,
+        exam_name=payload.get("exam_name"),
+        status="queued",
+        payload_ref=stage_data(redact_llm_config(payload), "payload")
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def update_grading_job(job_id: Optional[int], **fields: Any) -> None:
+    """在 Celery 任务中更新任务状态（使用独立会话）"""
+    if not job_id:
+        return
+    db = SessionLocal()
+    try:
+        db.query(GradingJob).filter(GradingJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.exam import Exam
+from backend.models.exam_record import ExamRecord
+from backend.models.user import User
+from backend.services.exam_answers import delete_exam_answers, replace_record_answers
+
+# 成绩记录中单独成列的字段，其余内容写入 details_json
+RECORD_KEYS = ["学号", "student_id", "姓名", "student_name", "机号", "machine_id", "总分", "total_score"]
+
+
+def get_or_create_exam(db: Session, exam_name: str, user: User) -> Exam:
+    """在用户所在学校内按名称查找考试，不存在时创建"""
+    query = db.query(Exam).filter(Exam.name == exam_name)
+    if user.school_id:
+        query = query.filter(Exam.school_id == user.school_id)
+
+    exam = query.first()
+    if not exam:
+        exam = Exam(
+            name=exam_name,
+            creator_id=user.id,
+            school_id=user.school_id if user.school_id else 1, # Fallback to default school
+            status="finished"
+        )
+        db.add(exam)
+        db.commit()
+        db.refresh(exam)
+    return exam
+
+
+def _record_row(exam_id: int, student_id: Any, rec_data: Dict[str, Any]) -> Dict[str, Any]:
+    student_name = rec_data.get("姓名") or rec_data.get("student_name")
+    machine_id = rec_data.get("机号") or rec_data.get("machine_id")
+    total_score = rec_data.get("总分") or rec_data.get("total_score")
+    return {
+        "exam_id": exam_id,
+        "student_id": str(student_id),
+        "student_name": student_name,
+        "machine_id": str(machine_id),
+        "total_score": float(total_score) if total_score is not None else 0.0,
+        # Details: everything else
+        "details_json": {k: v for k, v in rec_data.items() if k not in RECORD_KEYS}
+    }
+
+
+def save_exam_records(
+    db: Session,
+    exam_name: str,
+    records: List[Dict[str, Any]],
+    user: User,
+    chunk_size: int = None,
+    answers: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Tuple[Exam, int]:
+    """
+    保存成绩记录：考试不存在时创建，同一学生的旧记录被替换（同一批中重复的学号以最后一条为准）
+    按 chunk_size 分块，每块一条 DELETE ... WHERE student_id IN (...) 加一条多行 INSERT，逐块提交
+    逐题的答案/得分同步写入 exam_answers；answers（学号 -> 答卷，见 answers_by_student）提供原始答案
+    返回: (exam, 保存的记录数)
+    """
+    exam = get_or_create_exam(db, exam_name, user)
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for rec_data in records:
+        student_id = rec_data.get("学号") or rec_data.get("student_id")
+        if not student_id:
+            continue
+        rows.pop(str(student_id), None)
+        rows[str(student_id)] = _record_row(exam.id, student_id, rec_data)
+
+    rows = list(rows.values())
+    chunk_size = max(1, chunk_size or settings.HISTORY_SAVE_CHUNK_SIZE)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        student_ids = [row["student_id"] for row in chunk]
+        delete_exam_answers(db, exam.id, student_ids)
+        db.execute(delete(ExamRecord).where(
+            ExamRecord.exam_id == exam.id,
+            ExamRecord.student_id.in_(student_ids)
+        ))
+        db.execute(insert(ExamRecord), chunk)
+        # 同步写入逐题行
+        details = {row["student_id"]: row["details_json"] for row in chunk}
+        inserted = db.execute(select(ExamRecord.id, ExamRecord.student_id).where(
+            ExamRecord.exam_id == exam.id,
+            ExamRecord.student_id.in_(student_ids)
+        )).all()
+        replace_record_answers(db, exam.id, [
+            (record_id, details[student_id], answers.get(student_id) if answers is not None else None)
+            for record_id, student_id in inserted
+        ])
+        db.commit()
+
+    return exam, len(rows)
@@ -0,0 +1,70 @@
+import json
+from typing import Any, List
+
+
+class JSONArrayStreamParser:
+    """
+    增量解析 JSON 数组：逐段喂入模型输出的文本，每当数组中的一个对象闭合就立即返回该对象
+    忽略第一个 '[' 之前的内容（如 ```json 代码块标记）以及数组结束之后的内容
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.errors = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, text: str) -> List[Any]:
+        """喂入一段文本，返回其中完成闭合的数组元素（对象）"""
+        items: List[Any] = []
+        for char in text:
+            if self._finished:
+                break
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._depth > 1:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 1:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    items.extend(self._flush())
+                elif self._depth == 0:
+                    self._finished = True
+        return items
+
+    def _flush(self) -> List[Any]:
+        raw = "".join(self._buffer)
+        self._buffer = []
+        try:
+            return [json.loads(raw)]
+        except ValueError:
+            # 单个元素格式错误时跳过，不影响后续元素
+            self.errors += 1
+            return []
@@ -1,41 +1,28 @@
+import asyncio
 import json
-import requests
 import re
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from backend.core.config import settings
+from backend.services.llm_client import chat_sync, get_sync_session, get_async_llm_client, LLMStreamError
+from backend.services.json_stream import JSONArrayStreamParser
+from backend.services.llm_cache import (
+    grading_cache_key, grading_cache_stats, cached_grading, cached_grading_async,
+    lookup_gradings, normalize_answer, store_grading
+)
 
 def call_llm_api(prompt: str, api_config: Dict[str, Any], system_prompt: str = None) -> Tuple[bool, Any]:
     """
-    调用LLM API
+    调用LLM API (同步，复用连接池；限流与重试见 llm_client.chat_sync)
     返回: (success, response_text/error_msg)
     """
-    try:
-        url = f"{api_config['base_url'].rstrip('/')}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_config['api_key']}",
-            "Content-Type": "application/json"
-        }
+    return chat_sync(prompt, api_config, system_prompt)
 
-        default_system = "你是一位专业的教师，负责批改学生的主观题答案。请根据题目、参考答案和评分标准，给出客观公正的评分。"
-
-        data = {
-            "model": api_config.get('model', 'gpt-4o-mini'),
-            "messages": [
-                {"role": "system", "content": system_prompt if system_prompt else default_system},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": api_config.get('temperature', 0.3),
-            "max_tokens": api_config.get('max_tokens', 1000) # Increased token limit for generation
-        }
-
-        response = requests.post(url, headers=headers, json=data, timeout=60) # Increased timeout
-        response.raise_for_status()
-
-        result = response.json()
-        content = result['choices'][0]['message']['content']
-        return True, content
-
-    except Exception as e:
-        return False, f"API调用失败: {str(e)}"
+async def async_call_llm_api(prompt: str, api_config: Dict[str, Any], system_prompt: str = None) -> Tuple[bool, Any]:
+    """
+    调用LLM API (异步，不阻塞事件循环；并发数受 LLM_MAX_CONCURRENCY 限制)
+    返回: (success, response_text/error_msg)
+    """
+    return await get_async_llm_client().chat(prompt, api_config, system_prompt)
 
 def test_llm_connection(api_config: Dict[str, Any]) -> Tuple[bool, str]:
     """
@@ -56,36 +43,34 @@ def test_llm_connection(api_config: Dict[str, Any]) -> Tuple[bool, str]:
             "max_tokens": 5
         }
 
-        response = requests.post(url, headers=headers, json=data, timeout=10)
+        response = get_sync_session().post(url, headers=headers, json=data, timeout=10)
         response.raise_for_status()
         return True, "连接成功"
     except Exception as e:
         return False, str(e)
 
-def grade_subjective_question(
-    question_text: str,
-    reference_answer: str,
-    student_answer: str,
-    max_score: float,
-    grading_criteria: str,
-    api_config: Dict[str, Any],
-    examples: List[Dict] = None
-) -> Tuple[bool, float, str]:
-    """
-    批改单个主观题
-    返回: (success, score, comment)
-    """
+# Python 3.11 f-string compatibility: define default criteria outside
+DEFAULT_GRADING_CRITERIA = '1. 准确性：答案是否涵盖了参考答案的核心要点\n2. 完整性：论述是否全面\n3. 逻辑性：条理是否清晰'
+
+def build_few_shot_text(examples: List[Dict] = None) -> str:
     # 构建 Few-Shot 示例部分
     few_shot_text = ""
     if examples:
         few_shot_text = "【参考示例 (Few-Shot)】\n以下是教师提供的评分参考示例，请学习其评分尺度和评语风格：\n\n"
         for i, ex in enumerate(examples):
             few_shot_text += f"示例 {i+1}:\n[学生答案]: {ex['student_answer']}\n[评分]: {ex['score']}\n[评语]: {ex['comment']}\n\n"
+    return few_shot_text
 
-    
-    # Python 3.11 f-string compatibility: define default criteria outside
-    default_criteria = '1. 准确性：答案是否涵盖了参考答案的核心要点\n2. 完整性：论述是否全面\n3. 逻辑性：条理是否清晰'
-    criteria_text = grading_criteria if grading_criteria else default_criteria
+def build_grading_prompt(
+    question_text: str,
+    reference_answer: str,
+    student_answer: str,
+    max_score: float,
+    grading_criteria: str,
+    examples: List[Dict] = None
+) -> str:
+    few_shot_text = build_few_shot_text(examples)
+    criteria_text = grading_criteria if grading_criteria else DEFAULT_GRADING_CRITERIA
 
     # 构建批改prompt
     prompt = f"""请批改以下主观题：
@@ -113,11 +98,9 @@ def grade_subjective_question(
 请严格按照以下JSON格式返回结果：
 {{"score": 分数, "comment": "详细评语，包含得分理由和建议"}}
 """
+    return prompt
 
-    success, response = call_llm_api(prompt, api_config)
-    if not success:
-        return False, 0.0, response
-
+def parse_grading_response(response: str, max_score: float) -> Tuple[bool, float, str]:
     # 解析LLM返回的结果
     try:
         # 尝试提取JSON
@@ -141,20 +124,268 @@ def grade_subjective_question(
     except Exception as e:
         return False, 0.0, f"解析失败: {str(e)}"
 
-def batch_generate_questions(
-    topic: str,
-    question_type: str,
-    difficulty: str,
-    count: int,
-    api_config: Dict[str, Any]
-) -> Tuple[bool, List[Dict], str]:
+def build_packed_grading_prompt(
+    question_text: str,
+    reference_answer: str,
+    student_answers: List[str],
+    max_score: float,
+    grading_criteria: str,
+    examples: List[Dict] = None
+) -> str:
+    """同一道题的多份答案合并到一个prompt中，题目、参考答案与示例只发送一次"""
+    few_shot_text = build_few_shot_text(examples)
+    criteria_text = grading_criteria if grading_criteria else DEFAULT_GRADING_CRITERIA
+    answers_text = "\n".join(f"[答案 {i+1}]\n{answer}\n" for i, answer in enumerate(student_answers))
+    count = len(student_answers)
+
+    prompt = f"""请批改以下主观题的 {count} 份学生答案：
+
+【题目】
+{question_text}
+
+【参考答案】
+{reference_answer}
+
+【评分标准】
+满分：{max_score}分
+{criteria_text}
+
+{few_shot_text}
+
+【学生答案】
+{answers_text}
+【批改要求】
+1. 每份答案独立评分，互不影响
+2. 请仔细对比学生答案与参考答案及评分标准
+3. 给出0到{max_score}之间的分数（可以是小数）
+4. **必须给出详细的评分理由**，说明得分点和扣分点
+
+请严格按照以下JSON数组格式返回结果，按答案编号顺序每份答案一个元素，共 {count} 个：
+[{{"id": 1, "score": 分数, "comment": "详细评语，包含得分理由和建议"}}, ...]
+"""
+    return prompt
+
+def parse_packed_grading_response(response: str, count: int, max_score: float) -> Optional[List[Tuple[bool, float, str]]]:
+    """解析合并批改的JSON数组，数量或格式不符时返回 None（由调用方逐份重新批改）"""
+    try:
+        start, end = response.index('['), response.rindex(']')
+        items = json.loads(response[start:end + 1])
+        if not isinstance(items, list) or len(items) != count:
+            return None
+        # 优先按 id 对应，id 缺失或不完整时按顺序对应
+        ids = [item.get('id') for item in items]
+        if sorted(str(i) for i in ids) == sorted(str(i) for i in range(1, count + 1)):
+            items = sorted(items, key=lambda item: int(item['id']))
+        results = []
+        for item in items:
+            score = max(0, min(float(item['score']), max_score))
+            results.append((True, score, item.get('comment', '无评语')))
+        return results
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+def grade_subjective_question(
+    question_text: str,
+    reference_answer: str,
+    student_answer: str,
+    max_score: float,
+    grading_criteria: str,
+    api_config: Dict[str, Any],
+    examples: List[Dict] = None
+) -> Tuple[bool, float, str]:
     """
-    Batch generate questions using LLM.
-    Returns: (success, list_of_questions, error_message)
+    批改单个主观题 (相同题目下规范化后相同的答案只调用一次 LLM)
+    返回: (success, score, comment)
+    """
+    def grade() -> Tuple[bool, float, str]:
+        prompt = build_grading_prompt(question_text, reference_answer, student_answer, max_score, grading_criteria, examples)
+        success, response = call_llm_api(prompt, api_config)
+        if not success:
+            return False, 0.0, response
+        return parse_grading_response(response, max_score)
+
+    key = grading_cache_key(question_text, reference_answer, student_answer, max_score, grading_criteria, api_config, examples)
+    return cached_grading(key, grade)
+
+async def grade_subjective_question_async(
+    question_text: str,
+    reference_answer: str,
+    student_answer: str,
+    max_score: float,
+    grading_criteria: str,
+    api_config: Dict[str, Any],
+    examples: List[Dict] = None
+) -> Tuple[bool, float, str]:
     """
+    批改单个主观题 (异步版本，同样使用批改结果缓存，并发中的相同答案合并为一次请求)
+    返回: (success, score, comment)
+    """
+    async def grade() -> Tuple[bool, float, str]:
+        return await _grade_single_async(
+            question_text, reference_answer, student_answer, max_score, grading_criteria, api_config, examples
+        )
 
-    system_prompt = "You are an expert exam question generator. You must output strictly valid JSON."
+    key = grading_cache_key(question_text, reference_answer, student_answer, max_score, grading_criteria, api_config, examples)
+    return await cached_grading_async(key, grade)
 
+async def _grade_single_async(
+    question_text: str,
+    reference_answer: str,
+    student_answer: str,
+    max_score: float,
+    grading_criteria: str,
+    api_config: Dict[str, Any],
+    examples: List[Dict] = None
+) -> Tuple[bool, float, str]:
+    prompt = build_grading_prompt(question_text, reference_answer, student_answer, max_score, grading_criteria, examples)
+    success, response = await async_call_llm_api(prompt, api_config)
+    if not success:
+        return False, 0.0, response
+    return parse_grading_response(response, max_score)
+
+# 批改结果回调: (答案下标, (success, score, comment))，每份答案得到结果后立即调用
+ResultCallback = Callable[[int, Tuple[bool, float, str]], Awaitable[None]]
+
+async def grade_subjective_packed(
+    question_text: str,
+    reference_answer: str,
+    student_answers: List[str],
+    max_score: float,
+    grading_criteria: str,
+    api_config: Dict[str, Any],
+    examples: List[Dict] = None,
+    pack_size: int = None,
+    on_result: ResultCallback = None
+) -> List[Tuple[bool, float, str]]:
+    """
+    同一道题的多份答案合并批改：每次请求包含 pack_size 份答案，各组并发请求
+    先查批改结果缓存，规范化后相同的答案只批改一次；某组解析失败时该组逐份重新批改
+    返回: 与 student_answers 顺序一致的 [(success, score, comment), ...]
+    """
+    pack_size = max(1, pack_size or settings.LLM_GRADING_PACK_SIZE)
+    keys = [
+        grading_cache_key(question_text, reference_answer, answer, max_score, grading_criteria, api_config, examples)
+        for answer in student_answers
+    ]
+    # 每个不同的 key 只取第一份答案去批改
+    unique: Dict[str, str] = {}
+    for key, answer in zip(keys, student_answers):
+        if key in unique:
+            grading_cache_stats.record("coalesced")
+        else:
+            unique[key] = answer
+
+    positions: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        positions.setdefault(key, []).append(i)
+
+    async def notify(key: str) -> None:
+        if on_result is not None:
+            for i in positions[key]:
+                await on_result(i, results[key])
+
+    results = await lookup_gradings(list(unique))
+    for key in list(results):
+        await notify(key)
+    pending = [key for key in unique if key not in results]
+    for _ in pending:
+        grading_cache_stats.record("misses")
+
+    # 合并后的回复更长，按每组答案数放大 max_tokens
+    packed_config = dict(api_config, max_tokens=api_config.get('max_tokens', 1000) * min(pack_size, len(pending) or 1))
+
+    async def grade_chunk(chunk: List[str]) -> None:
+        answers = [unique[key] for key in chunk]
+        parsed = None
+        if len(chunk) > 1:
+            prompt = build_packed_grading_prompt(question_text, reference_answer, answers, max_score, grading_criteria, examples)
+            success, response = await async_call_llm_api(prompt, packed_config)
+            if success:
+                parsed = parse_packed_grading_response(response, len(chunk), max_score)
+        if parsed is None:
+            parsed = await asyncio.gather(*[
+                _grade_single_async(question_text, reference_answer, answer, max_score, grading_criteria, api_config, examples)
+                for answer in answers
+            ])
+        loop = asyncio.get_running_loop()
+        for key, result in zip(chunk, parsed):
+            results[key] = result
+            await loop.run_in_executor(None, store_grading, key, result)
+            await notify(key)
+
+    await asyncio.gather(*[
+        grade_chunk(pending[i:i + pack_size]) for i in range(0, len(pending), pack_size)
+    ])
+    return [results[key] for key in keys]
+
+async def grade_subjective_batch(
+    items: List[Dict[str, Any]], api_config: Dict[str, Any], pack_size: int = None,
+    on_result: ResultCallback = None
+) -> List[Tuple[bool, float, str]]:
+    """
+    并发批改多个主观题答案，结果与 items 顺序一致
+    items: [{question_text, reference_answer, student_answer, max_score, grading_criteria, examples}, ...]
+    同一道题的答案按 pack_size (默认 LLM_GRADING_PACK_SIZE) 合并批改；pack_size=1 时逐份批改
+    on_result: 每份答案批改完成时以 (items 下标, 结果) 调用，可用于保存中间结果
+    """
+    pack_size = pack_size or settings.LLM_GRADING_PACK_SIZE
+    if pack_size <= 1:
+        async def grade_one(i: int, item: Dict[str, Any]) -> Tuple[bool, float, str]:
+            result = await grade_subjective_question_async(
+                question_text=item.get("question_text", ""),
+                reference_answer=item.get("reference_answer", ""),
+                student_answer=item.get("student_answer", ""),
+                max_score=item.get("max_score", 0),
+                grading_criteria=item.get("grading_criteria"),
+                api_config=api_config,
+                examples=item.get("examples")
+            )
+            if on_result is not None:
+                await on_result(i, result)
+            return result
+
+        return await asyncio.gather(*[grade_one(i, item) for i, item in enumerate(items)])
+
+    # 按题目分组（题目、参考答案、满分、评分标准、示例均相同）
+    groups: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        group_key = json.dumps([
+            item.get("question_text", ""), item.get("reference_answer", ""), item.get("max_score", 0),
+            item.get("grading_criteria"), item.get("examples")
+        ], ensure_ascii=False, sort_keys=True, default=str)
+        groups.setdefault(group_key, []).append(i)
+
+    async def grade_group(indices: List[int]):
+        first = items[indices[0]]
+        group_callback = None
+        if on_result is not None:
+            async def group_callback(j: int, result: Tuple[bool, float, str]) -> None:
+                await on_result(indices[j], result)
+        return await grade_subjective_packed(
+            question_text=first.get("question_text", ""),
+            reference_answer=first.get("reference_answer", ""),
+            student_answers=[items[i].get("student_answer", "") for i in indices],
+            max_score=first.get("max_score", 0),
+            grading_criteria=first.get("grading_criteria"),
+            api_config=api_config,
+            examples=first.get("examples"),
+            pack_size=pack_size,
+            on_result=group_callback
+        )
+
+    group_indices = list(groups.values())
+    group_results = await asyncio.gather(*[grade_group(indices) for indices in group_indices])
+    results: List[Tuple[bool, float, str]] = [None] * len(items)
+    for indices, graded in zip(group_indices, group_results):
+        for i, result in zip(indices, graded):
+            results[i] = result
+    return results
+
+GENERATION_SYSTEM_PROMPT = "You are an expert exam question generator. You must output strictly valid JSON."
+
+def build_generation_prompt(
+    topic: str, question_type: str, difficulty: str, count: int, part: Optional[Tuple[int, int]] = None
+) -> str:
     # Define type-specific instructions
     type_instructions = ""
     if question_type in ["single_choice", "multiple_choice"]:
@@ -164,6 +395,14 @@ def batch_generate_questions(
     else:
         type_instructions = "For subjective questions, leave 'options' empty. Provide a comprehensive reference answer."
 
+    # 分块并行生成时提示各块覆盖不同方面，减少重复题目
+    if part is not None:
+        index, total = part
+        type_instructions += (
+            f" This is batch {index} of {total} generated independently; "
+            f"focus on aspect #{index} of the topic so questions do not overlap with other batches."
+        )
+
     prompt = f"""
     Generate {count} exam questions about "{topic}".
 
@@ -190,11 +429,9 @@ def batch_generate_questions(
     Do not include any markdown formatting (like ```json). Just the raw JSON string.
     """
 
-    success, response = call_llm_api(prompt, api_config, system_prompt=system_prompt)
-
-    if not success:
-        return False, [], response
+    return prompt
 
+def parse_generated_questions(response: str) -> Tuple[bool, List[Dict], str]:
     try:
         # Clean up potential markdown code blocks
         clean_response = response.strip()
@@ -220,3 +457,170 @@ def batch_generate_questions(
         return False, [], f"Failed to parse JSON response: {response}"
     except Exception as e:
         return False, [], f"Error processing questions: {str(e)}"
+
+def batch_generate_questions(
+    topic: str,
+    question_type: str,
+    difficulty: str,
+    count: int,
+    api_config: Dict[str, Any]
+) -> Tuple[bool, List[Dict], str]:
+    """
+    Batch generate questions using LLM.
+    Returns: (success, list_of_questions, error_message)
+    """
+    prompt = build_generation_prompt(topic, question_type, difficulty, count)
+    success, response = call_llm_api(prompt, api_config, system_prompt=GENERATION_SYSTEM_PROMPT)
+
+    if not success:
+        return False, [], response
+
+    return parse_generated_questions(response)
+
+async def batch_generate_questions_async(
+    topic: str,
+    question_type: str,
+    difficulty: str,
+    count: int,
+    api_config: Dict[str, Any],
+    part: Optional[Tuple[int, int]] = None
+) -> Tuple[bool, List[Dict], str]:
+    """
+    Async variant of batch_generate_questions (does not block the event loop).
+    Returns: (success, list_of_questions, error_message)
+    """
+    prompt = build_generation_prompt(topic, question_type, difficulty, count, part)
+    success, response = await async_call_llm_api(prompt, api_config, system_prompt=GENERATION_SYSTEM_PROMPT)
+
+    if not success:
+        return False, [], response
+
+    return parse_generated_questions(response)
+
+def _content_grams(question: Dict) -> set:
+    text = normalize_answer(str(question.get("content", "")))
+    if len(text) < 2:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+class QuestionDeduper:
+    """按题干的字符二元组 Jaccard 相似度 (>= threshold) 判断重复题目，保留先出现的一道"""
+
+    def __init__(self, threshold: float = None):
+        self.threshold = settings.LLM_GENERATION_DEDUP_THRESHOLD if threshold is None else threshold
+        self._seen: List[set] = []
+
+    def add(self, question: Dict) -> bool:
+        """题目与已保留的题目都不重复时记录并返回 True"""
+        grams = _content_grams(question)
+        if any(len(grams & other) / len(grams | other) >= self.threshold for other in self._seen):
+            return False
+        self._seen.append(grams)
+        return True
+
+def dedupe_questions(questions: List[Dict], threshold: float = None) -> List[Dict]:
+    deduper = QuestionDeduper(threshold)
+    return [question for question in questions if deduper.add(question)]
+
+def _chunk_sizes(count: int, chunk_size: int = None) -> List[int]:
+    chunk_size = max(1, chunk_size or settings.LLM_GENERATION_CHUNK_SIZE)
+    return [min(chunk_size, count - start) for start in range(0, count, chunk_size)]
+
+async def generate_questions_chunked(
+    topic: str,
+    question_type: str,
+    difficulty: str,
+    count: int,
+    api_config: Dict[str, Any],
+    chunk_size: int = None
+) -> Tuple[List[Dict], List[str]]:
+    """
+    题量较大时拆成多个小请求并行生成（避免单次输出超出 max_tokens 被截断），合并后去重
+    部分请求失败时仍返回其余请求生成的题目
+    Returns: (questions, errors) —— errors 为各失败分块的错误信息
+    """
+    sizes = _chunk_sizes(count, chunk_size)
+    if len(sizes) <= 1:
+        success, questions, error = await batch_generate_questions_async(
+            topic, question_type, difficulty, count, api_config
+        )
+        return (questions[:count], []) if success else ([], [error])
+
+    results = await asyncio.gather(*[
+        batch_generate_questions_async(
+            topic, question_type, difficulty, size, api_config, part=(i + 1, len(sizes))
+        )
+        for i, size in enumerate(sizes)
+    ])
+    questions: List[Dict] = []
+    errors: List[str] = []
+    for i, (success, chunk, error) in enumerate(results):
+        if success:
+            questions.extend(q for q in chunk if isinstance(q, dict) and q.get("content"))
+        else:
+            errors.append(f"chunk {i + 1}/{len(sizes)}: {error}")
+    return dedupe_questions(questions)[:count], errors
+
+async def _stream_chunk(
+    prompt: str, api_config: Dict[str, Any], queue: "asyncio.Queue[Tuple[str, Any]]"
+) -> None:
+    """流式生成一个分块，每解析出一道题就放入队列；格式错误被跳过的题目汇总为一条错误；结束时放入 ("end", None)"""
+    parser = JSONArrayStreamParser()
+    try:
+        async for delta in get_async_llm_client().stream_chat(prompt, api_config, GENERATION_SYSTEM_PROMPT):
+            for question in parser.feed(delta):
+                await queue.put(("question", question))
+            if parser.finished:
+                break
+        if not parser.finished:
+            await queue.put(("error", "LLM output ended before the JSON list was closed"))
+    except LLMStreamError as e:
+        await queue.put(("error", str(e)))
+    except Exception as e:
+        await queue.put(("error", f"Error processing questions: {str(e)}"))
+    finally:
+        if parser.errors:
+            await queue.put(("error", f"Skipped {parser.errors} malformed question(s) in LLM output"))
+        await queue.put(("end", None))
+
+async def stream_generated_questions(
+    topic: str,
+    question_type: str,
+    difficulty: str,
+    count: int,
+    api_config: Dict[str, Any],
+    chunk_size: int = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    流式生成题目：各分块并行请求 SSE 流，增量解析 JSON 数组，每道题闭合后立即产出
+    产出 ("question", dict) 或 ("error", 错误信息)；重复题目被丢弃，最多产出 count 道
+    """
+    sizes = _chunk_sizes(count, chunk_size)
+    queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+    tasks = [
+        asyncio.create_task(_stream_chunk(
+            build_generation_prompt(
+                topic, question_type, difficulty, size, (i + 1, len(sizes)) if len(sizes) > 1 else None
+            ),
+            api_config,
+            queue
+        ))
+        for i, size in enumerate(sizes)
+    ]
+    deduper = QuestionDeduper()
+    produced, running = 0, len(tasks)
+    try:
+        while running and produced < count:
+            kind, value = await queue.get()
+            if kind == "end":
+                running -= 1
+            elif kind == "error":
+                yield kind, value
+            elif isinstance(value, dict) and value.get("content") and deduper.add(value):
+                produced += 1
+                yield kind, value
+    finally:
+        # 客户端断开或题目已够数时取消其余请求
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
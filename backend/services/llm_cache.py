@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.core.config import settings
+from backend.services.cache import cache_service
+from backend.services.lru import LRUCache
+
+REDIS_KEY_PREFIX = "llm_grade:"
+# 批量查询时每条 MGET 命令携带的 key 数上限
+REDIS_MGET_BATCH = 500
+# 答案末尾的标点不影响评分
+_TRAILING_PUNCTUATION = "。．.，,；;！!？?、 "
+_WHITESPACE = re.compile(r"\s+")
+
+_result_cache = LRUCache(maxsize=settings.LLM_CACHE_SIZE)
+
+
+class GradingCacheStats:
+    """进程级的批改缓存命中统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def record(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.redis_hits + self.coalesced
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0
+        }
+
+
+grading_cache_stats = GradingCacheStats()
+
+
+def normalize_answer(text: str) -> str:
+    """全半角统一、合并空白、忽略大小写与末尾标点"""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _WHITESPACE.sub(" ", text).strip().lower()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def grading_cache_key(
+    question_text: str,
+    reference_answer: str,
+    student_answer: str,
+    max_score: float,
+    grading_criteria: Optional[str],
+    api_config: Dict[str, Any],
+    examples: List[Dict] = None
+) -> str:
+    payload = [
+        normalize_answer(student_answer),
+        question_text or "",
+        reference_answer or "",
+        float(max_score),
+        grading_criteria or "",
+        examples or [],
+        api_config.get("model", ""),
+        api_config.get("temperature")
+    ]
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _decode(raw: Optional[str]) -> Optional[Dict]:
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _redis_get(key: str) -> Optional[Dict]:
+    return _decode(cache_service.get(REDIS_KEY_PREFIX + key))
+
+
+def _redis_get_many(keys: List[str]) -> Dict[str, Dict]:
+    """按 REDIS_MGET_BATCH 分批 MGET，每批一次往返；返回命中的 key -> 结果"""
+    found = {}
+    for start in range(0, len(keys), REDIS_MGET_BATCH):
+        batch = keys[start:start + REDIS_MGET_BATCH]
+        values = cache_service.mget([REDIS_KEY_PREFIX + key for key in batch])
+        for key, raw in zip(batch, values):
+            data = _decode(raw)
+            if data is not None:
+                found[key] = data
+    return found
+
+
+def _redis_set(key: str, data: Dict) -> None:
+    cache_service.set(REDIS_KEY_PREFIX + key, json.dumps(data, ensure_ascii=False), ex=settings.LLM_CACHE_TTL)
+
+
+def _to_result(data: Dict) -> Tuple[bool, float, str]:
+    return True, data["score"], data["comment"]
+
+
+def get_cached_grading(key: str) -> Optional[Tuple[bool, float, str]]:
+    """依次查进程内 LRU 与 Redis（LLM_CACHE_REDIS 开启时）"""
+    data = _result_cache.get(key)
+    if data is not None:
+        grading_cache_stats.record("memory_hits")
+        return _to_result(data)
+    if settings.LLM_CACHE_REDIS:
+        data = _redis_get(key)
+        if data is not None:
+            _result_cache.set(key, data)
+            grading_cache_stats.record("redis_hits")
+            return _to_result(data)
+    return None
+
+
+def store_grading(key: str, result: Tuple[bool, float, str]) -> None:
+    """只缓存批改成功的结果"""
+    success, score, comment = result
+    if not success:
+        return
+    data = {"score": score, "comment": comment}
+    _result_cache.set(key, data)
+    if settings.LLM_CACHE_REDIS:
+        _redis_set(key, data)
+
+
+def cached_grading(key: str, grade: Callable[[], Tuple[bool, float, str]]) -> Tuple[bool, float, str]:
+    cached = get_cached_grading(key)
+    if cached is not None:
+        return cached
+    grading_cache_stats.record("misses")
+    result = grade()
+    store_grading(key, result)
+    return result
+
+
+async def lookup_gradings(keys: List[str]) -> Dict[str, Tuple[bool, float, str]]:
+    """批量查询缓存（未命中进程内 LRU 的 key 用 MGET 批量查询 Redis，在线程池中执行），返回命中的 key -> 结果"""
+    found: Dict[str, Tuple[bool, float, str]] = {}
+    missing = []
+    for key in keys:
+        data = _result_cache.get(key)
+        if data is not None:
+            grading_cache_stats.record("memory_hits")
+            found[key] = _to_result(data)
+        else:
+            missing.append(key)
+    if missing and settings.LLM_CACHE_REDIS:
+        loop = asyncio.get_running_loop()
+        redis_found = await loop.run_in_executor(None, _redis_get_many, missing)
+        for key, data in redis_found.items():
+            _result_cache.set(key, data)
+            grading_cache_stats.record("redis_hits")
+            found[key] = _to_result(data)
+    return found
+
+
+# 同一事件循环内正在批改的相同答案只发起一次请求，其余等待同一结果
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = weakref.WeakKeyDictionary()
+
+
+async def cached_grading_async(
+    key: str, grade: Callable[[], Awaitable[Tuple[bool, float, str]]]
+) -> Tuple[bool, float, str]:
+    loop = asyncio.get_running_loop()
+    inflight = _inflight.setdefault(loop, {})
+    pending = inflight.get(key)
+    if pending is not None:
+        grading_cache_stats.record("coalesced")
+        return await asyncio.shield(pending)
+
+    cached = _result_cache.get(key)
+    if cached is not None:
+        grading_cache_stats.record("memory_hits")
+        return _to_result(cached)
+
+    future = loop.create_future()
+    inflight[key] = future
+    try:
+        result = None
+        if settings.LLM_CACHE_REDIS:
+            data = await loop.run_in_executor(None, _redis_get, key)
+            if data is not None:
+                _result_cache.set(key, data)
+                grading_cache_stats.record("redis_hits")
+                result = _to_result(data)
+        if result is None:
+            grading_cache_stats.record("misses")
+            result = await grade()
+            await loop.run_in_executor(None, store_grading, key, result)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # 避免无人等待时出现 "exception was never retrieved" 警告
+        future.exception()
+        raise
+    finally:
+        inflight.pop(key, None)
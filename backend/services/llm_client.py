@@ -0,0 +1,270 @@
+import asyncio
+import threading
+import time
+import json
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.core.config import settings
+from backend.services.rate_limit import (
+    RETRYABLE_STATUS, backoff_delay, estimate_tokens, get_provider_limiter, retry_after_seconds
+)
+
+DEFAULT_SYSTEM_PROMPT = "你是一位专业的教师，负责批改学生的主观题答案。请根据题目、参考答案和评分标准，给出客观公正的评分。"
+
+
+def build_chat_request(
+    prompt: str, api_config: Dict[str, Any], system_prompt: str = None
+) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """构造 chat/completions 请求: (url, headers, body)"""
+    url = f"{api_config['base_url'].rstrip('/')}/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {api_config['api_key']}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": api_config.get('model', 'gpt-4o-mini'),
+        "messages": [
+            {"role": "system", "content": system_prompt if system_prompt else DEFAULT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": api_config.get('temperature', 0.3),
+        "max_tokens": api_config.get('max_tokens', 1000)
+    }
+    return url, headers, data
+
+
+def extract_content(result: Dict[str, Any]) -> str:
+    return result['choices'][0]['message']['content']
+
+
+def estimate_request_tokens(data: Dict[str, Any]) -> int:
+    """请求占用的 token 预估：输入消息 + 最大输出长度（服务商通常按此计入 TPM）"""
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in data["messages"])
+    return prompt_tokens + data.get("max_tokens", 0)
+
+
+def _usage_tokens(result: Dict[str, Any]) -> Optional[int]:
+    usage = result.get("usage") or {}
+    return usage.get("total_tokens")
+
+
+def chat_sync(prompt: str, api_config: Dict[str, Any], system_prompt: str = None) -> Tuple[bool, Any]:
+    """
+    同步调用LLM API：复用连接池，经服务商限流器排队，限流/临时错误时退避重试
+    返回: (success, response_text/error_msg)
+    """
+    url, headers, data = build_chat_request(prompt, api_config, system_prompt)
+    limiter = get_provider_limiter(api_config)
+    tokens = estimate_request_tokens(data)
+    session = get_sync_session()
+
+    for attempt in range(settings.LLM_MAX_RETRIES + 1):
+        limiter.acquire(tokens)
+        status, retry_after = None, None
+        try:
+            response = session.post(url, headers=headers, json=data, timeout=settings.LLM_TIMEOUT)
+            status = response.status_code
+            retry_after = retry_after_seconds(response.headers)
+            if status not in RETRYABLE_STATUS:
+                response.raise_for_status()
+                result = response.json()
+                limiter.record_usage(tokens, _usage_tokens(result))
+                return True, extract_content(result)
+            error = f"HTTP {status}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = str(e)
+        except Exception as e:
+            return False, f"API调用失败: {str(e)}"
+        finally:
+            limiter.release()
+            limiter.record(status)
+
+        if attempt < settings.LLM_MAX_RETRIES:
+            limiter.retries += 1
+            time.sleep(backoff_delay(attempt, retry_after))
+
+    return False, f"API调用失败: {error} (已重试 {settings.LLM_MAX_RETRIES} 次)"
+
+
+class LLMStreamError(Exception):
+    pass
+
+
+def parse_stream_line(line: str) -> Optional[str]:
+    """解析一行 SSE (data: {...})，返回其中的增量文本"""
+    if not line.startswith("data:"):
+        return None
+    payload = line[5:].strip()
+    if not payload or payload == "[DONE]":
+        return None
+    try:
+        choices = json.loads(payload).get("choices") or []
+    except ValueError:
+        return None
+    if not choices:
+        return None
+    return (choices[0].get("delta") or {}).get("content")
+
+
+# ---- 同步连接池 (供 Celery worker / 线程池中的同步调用复用 TCP/TLS 连接) ----
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_sync_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.LLM_MAX_CONNECTIONS,
+                    pool_maxsize=settings.LLM_MAX_CONNECTIONS
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+# ---- 异步客户端 ----
+
+class AsyncLLMClient:
+    """
+    基于 httpx.AsyncClient 的 LLM 客户端
+    持久连接池 + keep-alive，并用信号量限制同时在途的请求数
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = None,
+        max_connections: int = None,
+        timeout: float = None,
+        transport: httpx.AsyncBaseTransport = None
+    ):
+        max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        max_connections = max_connections or settings.LLM_MAX_CONNECTIONS
+        self._client = httpx.AsyncClient(
+            timeout=timeout or settings.LLM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            transport=transport
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def chat(self, prompt: str, api_config: Dict[str, Any], system_prompt: str = None) -> Tuple[bool, Any]:
+        """
+        调用LLM API：经服务商限流器排队，限流/临时错误时退避重试
+        返回: (success, response_text/error_msg)
+        """
+        try:
+            url, headers, data = build_chat_request(prompt, api_config, system_prompt)
+        except Exception as e:
+            return False, f"API调用失败: {str(e)}"
+        limiter = get_provider_limiter(api_config)
+        tokens = estimate_request_tokens(data)
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await limiter.acquire_async(tokens)
+            status, retry_after = None, None
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(url, headers=headers, json=data)
+                status = response.status_code
+                retry_after = retry_after_seconds(response.headers)
+                if status not in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    result = response.json()
+                    limiter.record_usage(tokens, _usage_tokens(result))
+                    return True, extract_content(result)
+                error = f"HTTP {status}"
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+            except Exception as e:
+                return False, f"API调用失败: {str(e)}"
+            finally:
+                limiter.release()
+                limiter.record(status)
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                limiter.retries += 1
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+        return False, f"API调用失败: {error} (已重试 {settings.LLM_MAX_RETRIES} 次)"
+
+    async def stream_chat(
+        self, prompt: str, api_config: Dict[str, Any], system_prompt: str = None
+    ) -> AsyncIterator[str]:
+        """
+        以 SSE 流式调用LLM API，逐段产出模型输出的文本
+        开始输出前遇到限流/临时错误时退避重试；失败时抛出 LLMStreamError
+        """
+        url, headers, data = build_chat_request(prompt, api_config, system_prompt)
+        data["stream"] = True
+        limiter = get_provider_limiter(api_config)
+        tokens = estimate_request_tokens(data)
+        streamed = False
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await limiter.acquire_async(tokens)
+            status, retry_after = None, None
+            try:
+                async with self._semaphore:
+                    async with self._client.stream("POST", url, headers=headers, json=data) as response:
+                        status = response.status_code
+                        retry_after = retry_after_seconds(response.headers)
+                        if status not in RETRYABLE_STATUS:
+                            if status >= 400:
+                                raise LLMStreamError(f"API调用失败: HTTP {status}")
+                            async for line in response.aiter_lines():
+                                delta = parse_stream_line(line)
+                                if delta:
+                                    streamed = True
+                                    yield delta
+                            return
+                error = f"HTTP {status}"
+            except httpx.TransportError as e:
+                error = str(e) or type(e).__name__
+                # 已输出部分内容后连接中断，无法无缝重试
+                if streamed:
+                    raise LLMStreamError(f"API调用失败: {error}") from e
+            finally:
+                limiter.release()
+                limiter.record(status)
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                limiter.retries += 1
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+        raise LLMStreamError(f"API调用失败: {error} (已重试 {settings.LLM_MAX_RETRIES} 次)")
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# httpx 客户端与信号量都绑定在创建时的事件循环上，因此按事件循环分别缓存
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncLLMClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_llm_client() -> AsyncLLMClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncLLMClient()
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_llm_client() -> None:
+    """关闭当前事件循环上的客户端（应用关闭时调用）"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,37 +1,112 @@
 from sqlalchemy.orm import Session
+from backend.core.config import settings
 from backend.models.student import Student
-from typing import Optional, Tuple
+from backend.services.fuzzy import FuzzyRosterIndex, get_fuzzy_index
+from typing import Any, Dict, List, Optional, Tuple
 
 class MatchService:
     def __init__(self, db: Session, school_id: int):
         self.db = db
         self.school_id = school_id
+        self._by_number: Optional[Dict[str, Student]] = None
+        self._by_name: Optional[Dict[str, List[Student]]] = None
+        self._by_id: Optional[Dict[int, Student]] = None
+        self._fuzzy: Optional[FuzzyRosterIndex] = None
 
     def match_student(self, ocr_number: Optional[str], ocr_name: Optional[str]) -> Optional[Student]:
         """
         Match a student based on OCR results.
         Prioritizes Student Number. If not exact, tries Name.
+        与 match_students 使用同一份花名册索引与规则：重名且模糊匹配无法区分时返回 None
         """
-        student = None
-
-        # 1. Exact Number Match
-        if ocr_number:
-            student = self.db.query(Student).filter(
-                Student.school_id == self.school_id,
-                Student.student_number == ocr_number
-            ).first()
-            if student:
-                return student
-
-        # 2. Exact Name Match (if number match failed or number empty)
-        if ocr_name:
-            student = self.db.query(Student).filter(
-                Student.school_id == self.school_id,
-                Student.name == ocr_name
-            ).first()
-            if student:
-                return student
-
-        # 3. Future: Fuzzy match logic here
-
-        return None
+        matches, _ = self.match_students([(ocr_number, ocr_name)])
+        return matches[0]
+
+    def fuzzy_match(
+        self, ocr_number: Optional[str], ocr_name: Optional[str], threshold: float = None
+    ) -> Optional[Tuple[Student, float]]:
+        """模糊匹配，返回 (学生, 置信度)；置信度低于阈值或无法区分时返回 None"""
+        if self._fuzzy is None:
+            if self._by_id is None:
+                self.load_roster()
+            self._fuzzy = get_fuzzy_index(
+                self.school_id,
+                [(s.id, s.student_number, s.name) for s in self._by_id.values()]
+            )
+        match = self._fuzzy.best_match(ocr_number, ocr_name, threshold)
+        if match is None:
+            return None
+        return self._by_id[match.student_id], match.confidence
+
+    def load_roster(self) -> None:
+        """
+        一次性加载本校花名册并建立内存索引 (学号 -> 学生, 姓名 -> 学生列表)
+        按 id 排序：学号重复时取 id 最小的学生，重名学生按 id 顺序列出
+        """
+        roster = self.db.query(Student).filter(
+            Student.school_id == self.school_id
+        ).order_by(Student.id).all()
+
+        by_number: Dict[str, Student] = {}
+        by_name: Dict[str, List[Student]] = {}
+        self._by_id = {student.id: student for student in roster}
+        for student in roster:
+            by_number.setdefault(student.student_number, student)
+            by_name.setdefault(student.name, []).append(student)
+        self._by_number = by_number
+        self._by_name = by_name
+
+    def match_students(
+        self, records: List[Tuple[Optional[str], Optional[str]]]
+    ) -> Tuple[List[Optional[Student]], Dict[str, Any]]:
+        """
+        批量匹配整批学生，仅查询一次数据库
+        records: [(OCR 学号, OCR 姓名), ...]
+        返回: (与 records 等长的匹配结果列表, 匹配报告)
+        精确匹配失败（含重名）的记录再做模糊匹配，命中的记入报告的 fuzzy；
+        仍无法确定时，重名记入 ambiguous，其余记入 unmatched
+        """
+        if self._by_number is None:
+            self.load_roster()
+
+        matches: List[Optional[Student]] = []
+        unmatched: List[Dict[str, Any]] = []
+        ambiguous: List[Dict[str, Any]] = []
+        fuzzy: List[Dict[str, Any]] = []
+
+        for index, (ocr_number, ocr_name) in enumerate(records):
+            student = self._by_number.get(ocr_number) if ocr_number else None
+            candidates = self._by_name.get(ocr_name, []) if student is None and ocr_name else []
+            if len(candidates) == 1:
+                student = candidates[0]
+            elif student is None and (ocr_number or ocr_name):
+                fuzzy_result = self.fuzzy_match(ocr_number, ocr_name)
+                if fuzzy_result:
+                    student, confidence = fuzzy_result
+                    fuzzy.append({
+                        "index": index,
+                        "学号": ocr_number,
+                        "姓名": ocr_name,
+                        "matched_number": student.student_number,
+                        "matched_name": student.name,
+                        "confidence": confidence
+                    })
+
+            if student is None:
+                entry = {"index": index, "学号": ocr_number, "姓名": ocr_name}
+                if len(candidates) > 1:
+                    entry["candidates"] = [c.student_number for c in candidates]
+                    ambiguous.append(entry)
+                else:
+                    unmatched.append(entry)
+            matches.append(student)
+
+        report = {
+            "total": len(records),
+            "matched": len(records) - len(unmatched) - len(ambiguous),
+            "unmatched": unmatched,
+            "ambiguous": ambiguous,
+            "fuzzy": fuzzy,
+            "threshold": settings.FUZZY_MATCH_THRESHOLD
+        }
+        return matches, report
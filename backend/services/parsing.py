@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.core.config import settings
+from backend.services.cache import cache_service
+from backend.services.core import parse_sheet_bytes, parse_plan_key
+from backend.services.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return settings.PARSE_WORKERS or os.cpu_count() or 1
+
+
+def _create_executor() -> Executor:
+    workers = _worker_count()
+    if settings.PARSE_EXECUTOR == "process":
+        try:
+            return ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError, ImportError) as e:
+            # 部分平台 / 沙箱不支持多进程，退回线程池
+            logger.warning("Process pool unavailable, falling back to threads: %s", e)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+
+
+def get_parse_executor() -> Executor:
+    """进程内共享的解析执行器（懒加载，大小受 PARSE_WORKERS 限制）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = _create_executor()
+    return _executor
+
+
+def _fallback_to_threads(broken: Executor) -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            logger.warning("Parse process pool broke, switching to thread pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            _executor = ThreadPoolExecutor(max_workers=_worker_count(), thread_name_prefix="parse")
+        return _executor
+
+
+def shutdown_parse_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def parse_sheet_async(content_bytes: bytes, exam_config: List[Dict], parser_config: Dict = None) -> Tuple[bool, Any]:
+    """
+    在执行器中解码并解析一份答题卡，不阻塞事件循环
+    返回值与 parse_text_content 相同；解析过程中的异常转换为 (False, 错误信息)
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_parse_executor()
+    try:
+        try:
+            return await loop.run_in_executor(executor, parse_sheet_bytes, content_bytes, exam_config, parser_config)
+        except BrokenProcessPool:
+            executor = _fallback_to_threads(executor)
+            return await loop.run_in_executor(executor, parse_sheet_bytes, content_bytes, exam_config, parser_config)
+    except Exception as e:
+        return False, str(e)
+
+
+
+# ---- Content-hash parse cache ----
+# 相同的答卷字节 + 相同的解析计划 => 相同的解析结果，重复上传时跳过解码与正则匹配
+
+_result_cache = LRUCache(maxsize=settings.PARSE_CACHE_SIZE)
+REDIS_KEY_PREFIX = "parse:"
+
+
+class ParseCacheStats:
+    """单次上传请求内的缓存命中统计"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def sheet_cache_key(content_bytes: bytes, plan_key: str) -> str:
+    return f"{hashlib.sha256(content_bytes).hexdigest()}:{plan_key}"
+
+
+def _redis_get(key: str) -> Optional[Dict]:
+    raw = cache_service.get(REDIS_KEY_PREFIX + key)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _redis_set(key: str, data: Dict) -> None:
+    cache_service.set(REDIS_KEY_PREFIX + key, json.dumps(data, ensure_ascii=False), ex=settings.PARSE_CACHE_TTL)
+
+
+async def parse_sheet_cached(
+    content_bytes: bytes,
+    exam_config: List[Dict],
+    parser_config: Dict = None,
+    plan_key: str = None,
+    stats: ParseCacheStats = None
+) -> Tuple[bool, Any]:
+    """
+    带内容哈希缓存的 parse_sheet_async
+    先查进程内 LRU，再查 Redis（PARSE_CACHE_REDIS 开启时）；只缓存解析成功的结果。
+    plan_key 可由调用方按批次预先计算，避免逐份重复计算。
+    """
+    plan_key = plan_key or parse_plan_key(exam_config, parser_config)
+    key = sheet_cache_key(content_bytes, plan_key)
+
+    data = _result_cache.get(key)
+    if data is None and settings.PARSE_CACHE_REDIS:
+        data = await asyncio.get_running_loop().run_in_executor(None, _redis_get, key)
+        if data is not None:
+            _result_cache.set(key, data)
+
+    if data is not None:
+        if stats is not None:
+            stats.hits += 1
+        # 返回副本，调用方（如匹配学生信息时）可能会修改结果
+        return True, dict(data)
+
+    if stats is not None:
+        stats.misses += 1
+    status, result = await parse_sheet_async(content_bytes, exam_config, parser_config)
+    if status:
+        _result_cache.set(key, dict(result))
+        if settings.PARSE_CACHE_REDIS:
+            await asyncio.get_running_loop().run_in_executor(None, _redis_set, key, result)
+    return status, result
@@ -0,0 +1,267 @@
+import asyncio
+import io
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.config import settings
+from backend.db.session import SessionLocal
+from backend.models.user import User
+from backend.services.core import parse_plan_key
+from backend.services.grading import grade_students, match_payload_students
+from backend.services.exam_answers import answers_by_student
+from backend.services.history import save_exam_records
+from backend.services.matching import MatchService
+from backend.services.parsing import ParseCacheStats, parse_sheet_cached
+from backend.services.storage import BaseStorage
+
+# 同时解析的答卷数上限
+PARSE_WINDOW = 16
+STAGES = ("parse", "match", "grade", "save")
+# 阶段之间传递的结束标记
+_DONE = object()
+
+
+class StageStats:
+    """单个阶段的计时：处理条数、批次数、累计处理耗时，以及首/末批相对流水线开始的时间点"""
+
+    def __init__(self):
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @contextmanager
+    def track(self, items: int):
+        start = time.perf_counter()
+        if self.started is None:
+            self.started = start
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.busy += end - start
+            self.finished = end
+            self.items += items
+            self.batches += 1
+
+    def as_dict(self, origin: float) -> Dict[str, Any]:
+        def offset(value: Optional[float]) -> Optional[float]:
+            return round(value - origin, 4) if value is not None else None
+
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy, 4),
+            "started_at": offset(self.started),
+            "finished_at": offset(self.finished)
+        }
+
+
+class GradingPipeline:
+    """
+    服务端一次完成 解析 → 匹配 → 计分 → 保存 的流水线
+    各阶段之间用有界队列连接，按小批次向下游传递：前面的答卷已经入库时，后面的答卷可能仍在解析。
+    匹配与保存各用一个独立的数据库会话（在线程池中执行，不与请求的会话共享）。
+    """
+
+    def __init__(
+        self,
+        user: User,
+        exam_name: str,
+        standard_key: Dict[str, Any],
+        config_dicts: List[Dict],
+        parser_config: Dict[str, Any],
+        storage: BaseStorage,
+        batch_size: int = None,
+        session_factory=SessionLocal
+    ):
+        self.user = user
+        self.exam_name = exam_name
+        self.standard_key = standard_key
+        self.config_dicts = config_dicts
+        self.parser_config = parser_config
+        self.storage = storage
+        self.batch_size = max(1, batch_size or settings.PIPELINE_BATCH_SIZE)
+        self.session_factory = session_factory
+        # 整个任务共用同一个解析计划键
+        self.plan_key = parse_plan_key(config_dicts, parser_config)
+        self.cache_stats = ParseCacheStats()
+        self.stats = {name: StageStats() for name in STAGES}
+        self.errors: List[Dict[str, Any]] = []
+        self.unmatched: List[Dict[str, Any]] = []
+        self.exam_id: Optional[int] = None
+        self.saved = 0
+        self._events: asyncio.Queue = asyncio.Queue()
+
+    # ---- 各阶段的处理函数 ----
+
+    async def _parse(self, filename: str, content_bytes: bytes) -> Optional[Dict[str, Any]]:
+        """保存并解析一份答卷，失败时记录错误并返回 None"""
+        # 并发解析时各份答卷的耗时累加，busy 可能大于实际经过的时间
+        with self.stats["parse"].track(1):
+            try:
+                await run_in_threadpool(self.storage.save_file, io.BytesIO(content_bytes), f"student_{filename}")
+                status, data = await parse_sheet_cached(
+                    content_bytes, self.config_dicts, self.parser_config,
+                    plan_key=self.plan_key, stats=self.cache_stats
+                )
+            except Exception as e:
+                status, data = False, str(e)
+        if not status:
+            self.errors.append({"stage": "parse", "filename": filename, "error": data})
+            return None
+        return data
+
+    def _match_sync(self, db, matcher: Optional[MatchService], students: List[Dict]) -> None:
+        report = match_payload_students(db, self.user.school_id, students, matcher)
+        if report is None:
+            return
+        for entry in report["unmatched"] + report["ambiguous"]:
+            self.unmatched.append({k: v for k, v in entry.items() if k != "index"})
+
+    async def _grade(self, students: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        # 成绩记录连同答卷一起传给保存阶段，答卷中的原始答案写入 exam_answers
+        records = await grade_students(students, self.standard_key, self.config_dicts)
+        return list(zip(records, students))
+
+    def _save_sync(self, db, graded: List[Tuple[Dict, Dict]]) -> None:
+        records = [record for record, _ in graded]
+        answers = answers_by_student(student for _, student in graded)
+        exam, count = save_exam_records(db, self.exam_name, records, self.user, answers=answers)
+        self.exam_id = exam.id
+        self.saved += count
+
+    # ---- 阶段编排 ----
+
+    async def _parse_stage(self, sheets: AsyncIterable[Tuple[str, bytes]], output: asyncio.Queue) -> None:
+        """并发解析（同时最多 PARSE_WINDOW 份），按完成顺序逐份送入下游；sheets 按需（异步）读取"""
+        pending = set()
+        sheet_iter = sheets.__aiter__()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < PARSE_WINDOW:
+                    try:
+                        filename, content_bytes = await sheet_iter.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._parse(filename, content_bytes)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    data = task.result()
+                    if data is not None:
+                        await output.put(data)
+        finally:
+            for task in pending:
+                task.cancel()
+        await output.put(_DONE)
+
+    async def _next_batch(self, source: asyncio.Queue) -> Optional[List[Any]]:
+        """
+        等待至少一条数据，再取走队列中已就绪的数据（最多 batch_size 条）
+        不为凑满批次而等待上游，避免下游空转；上游结束后返回 None
+        """
+        first = await source.get()
+        if first is _DONE:
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = source.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _DONE:
+                # 放回结束标记，下一次调用时结束
+                source.put_nowait(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    async def _batch_stage(
+        self,
+        name: str,
+        source: asyncio.Queue,
+        output: Optional[asyncio.Queue],
+        step: Callable[[List[Any]], Awaitable[Optional[List[Any]]]]
+    ) -> None:
+        """从 source 按批次取数据交给 step 处理，结果逐条送入 output（下游按自己的节奏重新组批）"""
+        stats = self.stats[name]
+        while True:
+            batch = await self._next_batch(source)
+            if batch is None:
+                break
+            with stats.track(len(batch)):
+                result = await step(batch)
+            await self._events.put({"stage": name, "items": len(batch), "total": stats.items})
+            if output is not None:
+                for item in result:
+                    await output.put(item)
+        if output is not None:
+            await output.put(_DONE)
+
+    async def run(self, sheets: AsyncIterable[Tuple[str, bytes]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        运行流水线，产出事件:
+            {"stage": "match" | "grade" | "save", "items": n, "total": n}  每个阶段处理完一批
+            {"done": true, "exam_id": ..., "saved": n, "errors": [...], "unmatched": [...],
+             "cache": {...}, "total_seconds": s, "stages": {"parse": {...}, ...}}  最后一条
+        """
+        origin = time.perf_counter()
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        matched: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        graded: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        match_db = self.session_factory()
+        save_db = self.session_factory()
+        matcher = MatchService(match_db, self.user.school_id) if self.user.school_id else None
+
+        async def match(students: List[Dict]) -> List[Dict]:
+            await run_in_threadpool(self._match_sync, match_db, matcher, students)
+            return students
+
+        async def save(graded: List[Tuple[Dict, Dict]]) -> None:
+            await run_in_threadpool(self._save_sync, save_db, graded)
+
+        tasks = [
+            asyncio.ensure_future(self._parse_stage(sheets, parsed)),
+            asyncio.ensure_future(self._batch_stage("match", parsed, matched, match)),
+            asyncio.ensure_future(self._batch_stage("grade", matched, graded, self._grade)),
+            asyncio.ensure_future(self._batch_stage("save", graded, None, save)),
+        ]
+        pipeline = asyncio.gather(*tasks)
+        try:
+            while True:
+                getter = asyncio.ensure_future(self._events.get())
+                done, _ = await asyncio.wait({getter, pipeline}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                while not self._events.empty():
+                    yield self._events.get_nowait()
+                # 任一阶段出错时在此抛出
+                pipeline.result()
+                break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            match_db.close()
+            save_db.close()
+
+        yield {
+            "done": True,
+            "exam_id": self.exam_id,
+            "saved": self.saved,
+            "errors": self.errors,
+            "unmatched": self.unmatched,
+            "cache": self.cache_stats.as_dict(),
+            "total_seconds": round(time.perf_counter() - origin, 4),
+            "stages": {name: stats.as_dict(origin) for name, stats in self.stats.items()}
+        }
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+
+import redis
+
+from backend.services.cache import cache_service
+
+PROGRESS_CHANNEL = "grading_progress:{}"
+PROGRESS_STATE = "grading_progress_state:{}"
+PROGRESS_TTL = 60 * 60 * 24
+FINAL_STATUSES = {"completed", "failed"}
+
+_COUNTERS = ("students_total", "students_done", "units_total", "units_done", "units_failed")
+
+
+def build_snapshot(task_id: str, state: Dict[str, str], now: float = None) -> Dict[str, Any]:
+    """由 Redis 中的计数生成进度快照，含完成比例与预计剩余时间 (ETA)"""
+    now = time.time() if now is None else now
+    snapshot: Dict[str, Any] = {"task_id": task_id, "status": state.get("status", "running")}
+    for field in _COUNTERS:
+        snapshot[field] = 0
+    # 计数字段为 "<field>" 或按分块记录的 "<field>:<chunk_id>"，快照中取合计
+    for key, value in state.items():
+        field = key.split(":", 1)[0]
+        if field in _COUNTERS:
+            snapshot[field] += int(value)
+
+    # 有主观题时按 LLM 批改单元计算进度（耗时主要在这里），否则按学生数
+    if snapshot["units_total"]:
+        fraction = (snapshot["units_done"] + snapshot["units_failed"]) / snapshot["units_total"]
+    elif snapshot["students_total"]:
+        fraction = snapshot["students_done"] / snapshot["students_total"]
+    else:
+        fraction = 0.0
+    fraction = min(1.0, fraction)
+
+    started = float(state.get("started_at", now))
+    elapsed = max(0.0, now - started)
+    snapshot["percent"] = round(fraction * 100, 1)
+    snapshot["elapsed"] = round(elapsed, 1)
+    snapshot["eta_seconds"] = round(elapsed * (1 - fraction) / fraction, 1) if 0 < fraction < 1 else None
+    if snapshot["status"] in FINAL_STATUSES:
+        snapshot["eta_seconds"] = 0.0
+    for key in ("exam_id", "processed", "error"):
+        if key in state:
+            snapshot[key] = state[key]
+    return snapshot
+
+
+class ProgressReporter:
+    """
+    发布批改任务的细粒度进度：计数保存在 Redis hash 中（各 worker 上的分块共享），
+    每次更新后把最新快照 PUBLISH 到 grading_progress:{task_id}
+    提供 chunk_id 时计数按分块记录在 "<field>:<chunk_id>" 中：分块重试或消息重新投递时
+    add_units / students_done 覆盖本块的计数而不是再累加一次
+    进度仅供展示，Redis 不可用时静默忽略
+    """
+
+    def __init__(self, task_id: str, client: Optional[redis.Redis] = None, chunk_id: Optional[str] = None):
+        self.task_id = task_id
+        self.client = client if client is not None else cache_service.r
+        self.chunk_id = chunk_id
+
+    def _field(self, name: str) -> str:
+        return name if self.chunk_id is None else f"{name}:{self.chunk_id}"
+
+    def _update(self, event: str, incr: Dict[str, int] = None, fields: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        if not self.client:
+            return None
+        state_key = PROGRESS_STATE.format(self.task_id)
+        try:
+            pipe = self.client.pipeline()
+            for field, amount in (incr or {}).items():
+                pipe.hincrby(state_key, field, amount)
+            if fields:
+                pipe.hset(state_key, mapping={k: str(v) for k, v in fields.items()})
+            pipe.expire(state_key, PROGRESS_TTL)
+            pipe.hgetall(state_key)
+            state = pipe.execute()[-1]
+            snapshot = dict(build_snapshot(self.task_id, state), event=event)
+            self.client.publish(PROGRESS_CHANNEL.format(self.task_id), json.dumps(snapshot, ensure_ascii=False))
+            return snapshot
+        except redis.RedisError:
+            return None
+
+    def start(self, students_total: int) -> None:
+        self._update("started", fields={
+            "status": "running", "started_at": time.time(), "students_total": students_total
+        })
+
+    def add_units(self, total: int, done: int = 0) -> None:
+        """
+        登记待批改的 (学生, 题目) 单元；done 为从检查点恢复、无需再批改的单元数
+        分块重试时重新登记：上次失败的单元会再次批改，units_failed 归零
+        """
+        if not total:
+            return
+        if self.chunk_id is None:
+            self._update("units", incr={"units_total": total, "units_done": done})
+            return
+        self._update("units", fields={
+            self._field("units_total"): total, self._field("units_done"): done, self._field("units_failed"): 0
+        })
+
+    def unit_done(self, success: bool) -> None:
+        self._update("unit", incr={self._field("units_done" if success else "units_failed"): 1})
+
+    async def unit_done_async(self, success: bool) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.unit_done, success)
+
+    def students_done(self, count: int) -> None:
+        if self.chunk_id is None:
+            self._update("students", incr={"students_done": count})
+        else:
+            self._update("students", fields={self._field("students_done"): count})
+
+    def finish(self, status: str = "completed", **extra: Any) -> None:
+        self._update(status, fields=dict(extra, status=status))
+
+
+def get_progress(task_id: str, client: Optional[redis.Redis] = None) -> Optional[Dict[str, Any]]:
+    client = client if client is not None else cache_service.r
+    if not client:
+        return None
+    try:
+        state = client.hgetall(PROGRESS_STATE.format(task_id))
+    except redis.RedisError:
+        return None
+    return build_snapshot(task_id, state) if state else None
@@ -0,0 +1,251 @@
+import asyncio
+import email.utils
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+from backend.core.config import settings
+
+# 可重试的 HTTP 状态码：限流与服务端临时错误
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约 1 字 1 token (UTF-8 3 字节)，英文约 3-4 字符 1 token"""
+    return math.ceil(len(text.encode("utf-8")) / 3)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或 HTTP 日期）"""
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """指数退避 + 全抖动；服务端给出 Retry-After 时至少等待该时长"""
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, settings.LLM_RETRY_MAX_DELAY))
+    return delay
+
+
+class TokenBucket:
+    """
+    令牌桶，按每分钟速率匀速补充
+    reserve 允许余额为负（先预约后等待），返回调用方需要等待的秒数，因此同步与异步调用方都可使用
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """按实际用量修正预估（delta > 0 表示多用，< 0 表示退还）"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 并发上限：成功时加性增长（每轮约 +1），遇到限流时乘性减半
+    同时支持线程与协程等待，进程内共享
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = None, cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.cooldown = cooldown
+        self._last_decrease = 0.0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def _available(self) -> bool:
+        return self.in_flight < max(self.minimum, int(self.limit))
+
+    def _grant(self, waiter) -> None:
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+
+        def resolve():
+            if future.cancelled():
+                # 等待方已取消，归还名额
+                self.release()
+            else:
+                future.set_result(None)
+
+        loop.call_soon_threadsafe(resolve)
+
+    def _wake(self) -> None:
+        while self._waiters and self._available():
+            self.in_flight += 1
+            self._grant(self._waiters.popleft())
+
+    def acquire(self) -> None:
+        with self._lock:
+            if not self._waiters and self._available():
+                self.in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._available():
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # 已获得名额后才被取消
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # 同一波限流只减半一次
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+
+class ProviderLimiter:
+    """单个 LLM 服务商的限流状态：请求数/分钟、token 数/分钟与自适应并发"""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_concurrency: int = None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency or settings.LLM_MAX_CONCURRENCY)
+        self.throttled = 0
+        self.retries = 0
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def acquire(self, tokens: int) -> None:
+        wait = self._wait_time(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        self.concurrency.acquire()
+
+    async def acquire_async(self, tokens: int) -> None:
+        wait = self._wait_time(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.concurrency.acquire_async()
+
+    def release(self) -> None:
+        self.concurrency.release()
+
+    def record(self, status_code: Optional[int]) -> None:
+        if status_code == 429:
+            self.throttled += 1
+            self.concurrency.on_throttle()
+        elif status_code is not None and status_code < 400:
+            self.concurrency.on_success()
+
+    def record_usage(self, estimated: int, actual: Optional[int]) -> None:
+        if actual is not None:
+            self.tokens.adjust(actual - estimated)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "throttled": self.throttled,
+            "retries": self.retries
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def provider_key(api_config: Dict[str, Any]) -> str:
+    return urlparse(api_config.get("base_url", "")).netloc or api_config.get("base_url", "")
+
+
+def get_provider_limiter(api_config: Dict[str, Any]) -> ProviderLimiter:
+    """按服务商（base_url 的主机名）共享限流器；rpm / tpm 可在 LLM 配置中单独指定"""
+    key = provider_key(api_config)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limiter = ProviderLimiter(
+                    rpm=api_config.get("rpm") or settings.LLM_RATE_LIMIT_RPM,
+                    tpm=api_config.get("tpm") or settings.LLM_RATE_LIMIT_TPM
+                )
+                _limiters[key] = limiter
+    return limiter
+
+
+def reset_provider_limiter(api_config: Dict[str, Any]) -> None:
+    """LLM 配置 (如 rpm / tpm) 变更后丢弃旧的限流器，下次调用时按新配置重建"""
+    with _limiters_lock:
+        _limiters.pop(provider_key(api_config), None)
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {key: limiter.as_dict() for key, limiter in _limiters.items()}
@@ -0,0 +1,126 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.staged_batch import StagedBatch, StagedSheet
+
+
+class StagedBatchNotFound(Exception):
+    pass
+
+
+def _now() -> datetime:
+    # expires_at 以不带时区的 UTC 时间保存
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _expiry() -> datetime:
+    return _now() + timedelta(seconds=settings.STAGED_BATCH_TTL)
+
+
+def purge_expired_batches(db: Session) -> int:
+    """删除已过期的批次及其答卷，返回删除的批次数"""
+    expired = [row[0] for row in db.query(StagedBatch.id).filter(StagedBatch.expires_at <= _now()).all()]
+    if not expired:
+        return 0
+    db.query(StagedSheet).filter(StagedSheet.batch_id.in_(expired)).delete(synchronize_session=False)
+    db.query(StagedBatch).filter(StagedBatch.id.in_(expired)).delete(synchronize_session=False)
+    db.commit()
+    return len(expired)
+
+
+def create_batch(db: Session, config: Dict[str, Any], user_id: int) -> StagedBatch:
+    # 没有定时任务，顺带清理过期批次
+    purge_expired_batches(db)
+    batch = StagedBatch(batch_id=uuid.uuid4().hex, config=config, user_id=user_id, expires_at=_expiry())
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+    return batch
+
+
+def get_batch(db: Session, batch_id: str, user_id: int) -> StagedBatch:
+    """只返回 user_id 本人未过期的批次；他人的批次同样视为不存在"""
+    batch = db.query(StagedBatch).filter(
+        StagedBatch.batch_id == batch_id,
+        StagedBatch.user_id == user_id,
+        StagedBatch.expires_at > _now()
+    ).first()
+    if not batch:
+        raise StagedBatchNotFound(f"Staged batch '{batch_id}' not found")
+    return batch
+
+
+def get_or_create_batch(db: Session, batch_id: Optional[str], config: Dict[str, Any], user_id: int) -> StagedBatch:
+    return get_batch(db, batch_id, user_id) if batch_id else create_batch(db, config, user_id)
+
+
+def stage_sheets(db: Session, batch: StagedBatch, items: List[Dict[str, Any]]) -> int:
+    """
+    暂存解析成功的答卷（与上传接口 success 条目格式相同），一次提交
+    同名文件重复上传时替换旧的解析结果
+    """
+    if not items:
+        return 0
+    filenames = [item.get("filename") for item in items]
+    db.query(StagedSheet).filter(
+        StagedSheet.batch_id == batch.id, StagedSheet.filename.in_(filenames)
+    ).delete(synchronize_session=False)
+    db.add_all([
+        StagedSheet(
+            batch_id=batch.id,
+            filename=item.get("filename"),
+            storage_path=item.get("storage_path"),
+            data=item["data"]
+        )
+        for item in items
+    ])
+    batch.expires_at = _expiry()
+    db.commit()
+    return len(items)
+
+
+def stage_standard_key(db: Session, batch: StagedBatch, standard_key: Dict[str, Any], storage_path: str = None) -> None:
+    batch.standard_key = standard_key
+    batch.standard_path = storage_path
+    batch.expires_at = _expiry()
+    db.commit()
+
+
+def batch_summary(db: Session, batch: StagedBatch) -> Dict[str, Any]:
+    sheets = db.query(StagedSheet.filename).filter(StagedSheet.batch_id == batch.id).order_by(StagedSheet.id).all()
+    return {
+        "batch_id": batch.batch_id,
+        "sheets": len(sheets),
+        "filenames": [row[0] for row in sheets],
+        "has_standard_key": batch.standard_key is not None,
+        "created_at": str(batch.created_at),
+        "expires_at": str(batch.expires_at)
+    }
+
+
+def delete_batch(db: Session, batch: StagedBatch) -> None:
+    db.query(StagedSheet).filter(StagedSheet.batch_id == batch.id).delete(synchronize_session=False)
+    db.delete(batch)
+    db.commit()
+
+
+def resolve_payload(db: Session, payload: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    """
+    评分 payload 中带 batch_id 时，从 user_id 本人的暂存批次补全 students / standard_key / config
+    payload 中显式提供的字段优先（如只替换标准答案重新评分）
+    """
+    batch_id = payload.get("batch_id")
+    if not batch_id:
+        return payload
+    batch = get_batch(db, batch_id, user_id)
+    resolved = dict(payload)
+    if not resolved.get("students"):
+        rows = db.query(StagedSheet.data).filter(StagedSheet.batch_id == batch.id).order_by(StagedSheet.id).all()
+        resolved["students"] = [row[0] for row in rows]
+    if not resolved.get("standard_key"):
+        resolved["standard_key"] = batch.standard_key or {}
+    if not resolved.get("config"):
+        resolved["config"] = batch.config or {}
+    return resolved
@@ -1,38 +1,239 @@
+from celery import chord, group
+from celery.exceptions import Ignore
 from backend.core.celery_app import celery_app
-from backend.routers.grade import batch_grade
+from backend.core.config import settings
 from backend.db.session import SessionLocal
 from backend.models.user import User
+from backend.services.few_shot import get_exam_examples
+from backend.services.grading import chunk_students, grade_students, match_payload_students
+from backend.services.history import save_exam_records
+from backend.services.exam_answers import answers_by_student
+from backend.services.checkpoint import CheckpointStore, grading_job_key
+from backend.services.progress import ProgressReporter
+from backend.services.grading_jobs import (
+    StagedObjectNotFound, delete_staged, load_staged, redact_llm_config, resolve_llm_config, stage_data, update_grading_job
+)
+from backend.services.staging import StagedBatchNotFound, resolve_payload
+from typing import Any, Dict, List
 import asyncio
 
-# Note: Celery tasks are synchronous by default.
-# Since our batch_grade logic is async (FastAPI), we might need to wrap it or refactor.
-# For simplicity, we assume we can call the core logic synchronously here or run async loop.
+# Celery tasks are synchronous; the grading service is async (LLM calls),
+# so each worker process reuses one event loop for it.
 
 def run_async(coro):
-    loop = asyncio.get_event_loop()
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = None
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
     return loop.run_until_complete(coro)
 
+def _grade_chunk(students: List[Dict], context: Dict[str, Any]) -> List[Dict]:
+    job_key = context.get("job_key")
+    progress_id = context.get("progress_id")
+    return run_async(grade_students(
+        students,
+        context["standard_key"],
+        context["sections"],
+        context.get("llm_results"),
+        resolve_llm_config(context.get("llm_config")),
+        context.get("examples"),
+        checkpoints=CheckpointStore(job_key) if job_key else None,
+        progress=ProgressReporter(progress_id, chunk_id=context.get("chunk_id")) if progress_id else None
+    ))
+
+def _finish_grading(
+    records: List[Dict], context: Dict[str, Any], user_id: int, answers: Dict[str, Dict] = None
+) -> Dict[str, Any]:
+    """
+    保存成绩：提供 exam_name 时写入 ExamRecord（answers 为学生答卷，写入逐题表），否则写入 grading_jobs.result_json
+    随后删除检查点、更新任务状态并发布完成事件；返回给结果后端的只有摘要
+    """
+    exam_name, job_id = context.get("exam_name"), context.get("job_id")
+    progress = ProgressReporter(context["progress_id"]) if context.get("progress_id") else None
+    summary: Dict[str, Any] = {"status": "completed", "processed": len(records), "job_id": job_id}
+
+    if exam_name:
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == user_id).first()
+            if not user:
+                update_grading_job(job_id, status="failed", error="User not found")
+                if progress:
+                    progress.finish("failed", error="User not found")
+                return {"error": "User not found"}
+            exam, count = save_exam_records(db, exam_name, records, user, answers=answers)
+            summary.update({"exam_id": exam.id, "saved": count})
+        finally:
+            db.close()
+
+    update_grading_job(
+        job_id,
+        status="completed",
+        processed=len(records),
+        exam_id=summary.get("exam_id"),
+        result_json=None if exam_name else records,
+        payload_ref=None
+    )
+    if context.get("job_key"):
+        CheckpointStore(context["job_key"]).clear()
+    if progress:
+        extra = {"exam_id": summary["exam_id"]} if "exam_id" in summary else {}
+        progress.finish("completed", processed=len(records), **extra)
+    return summary
+
+# acks_late + reject_on_worker_lost: worker 崩溃时消息重新投递，
+# 已写入检查点的 (学生, 题目) 不会重复调用 LLM
+@celery_app.task(
+    acks_late=True, reject_on_worker_lost=True,
+    autoretry_for=(Exception,), retry_backoff=True, max_retries=3
+)
+def grade_chunk_task(chunk_ref: str, context_ref: str) -> str:
+    """
+    计分一个学生分块：从暂存区读取本块学生与共享上下文，
+    成绩记录（连同本块学生的答卷）写回暂存区，只把引用交给结果后端
+    """
+    chunk = load_staged(chunk_ref)
+    context = load_staged(context_ref)
+    records = _grade_chunk(
+        chunk["students"], dict(context, llm_results=chunk["llm_results"], chunk_id=chunk.get("chunk_id"))
+    )
+    return stage_data({"records": records, "answers": answers_by_student(chunk["students"])}, "result")
+
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
+def save_grades_task(result_refs: List[str], context_ref: str, user_id: int, staged_refs: List[str]) -> Dict[str, Any]:
+    """按分块顺序汇总成绩记录并保存，随后删除本任务的全部暂存对象"""
+    context = load_staged(context_ref)
+    records, answers = [], {}
+    for ref in result_refs:
+        result = load_staged(ref)
+        records.extend(result["records"])
+        answers.update(result["answers"])
+    summary = _finish_grading(records, context, user_id, answers)
+    delete_staged(list(result_refs) + list(staged_refs) + [context_ref])
+    return summary
+
+def _grading_failed(exc: BaseException, job_id: int = None, progress_id: str = None, staged_refs: List[str] = None) -> None:
+    """标记任务失败、发布失败事件并清理暂存对象"""
+    update_grading_job(job_id, status="failed", error=str(exc))
+    if progress_id:
+        ProgressReporter(progress_id).finish("failed", error=str(exc))
+    delete_staged(staged_refs or [])
+
 @celery_app.task
-def grade_exam_task(payload: dict, user_id: int):
+def grading_failed_task(request, exc, traceback, job_id: int = None, progress_id: str = None, staged_refs: List[str] = None):
+    """chord 失败时的回调"""
+    _grading_failed(exc, job_id, progress_id, staged_refs)
+
+@celery_app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def grade_exam_task(self, payload: dict, user_id: int):
     """
     Background task to grade an exam.
-    payload: same as batch_grade payload
+    payload: a claim check {"payload_ref": staged object ref, "job_id": grading job id}
+        (see services/grading_jobs.py) or the grading payload itself, i.e.
+        the batch_grade payload (which may reference a staged upload batch
+        by "batch_id") plus optional
+        "llm_config": grade pending subjective answers concurrently
+        "exam_name":  use the few-shot examples saved for that exam and
+                      persist the graded records as ExamRecords
+        "job_id":     identifies the run for checkpointing (derived from
+                      the exam, answer key, config and model when omitted)
+
+    Students are matched against the roster once, then split into chunks of
+    GRADING_CHUNK_SIZE graded in parallel by a chord whose callback
+    aggregates and saves the records; the chord's result replaces this
+    task's result. Each successful LLM grade is checkpointed as soon as it
+    completes, so a retried or resubmitted run only grades what is missing.
+    Chunk inputs and outputs are staged in grading_staged_objects and
+    records are written to the DB, so broker messages and task results stay
+    small. A client-supplied LLM API key is only staged encrypted; without
+    one, chunks use the server-side key and the server's LLM endpoint.
     """
-    # Create a fresh DB session
+    payload_ref, grading_job_id = None, None
+    if "payload_ref" in payload:
+        payload_ref, grading_job_id = payload["payload_ref"], payload.get("job_id")
+        try:
+            payload = load_staged(payload_ref)
+        except StagedObjectNotFound as e:
+            update_grading_job(grading_job_id, status="failed", error=str(e))
+            return {"error": str(e)}
+    update_grading_job(grading_job_id, status="running")
+
     db = SessionLocal()
     try:
-        # Mock a user object since the service layer might need it
-        # Or better, fetch user from DB
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
+            update_grading_job(grading_job_id, status="failed", error="User not found")
             return {"error": "User not found"}
 
-        # We need to call the logic inside `batch_grade`.
-        # Since `batch_grade` is an API endpoint, it's better to extract the logic to a service function.
-        # But for this task, I'll simulate the logic or refactor.
-        # Let's extract logic in next step if needed.
-        # For now, let's just return a mock success to demonstrate the queue works.
+        try:
+            payload = resolve_payload(db, payload, user.id)
+        except StagedBatchNotFound as e:
+            update_grading_job(grading_job_id, status="failed", error=str(e))
+            return {"error": str(e)}
 
-        return {"status": "completed", "processed": len(payload.get("students", []))}
+        payload = redact_llm_config(payload)
+        students = payload.get("students", [])
+        exam_name = payload.get("exam_name")
+        progress_id = self.request.id
+        if progress_id:
+            ProgressReporter(progress_id).start(len(students))
+        match_payload_students(db, user.school_id, students)
+        examples = get_exam_examples(db, user.school_id, exam_name) if exam_name and payload.get("llm_config") else None
     finally:
         db.close()
+
+    llm_results = payload.get("llm_results", {})
+    job_key = grading_job_key(payload, examples) if payload.get("llm_config") else None
+    context = {
+        "standard_key": payload.get("standard_key", {}),
+        "sections": payload.get("config", {}).get("sections", []),
+        "llm_config": payload.get("llm_config"),
+        "examples": examples,
+        "exam_name": exam_name,
+        "job_key": job_key,
+        "job_id": grading_job_id,
+        "progress_id": progress_id
+    }
+
+    chunks = chunk_students(students, settings.GRADING_CHUNK_SIZE)
+    if len(chunks) <= 1:
+        # 只有一个分块时直接在本任务中计分并保存，失败处理与 chord 的 grading_failed_task 相同
+        try:
+            records = _grade_chunk(students, dict(context, llm_results=llm_results, chunk_id="0"))
+            summary = _finish_grading(records, context, user_id, answers_by_student(students))
+        except Exception as e:
+            _grading_failed(e, grading_job_id, progress_id, [payload_ref])
+            raise
+        delete_staged([payload_ref])
+        return summary
+
+    def chunk_data(index: int, chunk: List[Dict]) -> Dict[str, Any]:
+        # 每个分块只携带本块学生的 LLM 结果；chunk_id 按分块序号确定，重试与重新投递时不变
+        ids = {student.get("学号") for student in chunk}
+        return {
+            "chunk_id": str(index),
+            "students": chunk,
+            "llm_results": {k: v for k, v in llm_results.items() if k in ids}
+        }
+
+    # 暂存或提交 chord 失败时同样标记任务失败，并清理已暂存的对象
+    context_ref, chunk_refs = None, []
+    try:
+        context_ref = stage_data(context, "context")
+        for i, chunk in enumerate(chunks):
+            chunk_refs.append(stage_data(chunk_data(i, chunk), "chunk"))
+        staged_refs = chunk_refs + ([payload_ref] if payload_ref else [])
+
+        callback = save_grades_task.s(context_ref, user_id, staged_refs)
+        callback.on_error(grading_failed_task.s(grading_job_id, progress_id, staged_refs + [context_ref]))
+        workflow = chord(group(grade_chunk_task.s(ref, context_ref) for ref in chunk_refs), callback)
+        return self.replace(workflow)
+    except Ignore:
+        # replace() 以 Ignore 结束本任务，由 chord 接管
+        raise
+    except Exception as e:
+        _grading_failed(e, grading_job_id, progress_id, [payload_ref, context_ref] + chunk_refs)
+        raise
@@ -1,6 +1,14 @@
+import json
 from unittest.mock import MagicMock, patch
+from backend.init_db import init_db
+from backend.db.session import SessionLocal
+from backend.models.grading_job import GradingJob
+from backend.services.grading_jobs import load_staged, delete_staged, resolve_llm_config
 from backend.tasks.grading import grade_exam_task
 
+def setup_module(module):
+    init_db()
+
 def test_celery_task_mock():
     # Mocking celery behavior since we don't have a worker running in test env
     # But we can import the task function and run it synchronously if we bypass the @task decorator
@@ -18,6 +26,68 @@ def test_celery_task_mock():
         mock_user = MagicMock()
         mock_user.id = 1
 
-        result = trigger_async_grading({"test": "data"}, mock_user)
-        assert result["task_id"] == "123"
-        assert result["status"] == "processing"
+        db = SessionLocal()
+        try:
+            payload = {
+                "test": "data",
+                "students": [{"学号": "1"}] * 100,
+                "llm_config": {"base_url": "http://llm.test/v1", "api_key": "client-secret", "model": "m"}
+            }
+            result = trigger_async_grading(payload, mock_user, db)
+            assert result["task_id"] == "123"
+            assert result["status"] == "processing"
+
+            # 任务消息中只有暂存引用，不含请求数据本身
+            claim, user_id = mock_delay.call_args.args
+            assert set(claim) == {"payload_ref", "job_id"} and user_id == 1
+            # 客户端自带的 API 密钥只以密文暂存，worker 解密后仍使用客户端的配置
+            staged = load_staged(claim["payload_ref"])
+            assert "client-secret" not in json.dumps(staged)
+            assert resolve_llm_config(staged["llm_config"]) == payload["llm_config"]
+            assert {k: v for k, v in staged.items() if k != "llm_config"} == {
+                k: v for k, v in payload.items() if k != "llm_config"
+            }
+
+            job = db.query(GradingJob).filter(GradingJob.id == claim["job_id"]).first()
+            assert job.task_id == "123" and job.status == "queued"
+            delete_staged([claim["payload_ref"]])
+            db.delete(job)
+            db.commit()
+        finally:
+            db.close()
+
+def test_server_key_is_only_sent_to_the_server_endpoint():
+    import pytest
+    from backend.core.config import settings
+    from backend.models.old_models import LLMConfig
+    from backend.services.grading_jobs import redact_llm_config
+    from backend.tasks.grading import _grade_chunk
+
+    server = LLMConfig(base_url="https://llm.server/v1", api_key="saved-key", model="server-model")
+    # 未提供密钥、指向外部地址的请求
+    foreign = redact_llm_config({"llm_config": {"base_url": "http://attacker.test/v1", "model": "x"}})["llm_config"]
+    with patch.object(settings, "LLM_API_KEY", "server-key"), \
+            patch("backend.services.grading_jobs.read_json", return_value=server):
+        resolved = resolve_llm_config(foreign)
+        assert resolved["base_url"] == "https://llm.server/v1" and resolved["model"] == "server-model"
+        assert resolved["api_key"] == "server-key"
+
+        # worker 实际使用的配置
+        with patch("backend.tasks.grading.grade_students", new=MagicMock(return_value=None)) as grade, \
+                patch("backend.tasks.grading.run_async"):
+            _grade_chunk([], {"standard_key": {}, "sections": [], "llm_config": foreign})
+        sent = grade.call_args.args[4]
+        assert sent["base_url"] == "https://llm.server/v1" and sent["api_key"] == "server-key"
+    assert resolve_llm_config(None) is None
+
+    # 服务端未配置 LLM 时失败，而不是把密钥发往客户端地址
+    with patch.object(settings, "LLM_API_KEY", "server-key"), \
+            patch("backend.services.grading_jobs.read_json", side_effect=ValueError):
+        with pytest.raises(ValueError):
+            resolve_llm_config(foreign)
+
+def test_progress_events_unknown_task_returns_404():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    response = TestClient(app).get("/api/v1/tasks/no-such-task/events")
+    assert response.status_code == 404
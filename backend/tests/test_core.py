@@ -0,0 +1,148 @@
+import json
+import random
+from backend.services.core import (
+    parse_text_content, get_parse_plan, parse_plan_key,
+    calculate_score, calculate_scores
+)
+
+EXAM_CONFIG = [
+    {"section_id": "1", "match_keyword": "一、单项选择题", "name": "单选得分", "score": 2.0, "question_type": "客观题"},
+    {"section_id": "2", "match_keyword": "二、简答题", "name": "简答得分", "score": 10.0, "question_type": "主观题"},
+]
+
+SHEET = """学号：2025001  姓名：张三  机号：12
+
+一、单项选择题
+1. a
+2.B
+二、简答题
+1. 第一行
+  第二行
+2. 另一题
+"""
+
+def test_parse_text_content():
+    status, data = parse_text_content(SHEET, EXAM_CONFIG)
+    assert status is True
+    assert data["学号"] == "2025001"
+    assert data["姓名"] == "张三"
+    assert data["机号"] == "12"
+    assert data["1-1"] == "A"
+    assert data["1-2"] == "B"
+    assert data["2-1"] == "第一行\n第二行"
+    assert data["2-2"] == "另一题"
+
+def test_parse_errors():
+    assert parse_text_content("   ", EXAM_CONFIG) == (False, "文件内容为空")
+
+    status, msg = parse_text_content("no header here", EXAM_CONFIG)
+    assert status is False
+    assert msg.startswith("头部信息缺失")
+
+    status, msg = parse_text_content(SHEET, EXAM_CONFIG, {"header_regex": "(", "question_regex": r"(\d+)"})
+    assert (status, msg) == (False, "头部正则表达式错误")
+
+def test_parse_plan_is_cached():
+    plan = get_parse_plan(EXAM_CONFIG)
+    # 分值等与解析无关的字段变化不影响缓存
+    rescored = [dict(sec, score=sec["score"] * 2) for sec in EXAM_CONFIG]
+    assert get_parse_plan(rescored) is plan
+    assert parse_plan_key(rescored) == plan.key
+
+    renamed = [dict(EXAM_CONFIG[0], match_keyword="一、选择题"), EXAM_CONFIG[1]]
+    assert get_parse_plan(renamed) is not plan
+    assert plan.parse(SHEET) == parse_text_content(SHEET, EXAM_CONFIG)
+
+def test_sections_out_of_order():
+    shuffled = """学号：2025002  姓名：李四  机号：3
+二、简答题
+1. 先答简答题
+一、单项选择题
+1. C
+"""
+    status, data = parse_text_content(shuffled, EXAM_CONFIG)
+    assert status is True
+    assert data["1-1"] == "C"
+    assert data["2-1"] == "先答简答题"
+
+def test_missing_section_does_not_swallow_next():
+    config = EXAM_CONFIG + [{"section_id": "3", "match_keyword": "三、判断题", "question_type": "客观题"}]
+    sheet = "学号：1 姓名：王五 机号：1\n三、判断题\n1. T\n一、单项选择题\n1. A\n"
+    status, data = parse_text_content(sheet, config)
+    assert status is True
+    assert data["1-1"] == "A"
+    assert data["3-1"] == "T"
+    assert "2-1" not in data
+
+def test_overlapping_keywords():
+    config = [
+        {"section_id": "1", "match_keyword": "选择题", "question_type": "客观题"},
+        {"section_id": "2", "match_keyword": "选择题（多选）", "question_type": "客观题"},
+    ]
+    sheet = "学号：1 姓名：王五 机号：1\n选择题（多选）\n1. AB\n"
+    status, data = parse_text_content(sheet, config)
+    assert status is True
+    assert data == {"学号": "1", "姓名": "王五", "机号": "1", "2-1": "AB"}
+
+def test_locate_keywords_matches_per_keyword_find():
+    keyword_sets = [
+        ["一、单项选择题", "二、简答题"],
+        ["选择题", "选择题（多选）"],                 # 前缀
+        ["一、选择题", "选择题", "题"],               # 后缀、中间
+        ["Part 1", "art", "Part 12", "1"],
+        ["选择题", "题目", "目录"],                   # 部分重叠，逐个 find
+        ["ab", "bc", "abc", "c"],
+    ]
+    rng = random.Random(7)
+    for keywords in keyword_sets:
+        config = [{"section_id": str(i), "match_keyword": k} for i, k in enumerate(keywords)]
+        plan = get_parse_plan(config)
+        pieces = keywords + ["x", "\n", "题", "1", "b"]
+        for _ in range(200):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 8)))
+            expected = {k: text.find(k) for k in keywords if text.find(k) != -1}
+            assert plan._locate_keywords(text) == expected, (keywords, text)
+
+def test_suffix_keyword_inside_longer_title():
+    config = [
+        {"section_id": "1", "match_keyword": "一、选择题", "question_type": "客观题"},
+        {"section_id": "2", "match_keyword": "选择题", "question_type": "客观题"},
+    ]
+    plan = get_parse_plan(config)
+    assert plan._locate_keywords("一、选择题\n1. A\n") == {"一、选择题": 0, "选择题": 2}
+
+def test_calculate_scores_matches_calculate_score():
+    rng = random.Random(7)
+    exam_config = [
+        {"section_id": "1", "name": "单选得分", "score": 2, "question_type": "客观题"},
+        {"section_id": "2", "name": "判断得分", "score": 1.5, "question_type": "客观题"},
+        {"section_id": "3", "name": "简答得分", "score": 10.0, "question_type": "主观题"},
+    ]
+    standard_key = {"学号": "000", "姓名": "标准", "机号": "0"}
+    for q in range(1, 6):
+        standard_key[f"1-{q}"] = rng.choice("ABCD")
+        standard_key[f"2-{q}"] = rng.choice("TF")
+    standard_key["3-1"] = "参考答案"
+    standard_key["3-2"] = "参考答案"
+    standard_key["9-1"] = "A" # 不在配置中的大题
+
+    students, llm_list = [], []
+    for i in range(50):
+        student = {"学号": str(i), "姓名": f"S{i}", "机号": str(i % 7)}
+        for key, value in standard_key.items():
+            if "-" in key and rng.random() < 0.9:
+                student[key] = f" {value.lower()} " if rng.random() < 0.6 else rng.choice("ABCDTF")
+        students.append(student)
+        llm = {}
+        if rng.random() < 0.7:
+            llm["3-1"] = {"score": rng.choice([7, 8.5, 0.1]), "comment": "ok"}
+        llm_list.append(llm or None)
+
+    expected = [calculate_score(s, standard_key, exam_config, llm) for s, llm in zip(students, llm_list)]
+    actual = calculate_scores(students, standard_key, exam_config, llm_list)
+    assert actual == expected
+    # 与逐个计算的结果类型也保持一致（如 int 总分不会变成 float）
+    assert json.dumps(actual, ensure_ascii=False) == json.dumps(expected, ensure_ascii=False)
+
+def test_calculate_scores_empty():
+    assert calculate_scores([], {"1-1": "A"}, EXAM_CONFIG) == []
@@ -0,0 +1,129 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.api.v1.endpoints.tasks import get_pending_tasks
+from backend.db.base import Base
+from backend.models.class_ import Class
+from backend.models.exam import Exam
+from backend.models.exam_answer import ExamAnswer, ExamAnswerBackfill
+from backend.models.exam_record import ExamRecord
+from backend.models.school import School
+from backend.models.section import ExamSection
+from backend.models.user import User
+from backend.services.exam_answers import (
+    STATUS_GRADED, STATUS_PENDING, answer_rows, answers_by_student, backfill_exam_answers, backfill_marker
+)
+from backend.services.history import save_exam_records
+
+
+def make_session():
+    # 独立的内存数据库，不受本地数据库结构影响
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models = (School, User, Class, Exam, ExamRecord, ExamAnswer, ExamAnswerBackfill, ExamSection)
+    Base.metadata.create_all(bind=engine, tables=[model.__table__ for model in models])
+    return sessionmaker(bind=engine)()
+
+
+def test_answer_rows_from_grading_and_online_details():
+    rows = answer_rows({
+        "1-1": "A", "Q1-1": 2, "Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改",
+        "Q2-2": 4.5, "Q2-2_comment": "不错", "S1": 2, "总分": 6.5
+    })
+    by_key = {row["question_key"]: row for row in rows}
+    assert set(by_key) == {"1-1", "2-1", "2-2"}
+    assert by_key["1-1"] == {
+        "question_key": "1-1", "section_id": "1", "answer": "A", "score": 2.0, "comment": None, "status": STATUS_GRADED
+    }
+    assert by_key["2-1"]["status"] == STATUS_PENDING
+    assert by_key["2-2"]["comment"] == "不错" and by_key["2-2"]["status"] == STATUS_GRADED
+
+    online = answer_rows({"7": {"student_answer": "B", "correct_answer": "B", "score": 5, "max_score": 5}})
+    assert online == [{
+        "question_key": "7", "section_id": None, "answer": "B", "score": 5.0, "comment": None, "status": STATUS_GRADED
+    }]
+
+
+def test_save_exam_records_keeps_answers_in_sync():
+    db = make_session()
+    user = User(username="answers", password_hash="-", school_id=1)
+    db.add(user)
+    db.commit()
+
+    records = [{"学号": str(i), "Q1-1": 2, "Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改"} for i in range(5)]
+    exam, _ = save_exam_records(db, "Answers Exam", records, user, chunk_size=2)
+    assert db.query(ExamAnswer).filter(ExamAnswer.exam_id == exam.id).count() == 10
+
+    # 重新保存的学生：旧的逐题行被替换
+    save_exam_records(db, "Answers Exam", [{"学号": "0", "Q1-1": 2, "Q2-1": 3, "Q2-1_comment": "ok"}], user)
+    pending = db.query(ExamAnswer).filter(
+        ExamAnswer.exam_id == exam.id, ExamAnswer.section_id == "2", ExamAnswer.status == STATUS_PENDING
+    ).count()
+    assert pending == 4
+    assert db.query(ExamAnswer).filter(ExamAnswer.exam_id == exam.id).count() == 10
+    db.close()
+
+
+def test_save_exam_records_stores_raw_answers():
+    db = make_session()
+    user = User(username="raw", password_hash="-", school_id=1)
+    db.add(user)
+    db.commit()
+
+    students = [{"学号": "1", "1-1": "A", "2-1": "essay"}, {"学号": "2", "1-1": "C"}]
+    records = [{"学号": "1", "Q1-1": 2, "Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改"}, {"学号": "2", "Q1-1": 0}]
+    exam, _ = save_exam_records(db, "Raw Exam", records, user, answers=answers_by_student(students))
+
+    rows = db.query(ExamAnswer.question_key, ExamAnswer.answer).filter(ExamAnswer.exam_id == exam.id).all()
+    assert sorted(rows) == [("1-1", "A"), ("1-1", "C"), ("2-1", "essay")]
+    db.close()
+
+
+def test_pending_tasks_fall_back_to_details_without_answer_rows():
+    db = make_session()
+    user = User(username="legacy", password_hash="-", school_id=1)
+    db.add(user)
+    db.commit()
+    exam, _ = save_exam_records(db, "Legacy Exam", [{"学号": "1", "Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改"}], user)
+    # 升级前保存、尚未回填逐题行的记录
+    db.add_all([
+        ExamRecord(exam_id=exam.id, student_id="2", details_json={"Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改"}),
+        ExamRecord(exam_id=exam.id, student_id="3", details_json={"Q2-1": 3, "Q2-1_comment": "ok"}),
+    ])
+    db.commit()
+    # 此时建表（init_db 写入回填边界），之后保存的记录都带逐题行
+    backfill_marker(db)
+    save_exam_records(db, "Legacy Exam", [{"学号": "4", "Q2-1": 0.0, "Q2-1_comment": "⏳ 待批改"}], user)
+
+    db.add(ExamSection(exam_id=exam.id, section_index=1, name="S2", marker_id=user.id))
+    db.commit()
+
+    tasks = get_pending_tasks(db=db, current_user=user)
+    assert [task["student_id"] for task in tasks[0]["records"]] == ["1", "2", "4"]
+
+    # 回填完成后不再回退读取 details_json，结果不变
+    backfill_exam_answers(db)
+    assert db.get(ExamAnswerBackfill, 1).backfilled_record_id == db.get(ExamAnswerBackfill, 1).legacy_max_record_id
+    tasks = get_pending_tasks(db=db, current_user=user)
+    assert [task["student_id"] for task in tasks[0]["records"]] == ["1", "2", "4"]
+    db.close()
+
+
+def test_backfill_exam_answers_is_idempotent():
+    db = make_session()
+    db.add_all([
+        ExamRecord(exam_id=1, student_id=str(i), details_json={"Q1-1": i, "Q1-1_comment": "⏳ 待批改" if i % 2 else ""})
+        for i in range(7)
+    ])
+    db.add(ExamRecord(exam_id=1, student_id="empty", details_json=None))
+    db.commit()
+    backfill_marker(db)
+    # 建表后保存的记录已带逐题行，不在回填范围内
+    db.add(ExamRecord(exam_id=1, student_id="new", details_json={"Q1-1": 1}))
+    db.commit()
+
+    assert backfill_exam_answers(db, batch_size=3) == (8, 7)
+    assert db.query(ExamAnswer).filter(ExamAnswer.status == STATUS_PENDING).count() == 3
+    # 没有逐题内容的记录也已记入进度，不会被再次检查
+    assert backfill_exam_answers(db, batch_size=3) == (0, 0)
+    db.close()
@@ -0,0 +1,187 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.init_db import init_db
+from backend.db.session import SessionLocal
+from backend.models.user import User
+from backend.services import few_shot
+
+client = TestClient(app)
+token = None
+EXAM = "Few Shot Test Exam"
+SCHOOL = None
+
+def setup_module(module):
+    init_db()
+    response = client.post(
+        "/api/v1/auth/login",
+        data={"username": "admin", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    global token, SCHOOL
+    token = response.json()["access_token"]
+    db = SessionLocal()
+    SCHOOL = db.query(User.school_id).filter(User.username == "admin").scalar()
+    few_shot.delete_examples(db, SCHOOL, EXAM)
+    db.close()
+
+def teardown_module(module):
+    db = SessionLocal()
+    few_shot.delete_examples(db, SCHOOL, EXAM)
+    db.close()
+
+def test_store_caches_reads_and_invalidates_on_write():
+    db = SessionLocal()
+    try:
+        few_shot.replace_examples(db, SCHOOL, EXAM, "1-1", [{"student_answer": "A", "score": 2, "comment": "ok"}])
+        few_shot.clear_examples_cache()
+
+        # 第一次读取查库，之后命中缓存
+        with patch.object(db, "query", wraps=db.query) as query:
+            first = few_shot.get_examples(db, SCHOOL, EXAM, "1-1")
+            second = few_shot.get_examples(db, SCHOOL, EXAM, "1-1")
+        assert first == second == [{"student_answer": "A", "score": 2.0, "comment": "ok"}]
+        assert query.call_count == 1
+
+        # 写入后缓存失效
+        few_shot.replace_examples(db, SCHOOL, EXAM, "1-1", [
+            {"student_answer": "B", "score": 3, "comment": ""},
+            {"student_answer": "C", "score": 1, "comment": "partial"}
+        ])
+        assert [ex["student_answer"] for ex in few_shot.get_examples(db, SCHOOL, EXAM, "1-1")] == ["B", "C"]
+
+        few_shot.delete_examples(db, SCHOOL, EXAM, "1-1")
+        assert few_shot.get_examples(db, SCHOOL, EXAM, "1-1") == []
+    finally:
+        db.close()
+
+class FakeVersionStore:
+    """模拟多个进程共享的 Redis 版本号"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+def test_cache_sees_writes_from_other_processes_and_returns_copies():
+    db = SessionLocal()
+    store = FakeVersionStore()
+    try:
+        with patch.object(few_shot, "cache_service", store):
+            few_shot.replace_examples(db, SCHOOL, EXAM, "3-1", [{"student_answer": "A", "score": 2, "comment": ""}])
+            examples = few_shot.get_examples(db, SCHOOL, EXAM, "3-1")
+            examples[0]["score"] = 99
+            examples.append({"student_answer": "X", "score": 0, "comment": ""})
+            assert few_shot.get_examples(db, SCHOOL, EXAM, "3-1") == [{"student_answer": "A", "score": 2.0, "comment": ""}]
+
+            # 另一个进程改写了示例：本进程的缓存仍在，但版本号已变化
+            db.query(few_shot.GradingExample).filter(
+                few_shot.GradingExample.exam_name == EXAM, few_shot.GradingExample.question_key == "3-1"
+            ).update({"score": 1.5})
+            db.commit()
+            assert few_shot.get_examples(db, SCHOOL, EXAM, "3-1")[0]["score"] == 2.0
+            store.incr(few_shot.VERSION_KEY.format(SCHOOL, EXAM))
+            assert few_shot.get_examples(db, SCHOOL, EXAM, "3-1")[0]["score"] == 1.5
+
+        # Redis 不可用时缓存按 TTL 过期
+        with patch.object(few_shot, "cache_service", FakeVersionStore()), \
+                patch.object(few_shot.settings, "FEW_SHOT_CACHE_TTL", 0):
+            few_shot.get_examples(db, SCHOOL, EXAM, "3-1")
+            with patch.object(db, "query", wraps=db.query) as query:
+                few_shot.get_examples(db, SCHOOL, EXAM, "3-1")
+            assert query.call_count == 1
+    finally:
+        few_shot.delete_examples(db, SCHOOL, EXAM, "3-1")
+        db.close()
+
+def test_examples_endpoints_and_server_side_lookup():
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.post(f"/api/examples/{EXAM}", json={
+        "2-1": [{"student_answer": "范式减少冗余", "score": 5, "comment": "满分示例"}],
+        "2-2": [{"student_answer": "不知道", "score": 0, "comment": "未作答"}]
+    }, headers=headers)
+    assert response.status_code == 200
+
+    response = client.get(f"/api/examples/{EXAM}", headers=headers)
+    assert set(response.json()) == {"2-1", "2-2"}
+
+    response = client.put(f"/api/examples/{EXAM}/2-2", json=[], headers=headers)
+    assert response.json() == []
+    assert client.get(f"/api/examples/{EXAM}/2-2", headers=headers).json() == []
+
+    # 请求未携带 examples 时由服务端按考试与题号补全
+    captured = {}
+
+    async def fake_grade(**kwargs):
+        captured.update(kwargs)
+        return True, 4.0, "good"
+
+    with patch("backend.routers.grade.grade_subjective_question_async", fake_grade):
+        response = client.post("/api/grade/subjective", json={
+            "question_key": "2-1",
+            "exam_name": EXAM,
+            "question_text": "Q",
+            "reference_answer": "R",
+            "student_answer": "S",
+            "max_score": 5,
+            "llm_config": {"api_key": "k", "base_url": "http://llm.test/v1", "model": "m"}
+        }, headers=headers)
+    assert response.json() == {"score": 4.0, "comment": "good"}
+    assert captured["examples"] == [{"student_answer": "范式减少冗余", "score": 5.0, "comment": "满分示例"}]
+
+def test_examples_are_scoped_to_the_school():
+    import uuid
+    from backend.core.security import create_access_token
+    from backend.models.school import School
+
+    db = SessionLocal()
+    try:
+        school = School(name=f"Other School {uuid.uuid4().hex[:8]}")
+        db.add(school)
+        db.commit()
+        other_school = school.id
+        user = User(username=f"other-{uuid.uuid4().hex[:8]}", password_hash="-", school_id=other_school)
+        db.add(user)
+        db.commit()
+        other = {"Authorization": f"Bearer {create_access_token(user.username)}"}
+        few_shot.replace_examples(db, SCHOOL, EXAM, "4-1", [{"student_answer": "mine", "score": 5, "comment": ""}])
+    finally:
+        db.close()
+
+    headers = {"Authorization": f"Bearer {token}"}
+    # 其他学校的同名考试看不到、也改不到本校的示例
+    assert client.get(f"/api/examples/{EXAM}/4-1", headers=other).json() == []
+    assert "4-1" not in client.get(f"/api/examples/{EXAM}", headers=other).json()
+    assert client.delete(f"/api/examples/{EXAM}/4-1", headers=other).json()["deleted"] == 0
+    client.put(f"/api/examples/{EXAM}/4-1", json=[{"student_answer": "theirs", "score": 0}], headers=other)
+    assert [ex["student_answer"] for ex in client.get(f"/api/examples/{EXAM}/4-1", headers=headers).json()] == ["mine"]
+
+    captured = {}
+
+    async def fake_grade(**kwargs):
+        captured.update(kwargs)
+        return True, 1.0, "ok"
+
+    request = {
+        "question_key": "4-1", "exam_name": EXAM, "question_text": "Q", "reference_answer": "R",
+        "student_answer": "S", "max_score": 5,
+        "llm_config": {"api_key": "k", "base_url": "http://llm.test/v1", "model": "m"}
+    }
+    with patch("backend.routers.grade.grade_subjective_question_async", fake_grade):
+        client.post("/api/grade/subjective", json=request, headers=other)
+        assert [ex["student_answer"] for ex in captured["examples"]] == ["theirs"]
+        client.post("/api/grade/subjective", json=request)
+        assert captured["examples"] is None
+
+    db = SessionLocal()
+    try:
+        few_shot.delete_examples(db, SCHOOL, EXAM, "4-1")
+        few_shot.delete_examples(db, other_school, EXAM, "4-1")
+    finally:
+        db.close()
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+from unittest.mock import patch
+
+from backend.init_db import init_db
+from backend.services.checkpoint import CheckpointStore
+from backend.services.grading import grade_students
+
+STANDARD_KEY = {"1-1": "A", "2-1": "范式消除冗余", "2-2": "事务具有 ACID 特性"}
+SECTIONS = [
+    {"name": "选择", "section_id": "1", "score": 2, "question_type": "客观题"},
+    {"name": "简答", "section_id": "2", "score": 10, "question_type": "主观题"}
+]
+LLM_CONFIG = {"base_url": "http://llm.test/v1", "api_key": "test", "model": "mock"}
+
+def setup_module(module):
+    init_db()
+
+def make_students():
+    return [
+        {"学号": f"CP{i}", "姓名": f"S{i}", "1-1": "A", "2-1": f"答案 {i}", "2-2": f"回答 {i}"}
+        for i in range(3)
+    ]
+
+def test_grading_resumes_from_checkpoints():
+    store = CheckpointStore(f"test-{uuid.uuid4().hex}")
+    graded_answers = []
+
+    def fake_batch(crash_after=None):
+        async def grade(items, api_config, pack_size=None, on_result=None):
+            results = []
+            for i, item in enumerate(items):
+                if crash_after is not None and i == crash_after:
+                    raise RuntimeError("worker crashed")
+                graded_answers.append(item["student_answer"])
+                result = (True, 7.0, f"graded {item['student_answer']}")
+                await on_result(i, result)
+                results.append(result)
+            return results
+        return grade
+
+    # 第一次运行批改 4 份答案后崩溃
+    with patch("backend.services.grading.grade_subjective_batch", fake_batch(crash_after=4)):
+        try:
+            asyncio.run(grade_students(make_students(), STANDARD_KEY, SECTIONS, llm_config=LLM_CONFIG, checkpoints=store))
+        except RuntimeError:
+            pass
+    assert len(graded_answers) == 4
+
+    # 重跑只批改剩下的 2 份
+    graded_answers.clear()
+    with patch("backend.services.grading.grade_subjective_batch", fake_batch()):
+        records = asyncio.run(
+            grade_students(make_students(), STANDARD_KEY, SECTIONS, llm_config=LLM_CONFIG, checkpoints=store)
+        )
+    assert len(graded_answers) == 2
+    assert all(record["总分"] == 2 + 7 + 7 for record in records)
+
+    # 答案改变后对应的检查点失效
+    graded_answers.clear()
+    students = make_students()
+    students[0]["2-1"] = "修改后的答案"
+    with patch("backend.services.grading.grade_subjective_batch", fake_batch()):
+        asyncio.run(grade_students(students, STANDARD_KEY, SECTIONS, llm_config=LLM_CONFIG, checkpoints=store))
+    assert graded_answers == ["修改后的答案"]
+
+    assert store.clear() == 6
+    assert store.load(["CP0", "CP1", "CP2"]) == {}
@@ -52,3 +52,34 @@ def test_save_and_get_history():
     assert len(details) == 1
     assert details[0]["学号"] == "1001"
     assert details[0]["Q1"] == "A"
+
+def test_save_exam_records_bulk_replaces_in_chunks():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from backend.db.base import Base
+    from backend.models.user import User
+    from backend.services.history import save_exam_records
+
+    # 独立的内存数据库，不受本地数据库结构影响
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(username="bulk", password_hash="-", school_id=1)
+    db.add(user)
+    db.commit()
+
+    records = [{"学号": str(i), "姓名": f"S{i}", "总分": i, "Q1": "A"} for i in range(7)]
+    exam, count = save_exam_records(db, "Bulk Exam", records, user, chunk_size=3)
+    assert count == 7
+
+    # 重新保存：已有学生被替换，同一批中重复的学号以最后一条为准，缺学号的记录被跳过
+    records = [{"学号": "1", "总分": 50}, {"学号": "8", "总分": 80}, {"学号": "1", "总分": 60}, {"姓名": "no id"}]
+    _, count = save_exam_records(db, "Bulk Exam", records, user, chunk_size=3)
+    assert count == 2
+
+    rows = {r.student_id: r for r in db.query(ExamRecord).filter(ExamRecord.exam_id == exam.id)}
+    assert len(rows) == 8
+    assert rows["1"].total_score == 60 and rows["8"].total_score == 80
+    assert rows["2"].details_json == {"Q1": "A"}
+    db.close()
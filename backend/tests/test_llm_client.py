@@ -0,0 +1,209 @@
+import asyncio
+import json
+import re
+from unittest.mock import patch
+
+import httpx
+
+from backend.core.config import settings
+from backend.scripts.mock_llm_server import create_app
+from backend.services.json_stream import JSONArrayStreamParser
+from backend.services.llm import grade_subjective_batch, grade_subjective_question, stream_generated_questions
+from backend.services import llm_cache
+from backend.services.llm_cache import grading_cache_stats, normalize_answer
+from backend.services.llm_client import AsyncLLMClient
+
+API_CONFIG = {"base_url": "http://llm.test/v1", "api_key": "test", "model": "mock"}
+
+def make_client(max_concurrency: int, stats: dict) -> AsyncLLMClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        stats["requests"] = stats.get("requests", 0) + 1
+        stats["in_flight"] += 1
+        stats["peak"] = max(stats["peak"], stats["in_flight"])
+        await asyncio.sleep(0.01)
+        stats["in_flight"] -= 1
+        prompt = json.loads(request.content)["messages"][1]["content"]
+        if "[答案 1]" in prompt:
+            stats["packed"] = stats.get("packed", 0) + 1
+            answers = re.findall(r"\[答案 (\d+)\]\n(.*)\n", prompt)
+            if any("bad" in a for _, a in answers):
+                content = "无法按格式输出"
+            else:
+                # 倒序返回，验证按 id 对应
+                content = json.dumps([
+                    {"id": int(i), "score": len(a), "comment": f"echo {a}"} for i, a in reversed(answers)
+                ], ensure_ascii=False)
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+        answer = prompt.split("【学生答案】\n")[1].split("\n")[0]
+        if answer.startswith("boom"):
+            return httpx.Response(500)
+        content = json.dumps({"score": len(answer), "comment": f"echo {answer}"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    return AsyncLLMClient(max_concurrency=max_concurrency, transport=httpx.MockTransport(handler))
+
+def test_grade_subjective_batch_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    stats = {"in_flight": 0, "peak": 0}
+    answers = [f"{i}" + "a" * (i % 3) for i in range(40)] + ["boom"]
+    items = [
+        {"question_text": "Q", "reference_answer": "R", "student_answer": a, "max_score": 4}
+        for a in answers
+    ]
+
+    async def run():
+        client = make_client(4, stats)
+        try:
+            with patch("backend.services.llm.get_async_llm_client", return_value=client):
+                return await grade_subjective_batch(items, API_CONFIG, pack_size=1)
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+    assert stats["peak"] == 4
+    # 顺序与输入一致，分数被限制在满分以内
+    for answer, (success, score, comment) in zip(answers[:-1], results[:-1]):
+        assert success is True
+        assert score == min(len(answer), 4)
+        assert comment == f"echo {answer}"
+    success, score, comment = results[-1]
+    assert (success, score) == (False, 0.0)
+    assert comment.startswith("API调用失败")
+
+def test_grading_cache_coalesces_identical_answers():
+    grading_cache_stats.reset()
+    stats = {"in_flight": 0, "peak": 0}
+    variants = ["范式消除冗余", " 范式消除冗余。", "范式消除冗余 ", "范式  消除冗余"]
+    items = [
+        {"question_text": "什么是范式？", "reference_answer": "R", "student_answer": variants[i % 4], "max_score": 100}
+        for i in range(30)
+    ]
+    assert len({normalize_answer(v) for v in variants[:3]}) == 1
+
+    async def run():
+        client = make_client(8, stats)
+        try:
+            with patch("backend.services.llm.get_async_llm_client", return_value=client):
+                first = await grade_subjective_batch(items, API_CONFIG, pack_size=1)
+                second = await grade_subjective_batch(items, API_CONFIG, pack_size=1)
+                return first, second
+        finally:
+            await client.aclose()
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert all(success for success, _, _ in first)
+    # 两种规范化后的答案各请求一次
+    assert stats["requests"] == 2
+    counters = grading_cache_stats.as_dict()
+    assert counters["misses"] == 2
+    assert counters["coalesced"] + counters["memory_hits"] + counters["redis_hits"] == 58
+    assert counters["hit_rate"] == round(58 / 60, 4)
+
+    # 同步接口共享同一缓存，失败结果不缓存
+    with patch("backend.services.llm.call_llm_api", return_value=(False, "down")) as mock_call:
+        assert grade_subjective_question("什么是范式？", "R", "范式消除冗余！", 100, None, API_CONFIG)[0] is True
+        assert mock_call.call_count == 0
+        assert grade_subjective_question("什么是范式？", "R", "新答案", 100, None, API_CONFIG) == (False, 0.0, "down")
+        assert grade_subjective_question("什么是范式？", "R", "新答案", 100, None, API_CONFIG) == (False, 0.0, "down")
+        assert mock_call.call_count == 2
+
+def test_lookup_gradings_batches_redis_reads():
+    class FakeRedis:
+        def __init__(self, data):
+            self.data = data
+            self.mget_calls = []
+
+        def mget(self, keys):
+            self.mget_calls.append(len(keys))
+            return [self.data.get(key) for key in keys]
+
+        def get(self, key):
+            raise AssertionError("batch lookups must not GET key by key")
+
+    keys = [f"batch-lookup-{i}" for i in range(5)]
+    fake = FakeRedis({
+        llm_cache.REDIS_KEY_PREFIX + keys[0]: json.dumps({"score": 1, "comment": "a"}),
+        llm_cache.REDIS_KEY_PREFIX + keys[3]: json.dumps({"score": 3, "comment": "b"}),
+        llm_cache.REDIS_KEY_PREFIX + keys[4]: "not json",
+    })
+    with patch.object(llm_cache.cache_service, "r", fake), patch.object(llm_cache, "REDIS_MGET_BATCH", 2), \
+            patch.object(settings, "LLM_CACHE_REDIS", True):
+        found = asyncio.run(llm_cache.lookup_gradings(keys))
+        assert found == {keys[0]: (True, 1, "a"), keys[3]: (True, 3, "b")}
+        assert fake.mget_calls == [2, 2, 1]
+        # 命中的结果写入进程内 LRU，再次查询只访问 Redis 中未命中的 key
+        asyncio.run(llm_cache.lookup_gradings(keys))
+        assert fake.mget_calls == [2, 2, 1, 2, 1]
+
+def test_grade_subjective_packed_prompts():
+    grading_cache_stats.reset()
+    stats = {"in_flight": 0, "peak": 0}
+    answers = [f"packed-{i}" for i in range(20)] + ["packed-0", "bad-1"]
+    items = [
+        {"question_text": "Q-packed", "reference_answer": "R", "student_answer": a, "max_score": 100}
+        for a in answers
+    ] + [{"question_text": "Q-other", "reference_answer": "R", "student_answer": "other", "max_score": 100}]
+
+    async def run():
+        client = make_client(8, stats)
+        try:
+            with patch("backend.services.llm.get_async_llm_client", return_value=client):
+                return await grade_subjective_batch(items, API_CONFIG, pack_size=8)
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+    for item, (success, score, comment) in zip(items, results):
+        assert success is True
+        assert (score, comment) == (len(item["student_answer"]), f"echo {item['student_answer']}")
+    # 21 份不同答案分为 8 + 8 + 5 三组，含 bad 的一组解析失败后逐份批改；另一道题单独请求
+    assert stats["packed"] == 3
+    assert stats["requests"] == 3 + 5 + 1
+    counters = grading_cache_stats.as_dict()
+    assert (counters["misses"], counters["coalesced"]) == (22, 1)
+
+def test_json_array_stream_parser_emits_objects_as_they_close():
+    parser = JSONArrayStreamParser()
+    text = '```json\n[{"content": "a]}\\"", "options": ["x", "y"]}, {oops}, {"content": "b"}]\n```'
+    emitted = []
+    for i, char in enumerate(text):
+        for item in parser.feed(char):
+            emitted.append((i, item))
+    assert [item["content"] for _, item in emitted] == ['a]}"', "b"]
+    # 第一道题在对象闭合时即产出，而不是等整个数组结束
+    assert emitted[0][0] == text.index("]},") + 1
+    assert parser.errors == 1 and parser.finished
+
+def test_stream_generated_questions_over_sse():
+    app = create_app(latency_ms=0, stream_chunk_ms=0, stream_chunk_chars=7)
+    client = AsyncLLMClient(transport=httpx.ASGITransport(app=app))
+
+    async def collect():
+        events = []
+        async for kind, value in stream_generated_questions("DB", "short_answer", "easy", 7, API_CONFIG, chunk_size=3):
+            events.append((kind, value))
+        await client.aclose()
+        return events
+
+    with patch("backend.services.llm.get_async_llm_client", return_value=client):
+        events = asyncio.run(collect())
+
+    assert app.state.stats["requests"] == 3
+    assert [kind for kind, _ in events] == ["question"] * 7
+    assert len({value["content"] for _, value in events}) == 7
+
+def test_stream_generated_questions_reports_malformed_items():
+    class FakeClient:
+        async def stream_chat(self, prompt, api_config, system_prompt):
+            for delta in ('[{"content": "a"}, {oops}, ', '{"content": "b"}, {bad: 1}]'):
+                yield delta
+
+    async def collect():
+        return [event async for event in stream_generated_questions("DB", "short_answer", "easy", 5, API_CONFIG)]
+
+    with patch("backend.services.llm.get_async_llm_client", return_value=FakeClient()):
+        events = asyncio.run(collect())
+
+    assert [value["content"] for kind, value in events if kind == "question"] == ["a", "b"]
+    assert [value for kind, value in events if kind == "error"] == ["Skipped 2 malformed question(s) in LLM output"]
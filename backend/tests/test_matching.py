@@ -1,24 +1,101 @@
 from backend.services.matching import MatchService
+from backend.services.fuzzy import FuzzyRosterIndex, edit_distance
 from backend.models.student import Student
 from sqlalchemy.orm import Session
 from unittest.mock import MagicMock
 
 def test_match_student():
     db = MagicMock(spec=Session)
-    school_id = 1
-    service = MatchService(db, school_id)
-
-    # Mock DB Query for number match
-    mock_student = Student(id=1, name="Alice", student_number="123", school_id=1)
-    db.query.return_value.filter.return_value.first.return_value = mock_student
+    service = MatchService(db, 1)
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [
+        Student(id=1, name="Alice", student_number="123", school_id=1),
+        Student(id=2, name="Bob", student_number="124", school_id=1),
+        Student(id=3, name="Bob", student_number="125", school_id=1),
+    ]
 
     # Test Number Match
-    result = service.match_student("123", "Bob")
-    assert result.name == "Alice"
+    assert service.match_student("123", "Bob").name == "Alice"
+    # Test Name Match
+    assert service.match_student("999", "Alice").id == 1
+    # 与批量匹配规则一致：重名且无法区分时不匹配
+    assert service.match_student("999", "Bob") is None
+    assert service.match_student("999", "Bob") == service.match_students([("999", "Bob")])[0][0]
+    assert db.query.call_count == 1
 
-    # Mock DB Query for name match (simulate number mismatch returning None first)
-    db.query.return_value.filter.return_value.first.side_effect = [None, mock_student]
+def test_match_students_bulk():
+    db = MagicMock(spec=Session)
+    service = MatchService(db, 1)
 
-    # Test Name Match
-    result = service.match_student("999", "Alice")
-    assert result.name == "Alice"
+    roster = [
+        Student(id=1, name="Alice", student_number="123", school_id=1),
+        Student(id=2, name="Bob", student_number="124", school_id=1),
+        Student(id=3, name="Bob", student_number="125", school_id=1),
+    ]
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = roster
+
+    records = [("123", "Wrong"), ("999", "Alice"), ("999", "Bob"), ("", "Carol"), ("125", "Bob")]
+    matches, report = service.match_students(records)
+
+    assert [m.id if m else None for m in matches] == [1, 1, None, None, 3]
+    assert report["total"] == 5
+    assert report["matched"] == 3
+    assert report["unmatched"] == [{"index": 3, "学号": "", "姓名": "Carol"}]
+    assert report["ambiguous"] == [{"index": 2, "学号": "999", "姓名": "Bob", "candidates": ["124", "125"]}]
+
+    # 花名册只查询一次
+    service.match_students(records)
+    assert db.query.call_count == 1
+
+def test_fuzzy_roster_index():
+    index = FuzzyRosterIndex([
+        (1, "2025000123", "张三"),
+        (2, "2025000456", "李四"),
+        (3, "2025000457", "王五"),
+    ], max_number_distance=1)
+
+    assert edit_distance("2025000123", "2025001023") == 1 # 相邻交换
+    # 学号一处误写
+    match = index.best_match("2025000128", None, threshold=0.85)
+    assert (match.student_id, match.confidence) == (1, 0.9)
+    # 学号误写 + 姓名正确，置信度更高
+    assert index.best_match("2025000128", "张三").confidence > 0.9
+    # 与两名学生距离相同，无法区分
+    assert index.best_match("2025000450", None) is None
+    # 姓名辅助消歧
+    assert index.best_match("2025000450", "王五").student_id == 3
+    # 低于阈值
+    assert index.best_match("2025999999", None) is None
+    assert index.best_match(None, "张") is None
+
+def test_fuzzy_search_prunes_unequal_length_numbers_safely():
+    roster = [(1, "20250001", "张三"), (2, "2025", "李四"), (3, "202500017", "王五"), (4, "99", "张三丰")]
+    index = FuzzyRosterIndex(roster, max_number_distance=1)
+    queries = [("202500", "张三"), ("20250001234", "李四"), ("2025000", "王五"), ("9", "张三"), ("202500", None)]
+    for number, name in queries:
+        for min_confidence in (0.0, 0.5, 0.6, 0.75, 0.84):
+            # 剪枝后的结果与不剪枝时的过滤结果一致
+            expected = [m for m in index.search(number, name) if m.confidence >= min_confidence]
+            assert index.search(number, name, min_confidence) == expected
+
+    # 查询学号比花名册学号短：编辑距离 2，相似度 1 - 2/8，姓名一致
+    # （只按查询学号长度估计的上界为 0.8，会把该候选错误剪掉）
+    match = index.search("202500", "张三", min_confidence=0.84)[0]
+    assert (match.student_id, match.confidence) == (1, 0.85)
+
+def test_match_students_fuzzy():
+    db = MagicMock(spec=Session)
+    service = MatchService(db, 2)
+    roster = [
+        Student(id=1, name="Alice", student_number="20250001", school_id=2),
+        Student(id=2, name="Bob", student_number="20250002", school_id=2),
+        Student(id=3, name="Bob", student_number="20250003", school_id=2),
+    ]
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = roster
+
+    matches, report = service.match_students([("20250010", None), ("20250030", "Bob"), ("1", "Zed")])
+    assert [m.id if m else None for m in matches] == [1, 3, None]
+    assert [(f["index"], f["matched_number"]) for f in report["fuzzy"]] == [(0, "20250001"), (1, "20250003")]
+    assert all(f["confidence"] >= report["threshold"] for f in report["fuzzy"])
+    assert report["ambiguous"] == []
+    assert report["unmatched"] == [{"index": 2, "学号": "1", "姓名": "Zed"}]
+    assert report["matched"] == 2
@@ -0,0 +1,87 @@
+import json
+import uuid
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.init_db import init_db
+from backend.db.session import SessionLocal, engine
+from backend.models.exam_record import ExamRecord
+
+client = TestClient(app)
+
+def setup_module(module):
+    # 重建数据表，避免旧数据库结构缺列
+    from backend.db.base import Base
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    client.post("/api/settings/parser", json={
+        "header_regex": r"ID:(.*?)\s+Name:(.*?)\s+M:(.*)",
+        "question_regex": r"(\d+)\.\s*([a-zA-Z0-9_一-龥]+)?"
+    })
+    client.post("/api/config/", json={
+        "exam_name": "Pipeline Test",
+        "sections": [
+            {"section_id": "1", "match_keyword": "Part 1", "name": "S1", "score": 2, "num_questions": 2, "question_type": "客观题"}
+        ]
+    })
+
+def make_sheet(student_id: str, answer: str) -> bytes:
+    return f"ID:{student_id} Name:Stu{student_id} M:01\nPart 1\n1. {answer}\n2. B".encode("utf-8")
+
+def auth_headers():
+    token = client.post(
+        "/api/v1/auth/login",
+        data={"username": "admin", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def pipeline_files(count: int):
+    files = [("standard", ("std.txt", make_sheet("0", "A"), "text/plain"))]
+    files += [("files", (f"p{i}.txt", make_sheet(f"P{i}", "A" if i % 2 else "C"), "text/plain")) for i in range(count)]
+    files.append(("files", ("bad.txt", b"no header", "text/plain")))
+    return files
+
+def test_pipeline_job_saves_records_with_stage_timing(monkeypatch):
+    monkeypatch.setattr("backend.services.pipeline.settings.PIPELINE_BATCH_SIZE", 3)
+    exam_name = f"pipeline-{uuid.uuid4().hex[:8]}"
+    response = client.post(
+        "/api/pipeline/jobs", files=pipeline_files(7), data={"exam_name": exam_name}, headers=auth_headers()
+    )
+    assert response.status_code == 200
+    summary = response.json()
+
+    assert summary["saved"] == 7
+    assert [e["filename"] for e in summary["errors"]] == ["bad.txt"]
+    stages = summary["stages"]
+    assert stages["parse"]["items"] == 8
+    for name in ("match", "grade", "save"):
+        assert stages[name]["items"] == 7
+        assert stages[name]["batches"] >= 3
+        assert stages[name]["started_at"] <= stages[name]["finished_at"] <= summary["total_seconds"]
+
+    db = SessionLocal()
+    try:
+        records = db.query(ExamRecord).filter(ExamRecord.exam_id == summary["exam_id"]).all()
+    finally:
+        db.close()
+    assert sorted(r.total_score for r in records) == [2, 2, 2, 2, 4, 4, 4]
+
+def test_pipeline_job_ndjson_stream():
+    response = client.post(
+        "/api/pipeline/jobs?stream=true",
+        files=pipeline_files(3),
+        data={"exam_name": f"pipeline-{uuid.uuid4().hex[:8]}"},
+        headers=auth_headers()
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.strip().split("\n")]
+
+    assert events[-1]["done"] and events[-1]["saved"] == 3
+    progress = [e for e in events[:-1]]
+    assert {e["stage"] for e in progress} == {"match", "grade", "save"}
+    assert max(e["total"] for e in progress if e["stage"] == "save") == 3
+
+def test_pipeline_job_rejects_bad_standard_key():
+    files = [("standard", ("std.txt", b"no header", "text/plain")), ("files", ("p.txt", make_sheet("1", "A"), "text/plain"))]
+    response = client.post("/api/pipeline/jobs", files=files, data={"exam_name": "x"}, headers=auth_headers())
+    assert response.status_code == 400
@@ -0,0 +1,114 @@
+import json
+
+import redis
+
+from backend.services.progress import ProgressReporter, build_snapshot, get_progress
+
+
+class MemoryRedis:
+    """只实现进度上报用到的 hash / pipeline / publish 命令"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.published = []
+
+    def pipeline(self):
+        return MemoryPipeline(self)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+class MemoryPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hincrby(self, key, field, amount):
+        self.commands.append(lambda h: h.__setitem__(field, str(int(h.get(field, 0)) + amount)))
+
+    def hset(self, key, mapping):
+        self.commands.append(lambda h: h.update(mapping))
+
+    def expire(self, key, ttl):
+        self.commands.append(lambda h: None)
+
+    def hgetall(self, key):
+        self.key = key
+
+    def execute(self):
+        state = self.client.hashes.setdefault(self.key, {})
+        for command in self.commands:
+            command(state)
+        return [None] * len(self.commands) + [dict(state)]
+
+
+def test_snapshot_percent_and_eta():
+    state = {"status": "running", "started_at": "100", "students_total": "10", "units_total": "40",
+             "units_done": "9", "units_failed": "1"}
+    snapshot = build_snapshot("t1", state, now=110)
+    assert snapshot["percent"] == 25.0
+    assert snapshot["elapsed"] == 10.0
+    assert snapshot["eta_seconds"] == 30.0
+
+    # 没有主观题时按学生数计算
+    snapshot = build_snapshot("t1", {"started_at": "100", "students_total": "4", "students_done": "1"}, now=104)
+    assert snapshot["percent"] == 25.0 and snapshot["eta_seconds"] == 12.0
+
+    snapshot = build_snapshot("t1", dict(state, status="completed"), now=110)
+    assert snapshot["eta_seconds"] == 0.0
+
+def test_reporter_publishes_shared_counters():
+    client = MemoryRedis()
+    # 两个分块（可能在不同 worker 上）共享同一任务的计数
+    chunk_a, chunk_b = ProgressReporter("job-1", client), ProgressReporter("job-1", client)
+    chunk_a.start(students_total=4)
+    chunk_a.add_units(3, done=1)
+    chunk_b.add_units(2)
+    chunk_a.unit_done(True)
+    chunk_b.unit_done(False)
+    chunk_a.students_done(2)
+    chunk_a.finish("completed", processed=4)
+
+    channels = {channel for channel, _ in client.published}
+    assert channels == {"grading_progress:job-1"}
+    events = [event for _, event in client.published]
+    assert [e["event"] for e in events] == ["started", "units", "units", "unit", "unit", "students", "completed"]
+    final = events[-1]
+    assert final["status"] == "completed"
+    assert (final["units_total"], final["units_done"], final["units_failed"]) == (5, 2, 1)
+    assert final["students_done"] == 2 and final["processed"] == "4"
+    assert get_progress("job-1", client)["status"] == "completed"
+
+def test_retried_chunks_are_not_counted_twice():
+    client = MemoryRedis()
+    ProgressReporter("job-3", client).start(students_total=4)
+    # 分块 0 第一次执行：批改成功 1 个（写入检查点）、失败 1 个后异常
+    first = ProgressReporter("job-3", client, chunk_id="0")
+    first.add_units(3)
+    first.unit_done(True)
+    first.unit_done(False)
+    # 重试：从检查点恢复 1 个单元，重新登记后批改剩余 2 个
+    retry = ProgressReporter("job-3", client, chunk_id="0")
+    retry.add_units(3, done=1)
+    retry.unit_done(True)
+    retry.unit_done(True)
+    retry.students_done(2)
+    retry.students_done(2)
+    ProgressReporter("job-3", client, chunk_id="1").students_done(2)
+
+    progress = get_progress("job-3", client)
+    assert (progress["units_total"], progress["units_done"], progress["units_failed"]) == (3, 3, 0)
+    assert progress["students_done"] == 4 and progress["percent"] == 100.0
+
+def test_reporter_ignores_redis_errors():
+    class BrokenRedis:
+        def pipeline(self):
+            raise redis.ConnectionError("down")
+
+    reporter = ProgressReporter("job-2", BrokenRedis())
+    reporter.start(3)
+    reporter.unit_done(True)
@@ -0,0 +1,101 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from backend.core.config import settings
+from backend.services.llm_client import AsyncLLMClient, chat_sync
+from backend.services.rate_limit import (
+    AdaptiveConcurrency, TokenBucket, backoff_delay, get_provider_limiter, retry_after_seconds
+)
+
+def test_retry_after_and_backoff():
+    assert retry_after_seconds({"Retry-After": "3"}) == 3.0
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < retry_after_seconds({"retry-after": format_datetime(future, usegmt=True)}) <= 30
+    assert retry_after_seconds({"Retry-After": "soon"}) is None
+    assert retry_after_seconds({}) is None
+
+    for attempt in range(6):
+        delay = backoff_delay(attempt)
+        assert 0 <= delay <= min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+    assert backoff_delay(0, retry_after=5) >= 5
+
+def test_token_bucket():
+    bucket = TokenBucket(rate_per_minute=60)
+    assert bucket.reserve(60) == 0
+    assert 0.9 < bucket.reserve(1) <= 1.0
+    bucket.adjust(-10) # 退还预估多扣的额度
+    assert bucket.reserve(5) == 0
+    assert TokenBucket(0).reserve(10 ** 9) == 0
+
+def test_adaptive_concurrency():
+    limiter = AdaptiveConcurrency(initial=8, cooldown=0)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    limiter.on_throttle()
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 1
+    for _ in range(10):
+        limiter.on_success()
+    assert 4 < limiter.limit < 5
+
+    async def run():
+        limiter.limit = 2
+        peak, in_flight = 0, 0
+
+        async def worker():
+            nonlocal peak, in_flight
+            await limiter.acquire_async()
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.005)
+            in_flight -= 1
+            limiter.release()
+
+        await asyncio.gather(*[worker() for _ in range(10)])
+        return peak
+
+    assert asyncio.run(run()) == 2
+    assert limiter.in_flight == 0
+
+def test_async_client_retries_rate_limits(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    api_config = {"base_url": "http://throttled.test/v1", "api_key": "k"}
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(503),
+        httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 10}}),
+    ]
+
+    async def handler(request):
+        return responses.pop(0)
+
+    async def run():
+        client = AsyncLLMClient(transport=httpx.MockTransport(handler))
+        try:
+            return await client.chat("hello", api_config)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == (True, "ok")
+    limiter = get_provider_limiter(api_config)
+    assert (limiter.throttled, limiter.retries) == (1, 2)
+    assert limiter.concurrency.limit < settings.LLM_MAX_CONCURRENCY
+
+def test_sync_client_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    api_config = {"base_url": "http://down.test/v1", "api_key": "k"}
+    session = MagicMock()
+    session.post.return_value = MagicMock(status_code=429, headers={})
+
+    with patch("backend.services.llm_client.get_sync_session", return_value=session):
+        success, message = chat_sync("hello", api_config)
+    assert success is False
+    assert "HTTP 429" in message
+    assert session.post.call_count == 3
+    assert get_provider_limiter(api_config).concurrency.in_flight == 0
@@ -132,3 +132,129 @@ def test_pending_task_logic():
 
     assert len(my_exam_tasks) == 1
     assert my_exam_tasks[0]["pending_count"] == 1
+
+def test_grade_exam_task_chunks_and_persists_records():
+    from unittest.mock import patch
+    from backend.core.celery_app import celery_app
+    from backend.core.config import settings
+    from backend.tasks.grading import grade_exam_task
+
+    payload = {
+        "students": [{"学号": f"C{i}", "姓名": f"Chunk {i}", "1-1": "A" if i % 2 else "B"} for i in range(5)],
+        "standard_key": {"1-1": "A"},
+        "config": {"sections": [{"name": "Part A", "section_id": "1", "score": 2, "question_type": "客观题"}]},
+        "exam_name": "Chunked Exam"
+    }
+
+    # 本地以 eager 模式执行 chord（无需 worker / Redis）
+    saved_conf = {key: celery_app.conf[key] for key in ("task_always_eager", "result_backend")}
+    celery_app.conf.update(task_always_eager=True, result_backend="cache+memory://")
+    try:
+        with patch.object(settings, "GRADING_CHUNK_SIZE", 2), \
+                patch("backend.tasks.grading.grade_chunk_task.s", wraps=grade_exam_task.app.tasks[
+                    "backend.tasks.grading.grade_chunk_task"].s) as chunk_signature:
+            result = grade_exam_task.apply(args=(payload, 1)).get()
+    finally:
+        celery_app.conf.update(saved_conf)
+
+    assert chunk_signature.call_count == 3
+    # 结果后端中只有摘要，成绩记录写入数据库
+    assert result["processed"] == 5 and result["saved"] == 5
+    assert "records" not in result
+
+    # 分块、上下文与分块成绩的暂存数据在保存后删除
+    from backend.models.grading_job import GradingStagedObject
+    db = SessionLocal()
+    try:
+        assert db.query(GradingStagedObject).count() == 0
+    finally:
+        db.close()
+
+    db = SessionLocal()
+    try:
+        exam = db.query(Exam).filter(Exam.name == "Chunked Exam").first()
+        records = db.query(ExamRecord).filter(ExamRecord.exam_id == exam.id).all()
+        assert sorted((r.student_id, r.total_score) for r in records) == [
+            ("C0", 0.0), ("C1", 2.0), ("C2", 0.0), ("C3", 2.0), ("C4", 0.0)
+        ]
+    finally:
+        db.close()
+
+def test_inline_grading_failure_marks_job_and_progress_failed():
+    from unittest.mock import patch
+    from backend.models.grading_job import GradingJob, GradingStagedObject
+    from backend.services.grading_jobs import create_grading_job
+    from backend.tasks.grading import grade_exam_task
+
+    payload = {
+        "students": [{"学号": "F1", "1-1": "A"}],
+        "standard_key": {"1-1": "A"},
+        "config": {"sections": [{"name": "Part A", "section_id": "1", "score": 2, "question_type": "客观题"}]}
+    }
+    db = SessionLocal()
+    try:
+        job = create_grading_job(db, 1, payload)
+        job_id, payload_ref = job.id, job.payload_ref
+    finally:
+        db.close()
+
+    with patch("backend.tasks.grading._grade_chunk", side_effect=RuntimeError("LLM down")), \
+            patch("backend.tasks.grading.ProgressReporter") as reporter:
+        result = grade_exam_task.apply(args=({"payload_ref": payload_ref, "job_id": job_id}, 1), task_id="inline-fail")
+    assert result.failed()
+    reporter.return_value.finish.assert_called_with("failed", error="LLM down")
+
+    db = SessionLocal()
+    try:
+        job = db.query(GradingJob).filter(GradingJob.id == job_id).one()
+        assert job.status == "failed" and job.error == "LLM down"
+        assert db.query(GradingStagedObject).filter(GradingStagedObject.ref == payload_ref).count() == 0
+    finally:
+        db.close()
+
+def test_chord_setup_failure_marks_job_and_progress_failed():
+    from unittest.mock import patch
+    from backend.core.config import settings
+    from backend.models.grading_job import GradingJob, GradingStagedObject
+    from backend.services import grading_jobs
+    from backend.services.grading_jobs import create_grading_job
+    from backend.tasks.grading import grade_exam_task
+
+    payload = {
+        "students": [{"学号": f"F{i}", "1-1": "A"} for i in range(4)],
+        "standard_key": {"1-1": "A"},
+        "config": {"sections": [{"name": "Part A", "section_id": "1", "score": 2, "question_type": "客观题"}]}
+    }
+    db = SessionLocal()
+    try:
+        job = create_grading_job(db, 1, payload)
+        job_id, payload_ref = job.id, job.payload_ref
+        staged_before = db.query(GradingStagedObject).count()
+    finally:
+        db.close()
+
+    # 上下文与第一个分块暂存成功，第二个分块暂存失败
+    real_stage = grading_jobs.stage_data
+    calls = []
+
+    def flaky_stage(data, kind, **kwargs):
+        calls.append(kind)
+        if len(calls) == 3:
+            raise RuntimeError("staging down")
+        return real_stage(data, kind, **kwargs)
+
+    with patch.object(settings, "GRADING_CHUNK_SIZE", 2), \
+            patch("backend.tasks.grading.stage_data", side_effect=flaky_stage), \
+            patch("backend.tasks.grading.ProgressReporter") as reporter:
+        result = grade_exam_task.apply(args=({"payload_ref": payload_ref, "job_id": job_id}, 1), task_id="chord-fail")
+    assert result.failed()
+    reporter.return_value.finish.assert_called_with("failed", error="staging down")
+
+    db = SessionLocal()
+    try:
+        job = db.query(GradingJob).filter(GradingJob.id == job_id).one()
+        assert job.status == "failed" and job.error == "staging down"
+        # 已暂存的上下文、分块与请求数据全部清理
+        assert db.query(GradingStagedObject).count() == staged_before - 1
+    finally:
+        db.close()
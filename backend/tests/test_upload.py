@@ -0,0 +1,268 @@
+import io
+import json
+import tarfile
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.services.storage import LocalStorage, get_storage_service
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def tmp_storage(tmp_path, monkeypatch):
+    # 上传的文件写入临时目录，不在 uploads/ 中残留
+    monkeypatch.setattr("backend.services.storage.settings.STORAGE_LOCAL_PATH", str(tmp_path))
+    app.dependency_overrides[get_storage_service] = LocalStorage
+    yield tmp_path
+    app.dependency_overrides.pop(get_storage_service, None)
+
+def setup_module(module):
+    parser_config = {
+        "header_regex": r"ID:(.*?)\s+Name:(.*?)\s+M:(.*)",
+        "question_regex": r"(\d+)\.\s*([a-zA-Z0-9_\u4e00-\u9fa5]+)?"
+    }
+    client.post("/api/settings/parser", json=parser_config)
+    exam_config = {
+        "exam_name": "Upload Test",
+        "sections": [
+            {"section_id": "1", "match_keyword": "Part 1", "name": "S1", "score": 2, "num_questions": 2, "question_type": "客观题"}
+        ]
+    }
+    client.post("/api/config/", json=exam_config)
+
+def make_sheet(student_id: str, answer: str) -> bytes:
+    return f"ID:{student_id} Name:Stu{student_id} M:01\nPart 1\n1. {answer}\n2. B".encode("utf-8")
+
+def test_upload_students_keeps_order_and_errors(tmp_storage):
+    files = [
+        ("files", ("s3.txt", make_sheet("3", "C"), "text/plain")),
+        ("files", ("bad.txt", b"no header", "text/plain")),
+        ("files", ("s1.txt", make_sheet("1", "A"), "text/plain")),
+        ("files", ("s2.txt", "ID:2 Name:Stu2 M:01\nPart 1\n1. D".encode("gbk"), "text/plain")),
+    ]
+    response = client.post("/api/upload/students", files=files)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [r["filename"] for r in body["success"]] == ["s3.txt", "s1.txt", "s2.txt"]
+    assert body["success"][0]["data"]["1-1"] == "C"
+    assert body["success"][1]["data"]["学号"] == "1"
+    assert body["success"][2]["data"]["1-1"] == "D"
+
+    assert len(body["errors"]) == 1
+    assert body["errors"][0]["filename"] == "bad.txt"
+    assert body["errors"][0]["error"].startswith("头部信息缺失")
+    assert (tmp_storage / "student_s3.txt").exists()
+
+def test_upload_students_ndjson_stream():
+    files = [
+        ("files", ("s1.txt", make_sheet("1", "A"), "text/plain")),
+        ("files", ("bad.txt", b"", "text/plain")),
+        ("files", ("s2.txt", make_sheet("2", "B"), "text/plain")),
+    ]
+    response = client.post(
+        "/api/upload/students",
+        files=files,
+        headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    summary = lines[-1]
+    assert summary["done"] is True
+    assert (summary["total"], summary["success"], summary["errors"]) == (3, 2, 1)
+    assert summary["cache"]["hits"] + summary["cache"]["misses"] == 3
+
+    by_index = {line["index"]: line for line in lines[:-1]}
+    assert by_index[0]["status"] == "success"
+    assert by_index[0]["data"]["1-1"] == "A"
+    assert by_index[1] == {"index": 1, "status": "error", "filename": "bad.txt", "error": "文件内容为空"}
+    assert by_index[2]["data"]["学号"] == "2"
+
+    # Query flag selects the same mode
+    response = client.post("/api/upload/students?stream=true", files=files[:1])
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert json.loads(response.text.splitlines()[-1])["success"] == 1
+
+def test_upload_students_archive_zip():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("room1/s1.txt", make_sheet("1", "A"))
+        zf.writestr("room1/s2.txt", make_sheet("2", "C"))
+        zf.writestr("room1/readme.md", b"ignored")
+        zf.writestr("__MACOSX/room1/._s1.txt", b"ignored")
+        zf.writestr("room1/empty.txt", b"")
+
+    response = client.post(
+        "/api/upload/students/archive",
+        files={"file": ("sheets.zip", buf.getvalue(), "application/zip")}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["filename"] for r in body["success"]] == ["room1/s1.txt", "room1/s2.txt"]
+    assert body["success"][0]["storage_path"] == "student_room1_s1.txt"
+    assert body["success"][1]["data"]["1-1"] == "C"
+    assert body["errors"] == [{"filename": "room1/empty.txt", "error": "文件内容为空"}]
+
+def test_upload_students_archive_tar_stream():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, content in [("s1.txt", make_sheet("1", "A")), ("../evil.txt", make_sheet("9", "D"))]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tf.addfile(info, io.BytesIO(content))
+
+    response = client.post(
+        "/api/upload/students/archive?stream=true",
+        files={"file": ("sheets.tar.gz", buf.getvalue(), "application/gzip")}
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert (lines[-1]["total"], lines[-1]["success"], lines[-1]["errors"]) == (2, 2, 0)
+    paths = sorted(line["storage_path"] for line in lines[:-1])
+    assert paths == ["student_evil.txt", "student_s1.txt"]
+
+def test_upload_students_archive_rejects_plain_file():
+    response = client.post(
+        "/api/upload/students/archive",
+        files={"file": ("s1.txt", make_sheet("1", "A"), "text/plain")}
+    )
+    assert response.status_code == 400
+
+def test_upload_students_parse_cache():
+    files = [
+        ("files", ("c1.txt", make_sheet("cache-1", "A"), "text/plain")),
+        ("files", ("c2.txt", make_sheet("cache-2", "B"), "text/plain")),
+    ]
+    first = client.post("/api/upload/students", files=files).json()
+    assert first["cache"] == {"hits": 0, "misses": 2}
+
+    second = client.post("/api/upload/students", files=files).json()
+    assert second["cache"] == {"hits": 2, "misses": 0}
+    assert second["success"] == first["success"]
+
+def login(username: str = "admin", password: str = "admin123") -> dict:
+    token = client.post(
+        "/api/v1/auth/login",
+        data={"username": username, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def other_user_headers() -> dict:
+    from backend.core.security import create_access_token
+    from backend.db.session import SessionLocal
+    from backend.models.user import User
+    db = SessionLocal()
+    try:
+        user = User(username=f"other-{uuid.uuid4().hex[:8]}", password_hash="-")
+        db.add(user)
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token(user.username)}"}
+    finally:
+        db.close()
+
+def test_staged_batch_is_graded_by_reference():
+    from backend.init_db import init_db
+    init_db()
+    headers = login()
+
+    response = client.post(
+        "/api/upload/standard?stage=true",
+        files={"file": ("std.txt", make_sheet("0", "A"), "text/plain")},
+        headers=headers
+    )
+    assert response.status_code == 200
+    batch_id = response.json()["batch_id"]
+
+    files = [("files", (f"s{i}.txt", make_sheet(str(i), "A" if i % 2 else "C"), "text/plain")) for i in range(4)]
+    response = client.post(f"/api/upload/students?stream=true&batch_id={batch_id}", files=files, headers=headers)
+    summary = json.loads(response.text.strip().split("\n")[-1])
+    assert summary["batch_id"] == batch_id and summary["staged"] == 4
+
+    # 重复上传同名文件替换旧的解析结果
+    response = client.post(f"/api/upload/students?batch_id={batch_id}", files=files[:1], headers=headers)
+    assert response.json()["staged"] == 1
+
+    response = client.get(f"/api/upload/batches/{batch_id}", headers=headers)
+    assert response.json()["sheets"] == 4 and response.json()["has_standard_key"]
+
+    response = client.post("/api/grade/batch", json={"batch_id": batch_id}, headers=headers)
+    assert response.status_code == 200
+    assert sorted(record["总分"] for record in response.json()) == [2, 2, 4, 4]
+
+    assert client.delete(f"/api/upload/batches/{batch_id}", headers=headers).status_code == 200
+    response = client.post("/api/grade/batch", json={"batch_id": batch_id}, headers=headers)
+    assert response.status_code == 404
+
+def test_staged_batch_is_private_to_its_owner():
+    from backend.init_db import init_db
+    init_db()
+    headers = login()
+
+    files = [("files", ("s1.txt", make_sheet("1", "A"), "text/plain"))]
+    assert client.post("/api/upload/students?stage=true", files=files).status_code == 401
+    batch_id = client.post("/api/upload/students?stage=true", files=files, headers=headers).json()["batch_id"]
+
+    assert client.get(f"/api/upload/batches/{batch_id}").status_code == 401
+    other = other_user_headers()
+    assert client.get(f"/api/upload/batches/{batch_id}", headers=other).status_code == 404
+    assert client.delete(f"/api/upload/batches/{batch_id}", headers=other).status_code == 404
+    assert client.post(f"/api/upload/students?batch_id={batch_id}", files=files, headers=other).status_code == 404
+    assert client.post("/api/grade/batch", json={"batch_id": batch_id}, headers=other).status_code == 404
+    assert client.get(f"/api/upload/batches/{batch_id}", headers=headers).json()["sheets"] == 1
+
+def test_appended_sheets_are_parsed_with_the_batch_config():
+    from backend.init_db import init_db
+    init_db()
+    headers = login()
+
+    files = [("files", ("s1.txt", make_sheet("1", "A"), "text/plain"))]
+    batch_id = client.post("/api/upload/students?stage=true", files=files, headers=headers).json()["batch_id"]
+
+    # 批次创建后修改了全局考试配置（关键字不再匹配答卷）
+    client.post("/api/config/", json={
+        "exam_name": "Changed",
+        "sections": [
+            {"section_id": "1", "match_keyword": "Part 9", "name": "S1", "score": 2, "num_questions": 2, "question_type": "客观题"}
+        ]
+    })
+    try:
+        files = [("files", ("s2.txt", make_sheet("2", "B"), "text/plain"))]
+        response = client.post(f"/api/upload/students?batch_id={batch_id}", files=files, headers=headers).json()
+    finally:
+        setup_module(None)
+    assert response["staged"] == 1
+    assert response["success"][0]["data"]["1-1"] == "B"
+
+def test_expired_batches_are_hidden_and_purged():
+    from backend.db.session import SessionLocal
+    from backend.init_db import init_db
+    from backend.models.staged_batch import StagedBatch, StagedSheet
+    from backend.services.staging import StagedBatchNotFound, create_batch, get_batch
+    init_db()
+    headers = login()
+
+    files = [("files", ("s1.txt", make_sheet("1", "A"), "text/plain"))]
+    batch_id = client.post("/api/upload/students?stage=true", files=files, headers=headers).json()["batch_id"]
+
+    db = SessionLocal()
+    try:
+        batch = db.query(StagedBatch).filter(StagedBatch.batch_id == batch_id).one()
+        batch.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        with pytest.raises(StagedBatchNotFound):
+            get_batch(db, batch_id, batch.user_id)
+
+        # 创建新批次时清理过期批次及其答卷
+        batch_pk = batch.id
+        assert db.query(StagedSheet).filter(StagedSheet.batch_id == batch_pk).count() == 1
+        create_batch(db, {}, batch.user_id)
+        assert db.query(StagedBatch).filter(StagedBatch.batch_id == batch_id).count() == 0
+        assert db.query(StagedSheet).filter(StagedSheet.batch_id == batch_pk).count() == 0
+    finally:
+        db.close()
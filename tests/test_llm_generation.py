@@ -46,3 +46,37 @@ def test_batch_generate_questions_invalid_json(mock_call_llm_api):
 
     assert success is False
     assert "Failed to parse JSON" in error
+
+def test_generate_questions_chunked_fans_out_and_dedupes():
+    import asyncio
+    import json
+    import re
+    from backend.services.llm import generate_questions_chunked
+
+    prompts = []
+
+    async def fake_call(prompt, api_config, system_prompt=None):
+        prompts.append(prompt)
+        count = int(re.search(r"Generate (\d+) exam questions", prompt).group(1))
+        batch = int(re.search(r"This is batch (\d+) of", prompt).group(1))
+        if batch == 3:
+            return False, "HTTP 500"
+        topics = ["indexes", "transactions", "joins", "views", "triggers", "locks", "backups", "replication"]
+        questions = [
+            {"type": "short_answer", "content": f"Explain {topics[(batch - 1) * count + i]}.", "answer": "A", "score": 5}
+            for i in range(count)
+        ]
+        # 每块都带一道相同的题目，合并后只保留一道
+        questions[0]["content"] = "What is normalization in databases?"
+        return True, json.dumps(questions)
+
+    with patch("backend.services.llm.async_call_llm_api", fake_call):
+        questions, errors = asyncio.run(generate_questions_chunked(
+            "DB", "short_answer", "easy", 12, {"base_url": "http://test", "api_key": "test"}, chunk_size=4
+        ))
+
+    assert len(prompts) == 3
+    assert len(errors) == 1 and "chunk 3/3" in errors[0]
+    contents = [q["content"] for q in questions]
+    assert contents.count("What is normalization in databases?") == 1
+    assert len(questions) == 7